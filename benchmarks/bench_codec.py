@@ -0,0 +1,103 @@
+"""
+Benchmark: caminho quente dos pedidos, antes e depois do core.codec.
+
+Compara, por pedido, o caminho antigo (model_dump_json -> json.loads ->
+_fix_decimals e json.dumps(default=str) na resposta) com o novo (to_item e
+codec.dumps), em tempo de CPU e pico de memória alocada (tracemalloc):
+
+- criar: PedidoModel -> item do DynamoDB -> corpo da resposta;
+- listar: lista de itens (Decimal, como vem do DynamoDB) -> corpo da resposta.
+
+Uso:
+    python benchmarks/bench_codec.py --items 200 --orders 2000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from core.codec import dumps, to_item  # noqa: E402
+from models import PedidoModel, ItemPedidoSnapshot, StatusPedido  # noqa: E402
+
+
+def build_order(n_items: int) -> PedidoModel:
+    itens = [
+        ItemPedidoSnapshot(cookie_id=f'ck_{i}', sabor=f'Sabor {i}', qtd=2, preco_venda_unitario=Decimal('12.50'),
+                           custo_producao_unitario=Decimal('4.35'), subtotal_venda=Decimal('25.00'))
+        for i in range(n_items)
+    ]
+    return PedidoModel(id='ord_bench', cliente_nome='Cliente', itens=itens, status=StatusPedido.RECEBIDO,
+                       valor_total_venda=Decimal('25.00') * n_items, data_entrega='2025-01-10')
+
+
+def fix_decimals(obj):
+    """Réplica do antigo OrderService._fix_decimals."""
+    if isinstance(obj, float):
+        return Decimal(str(obj))
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            if isinstance(v, float):
+                obj[k] = Decimal(str(v))
+            else:
+                fix_decimals(v)
+    elif isinstance(obj, list):
+        for item in obj:
+            fix_decimals(item)
+    return obj
+
+
+def old_create(pedido):
+    item = fix_decimals(json.loads(pedido.model_dump_json()))
+    return json.dumps(item, default=str)
+
+
+def new_create(pedido):
+    return dumps(to_item(pedido))
+
+
+def old_list(items):
+    return json.dumps(fix_decimals(items), default=str)
+
+
+def new_list(items):
+    return dumps(items)
+
+
+def measure(func, arg, repeat):
+    # Melhor de 5 rodadas, para reduzir ruído do sistema
+    elapsed = min(timeit.repeat(lambda: func(arg), number=repeat, repeat=5)) / repeat
+
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=200, help="itens por pedido grande")
+    parser.add_argument('--orders', type=int, default=2000, help="pedidos na listagem")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pedido = build_order(args.items)
+    listagem = [to_item(build_order(5)) for _ in range(args.orders)]
+
+    print(f"Pedido com {args.items} itens; listagem de {args.orders} pedidos (5 itens cada)")
+    print(f"{'cenário':<22}{'ms':>10}{'pico KiB':>12}")
+    for name, func, arg in [
+        ('criar (antigo)', old_create, pedido), ('criar (codec)', new_create, pedido),
+        ('listar (antigo)', old_list, listagem), ('listar (codec)', new_list, listagem),
+    ]:
+        elapsed, peak = measure(func, arg, args.repeat)
+        print(f"{name:<22}{elapsed * 1000:>10.2f}{peak / 1024:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
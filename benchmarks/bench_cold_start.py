@@ -0,0 +1,113 @@
+"""
+Benchmark: cold start do index.handler.
+
+Cada rodada sobe um interpretador Python novo (como um container Lambda novo)
+e mede, em ms: o import do index (fase de init), o primeiro OPTIONS, o
+primeiro GET /cookies e o primeiro GET /orders. Também informa se boto3 e
+pydantic já estavam carregados depois do init.
+
+O DynamoDB é um stub HTTP local que responde vazio (GetItem/Scan/Query):
+o que se mede é o custo de import e de montagem dos serviços, não a rede.
+
+Uso:
+    python benchmarks/bench_cold_start.py --runs 15
+    python benchmarks/bench_cold_start.py --src /caminho/de/outra/versao/src
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+STEPS = ['import', 'OPTIONS /cookies', 'GET /cookies', 'GET /orders']
+
+# Executado no processo filho: mede cada etapa com perf_counter
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+
+def event(method, path):
+    return {'requestContext': {'http': {'method': method}}, 'rawPath': path}
+
+timings = {}
+start = time.perf_counter()
+import index
+timings['import'] = time.perf_counter() - start
+loaded = {name: name in sys.modules for name in ('boto3', 'pydantic')}
+
+for method, path in [('OPTIONS', '/cookies'), ('GET', '/cookies'), ('GET', '/orders')]:
+    start = time.perf_counter()
+    status = index.handler(event(method, path), None)['statusCode']
+    timings[f'{method} {path}'] = time.perf_counter() - start
+    assert status == 200, (method, path, status)
+
+print(json.dumps({'timings': timings, 'loaded': loaded}))
+"""
+
+# Respostas vazias por operação (cabeçalho X-Amz-Target)
+STUB_RESPONSES = {
+    'GetItem': {},
+    'Scan': {'Items': [], 'Count': 0, 'ScannedCount': 0},
+    'Query': {'Items': [], 'Count': 0, 'ScannedCount': 0},
+}
+
+
+class DynamoStub(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        operation = self.headers.get('X-Amz-Target', '').split('.')[-1]
+        body = json.dumps(STUB_RESPONSES.get(operation, {})).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-amz-json-1.0')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_once(src, endpoint):
+    env = dict(
+        os.environ,
+        TABLE_NAME='CookieTable', ROLLUP_TABLE_NAME='SalesRollupTable', ANALYTICS_BUCKET_NAME='lake',
+        AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='bench', AWS_SECRET_ACCESS_KEY='bench',
+        AWS_ENDPOINT_URL_DYNAMODB=endpoint, PYTHONDONTWRITEBYTECODE='',
+    )
+    out = subprocess.run([sys.executable, '-c', CHILD, src], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--src', default=DEFAULT_SRC, help="diretório src/ a medir (padrão: este repositório)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DynamoStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Primeira rodada só aquece o cache de bytecode (.pyc)
+    run_once(os.path.abspath(args.src), endpoint)
+    results = [run_once(os.path.abspath(args.src), endpoint) for _ in range(args.runs)]
+    server.shutdown()
+
+    print(f"src: {os.path.abspath(args.src)}  rodadas: {args.runs}")
+    print(f"{'etapa':<20}{'p50 (ms)':>10}{'máx (ms)':>10}")
+    for step in STEPS:
+        values = [r['timings'][step] * 1000 for r in results]
+        print(f"{step:<20}{statistics.median(values):>10.1f}{max(values):>10.1f}")
+    total = [sum(r['timings'].values()) * 1000 for r in results]
+    print(f"{'total':<20}{statistics.median(total):>10.1f}{max(total):>10.1f}")
+    loaded = results[0]['loaded']
+    print("Carregados após o init: " + ", ".join(f"{k}={'sim' if v else 'não'}" for k, v in loaded.items()))
+
+
+if __name__ == '__main__':
+    main()
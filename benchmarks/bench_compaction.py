@@ -0,0 +1,119 @@
+"""
+Benchmark: leitura de um mês do lake antes e depois da compactação.
+
+Monta um lake local com muitos arquivos pequenos por dia (como o
+stream_handler deixa) e mede o tempo de uma consulta de receita por sabor
+antes e depois de compactar. Uma latência fixa por requisição (LIST/GET)
+simula o custo de ida e volta ao S3, que é o que domina com arquivos pequenos.
+
+Uso:
+    python benchmarks/bench_compaction.py --days 30 --files-per-day 200 --latency-ms 15
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analytics import compaction, query  # noqa: E402
+from analytics.lake import LocalSource, day_prefix, days_between  # noqa: E402
+from analytics.writers import NdjsonWriter  # noqa: E402
+
+SABORES = ['Red Velvet', 'Chocolate', 'Nutella', 'Pistache', 'Doce De Leite', 'Limão', 'Oreo', 'Café']
+
+
+class LatencySource(LocalSource):
+    """LocalSource com latência fixa por requisição, como um GET/LIST no S3."""
+
+    def __init__(self, root, latency_s):
+        super().__init__(root)
+        self.latency_s = latency_s
+        self.requests = 0
+
+    def _request(self):
+        self.requests += 1
+        time.sleep(self.latency_s)
+
+    def list_objects(self, prefix):
+        self._request()
+        return super().list_objects(prefix)
+
+    def iter_lines(self, key):
+        self._request()
+        return super().iter_lines(key)
+
+    def read_bytes(self, key):
+        self._request()
+        return super().read_bytes(key)
+
+
+def build_lake(root, inicio, days, files_per_day, rows_per_file, seed):
+    rnd = random.Random(seed)
+    writer = NdjsonWriter()
+    source = LocalSource(root)
+    old = (datetime.now(timezone.utc) - timedelta(days=10)).timestamp()
+    seq = 10 ** 20
+
+    for day in days_between(inicio, inicio + timedelta(days=days - 1)):
+        for _ in range(files_per_day):
+            seq += 1
+            rows = []
+            for _ in range(rows_per_file):
+                qtd = rnd.randint(1, 6)
+                rows.append({
+                    'pedido_id': f'ord_{rnd.getrandbits(32):08x}', 'produto_id': 'k', 'sabor': rnd.choice(SABORES),
+                    'status': 'CONCLUIDO', 'data_venda': f'{day.isoformat()}T12:00:00', 'qtd': qtd,
+                    'receita_item': 10.0 * qtd, 'custo_item': 4.0 * qtd, 'custo_logistico_item': 1.0,
+                    'lucro_liquido': 6.0 * qtd - 1.0, 'sinal': 1, 'operacao': 'UPSERT', 'evento_seq': str(seq),
+                })
+            key = f"{day_prefix(day)}vendas_{seq}.json"
+            source.put_bytes(key, writer.serialize(rows))
+            os.utime(os.path.join(root, key), (old, old))
+
+
+def measure(source, inicio, fim):
+    source.requests = 0
+    start = time.perf_counter()
+    result = query.run(source, inicio, fim, group_by=('sabor',))
+    return result, time.perf_counter() - start, source.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--files-per-day', type=int, default=200)
+    parser.add_argument('--rows-per-file', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=15.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    inicio = date(2025, 1, 1)
+    fim = inicio + timedelta(days=args.days - 1)
+
+    with tempfile.TemporaryDirectory() as root:
+        build_lake(root, inicio, args.days, args.files_per_day, args.rows_per_file, args.seed)
+        source = LatencySource(root, args.latency_ms / 1000)
+
+        before, before_s, before_req = measure(source, inicio, fim)
+
+        start = time.perf_counter()
+        for day in days_between(inicio, fim):
+            compaction.compact_day(LocalSource(root), day)
+        compact_s = time.perf_counter() - start
+
+        after, after_s, after_req = measure(source, inicio, fim)
+        assert before == after, "compactação alterou o resultado da consulta"
+
+    print(f"Dias: {args.days}  arquivos/dia: {args.files_per_day}  latência simulada: {args.latency_ms} ms")
+    print(f"{'':<10}{'requisições':>14}{'leitura (s)':>14}")
+    print(f"{'antes':<10}{before_req:>14,}{before_s:>14.2f}")
+    print(f"{'depois':<10}{after_req:>14,}{after_s:>14.2f}")
+    print(f"Compactação (sem latência simulada): {compact_s:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark: latência e CPU por chamada de repositório.
+
+Compara dois diretórios src/ (por padrão, este repositório contra outro
+passado em --baseline-src, ex: um `git worktree` do commit anterior) chamando
+os mesmos métodos de repositório contra um DynamoDB local de mentira: um
+servidor HTTP, em outro processo, que devolve respostas prontas e realistas
+(pedido com 20 itens, páginas de 300 pedidos, lote de 100 cookies). Assim o
+tempo de CPU medido é só o do client: serialização, assinatura e parse.
+
+Uso:
+    git worktree add /tmp/base HEAD~1
+    python benchmarks/bench_dynamodb_client.py --baseline-src /tmp/base/src --calls 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+ORDER_ITEMS = 20
+QUERY_PAGE = 300
+SCAN_COOKIES = 50
+
+# Executado no processo filho, com o src/ escolhido no sys.path
+CHILD = r"""
+import json, statistics, sys, time
+from decimal import Decimal
+sys.path.insert(0, sys.argv[1])
+calls = int(sys.argv[2])
+
+from repositories.order_repository import OrderRepository
+from repositories.catalog_repository import CatalogRepository
+
+orders = OrderRepository()
+catalog = CatalogRepository()
+pedido = json.loads(sys.argv[3], parse_float=Decimal)
+ids = [f'ck_{i}' for i in range(100)]
+
+cases = {
+    'OrderRepository.get_by_id': lambda: orders.get_by_id('ord_1'),
+    'OrderRepository.save': lambda: orders.save(pedido),
+    'OrderRepository.list_open_orders': lambda: orders.list_open_orders(),
+    'CatalogRepository.get_many(100)': lambda: catalog.get_many(ids),
+    'CatalogRepository.list_active': lambda: catalog.list_active(),
+}
+
+results = {}
+for name, call in cases.items():
+    call()  # aquece conexão e modelos do botocore
+    wall, cpu = [], []
+    for _ in range(calls):
+        w, c = time.perf_counter(), time.process_time()
+        call()
+        wall.append(time.perf_counter() - w)
+        cpu.append(time.process_time() - c)
+    results[name] = {'p50_ms': statistics.median(wall) * 1000, 'cpu_ms': sum(cpu) / calls * 1000}
+print(json.dumps(results))
+"""
+
+
+def build_order(order_id: str) -> dict:
+    return {
+        'id': order_id, 'tipo_item': 'PEDIDO', 'cliente_nome': 'Cliente', 'status': 'RECEBIDO',
+        'criado_em': '2025-01-10T10:00:00', 'data_entrega': '2025-01-11', 'entrega_id': None,
+        'custo_entrega_rateado': None, 'valor_total_venda': Decimal('250.00'),
+        'itens': [
+            {'cookie_id': f'ck_{i}', 'sabor': f'Sabor {i}', 'qtd': 2, 'preco_venda_unitario': Decimal('12.50'),
+             'custo_producao_unitario': Decimal('4.35'), 'subtotal_venda': Decimal('25.00')}
+            for i in range(ORDER_ITEMS)
+        ],
+    }
+
+
+def build_cookie(cookie_id: str) -> dict:
+    return {'id': cookie_id, 'tipo_item': 'COOKIE', 'sabor': f'Sabor {cookie_id}', 'status': 'ATIVO',
+            'preco_venda': Decimal('12.50'), 'custo_producao': Decimal('4.35'), 'descricao': 'Cookie recheado',
+            'criado_em': '2025-01-01T10:00:00'}
+
+
+def serve(port_queue):
+    """Processo do stub: respostas pré-serializadas por operação."""
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+
+    def typed(item):
+        return {k: serializer.serialize(v) for k, v in item.items()}
+
+    order = json.dumps({'Item': typed(build_order('ord_1'))}).encode()
+    page = json.dumps({'Items': [typed(build_order(f'ord_{i}')) for i in range(QUERY_PAGE)],
+                       'Count': QUERY_PAGE, 'ScannedCount': QUERY_PAGE}).encode()
+    scan = json.dumps({'Items': [typed(build_cookie(f'ck_{i}')) for i in range(SCAN_COOKIES)],
+                       'Count': SCAN_COOKIES, 'ScannedCount': SCAN_COOKIES}).encode()
+    cookies = [typed(build_cookie(f'ck_{i}')) for i in range(100)]
+
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Sem Nagle: cabeçalho e corpo saem em writes separados
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            operation = self.headers.get('X-Amz-Target', '').split('.')[-1]
+            if operation == 'GetItem':
+                body = order
+            elif operation == 'Query':
+                # Catálogo vem do FlavorIndex (antes, de um Scan)
+                body = scan if request.get('IndexName') == 'FlavorIndex' else page
+            elif operation == 'Scan':
+                body = scan
+            elif operation == 'BatchGetItem':
+                table, spec = next(iter(request['RequestItems'].items()))
+                body = json.dumps({'Responses': {table: cookies[:len(spec['Keys'])]}, 'UnprocessedKeys': {}}).encode()
+            else:
+                body = b'{}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-amz-json-1.0')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def run_child(src, endpoint, calls):
+    env = dict(
+        os.environ, TABLE_NAME='CookieTable', AWS_DEFAULT_REGION='us-east-1',
+        AWS_ACCESS_KEY_ID='bench', AWS_SECRET_ACCESS_KEY='bench', AWS_ENDPOINT_URL_DYNAMODB=endpoint,
+    )
+    pedido = json.dumps(build_order('ord_novo'), default=str)
+    out = subprocess.run([sys.executable, '-c', CHILD, os.path.abspath(src), str(calls), pedido],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--src', default=DEFAULT_SRC)
+    parser.add_argument('--baseline-src', help="src/ a comparar (ex: worktree do commit anterior)")
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve, args=(port_queue,), daemon=True)
+    stub.start()
+    endpoint = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+
+    try:
+        runs = [('atual', run_child(args.src, endpoint, args.calls))]
+        if args.baseline_src:
+            runs.insert(0, ('baseline', run_child(args.baseline_src, endpoint, args.calls)))
+    finally:
+        stub.terminate()
+
+    print(f"Chamadas por método: {args.calls}  (p50 de latência e CPU média por chamada, em ms)")
+    header = f"{'método':<36}" + "".join(f"{label + ' p50':>16}{label + ' CPU':>16}" for label, _ in runs)
+    print(header)
+    for name in runs[0][1]:
+        line = f"{name:<36}"
+        for _, result in runs:
+            line += f"{result[name]['p50_ms']:>16.2f}{result[name]['cpu_ms']:>16.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
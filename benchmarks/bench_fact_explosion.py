@@ -0,0 +1,157 @@
+"""
+Benchmark: transformação de um lote do stream em linhas de fato.
+
+Compara o caminho antigo (TypeDeserializer na imagem inteira, um dict por
+linha com float e datetime.fromisoformat por linha) com o FactBatch (imagens
+lidas direto do formato tipado, finanças do lote inteiro numa passada em
+inteiros), com e sem o numpy, para lotes de 100, 1.000 e 10.000 registros.
+Metade dos registros são INSERTs e metade MODIFYs de status (OldImage +
+NewImage, gerando ESTORNO + UPSERT).
+
+Uso:
+    python benchmarks/bench_fact_explosion.py --records 100 1000 10000 --items 3
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+from boto3.dynamodb.types import TypeDeserializer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analytics import facts  # noqa: E402
+
+SABORES = ['Red Velvet', 'Chocolate', 'Nutella', 'Pistache', 'Doce De Leite', 'Limão', 'Oreo', 'Café']
+
+deserializer = TypeDeserializer()
+
+
+def build_image(index: int, status: str, n_items: int) -> dict:
+    itens = [
+        {'M': {'cookie_id': {'S': f'ck_{j}'}, 'sabor': {'S': SABORES[j % len(SABORES)]},
+               'qtd': {'N': str(1 + (index + j) % 4)}, 'preco_venda_unitario': {'N': '12.50'},
+               'custo_producao_unitario': {'N': '4.35'}, 'subtotal_venda': {'N': '25.00'}}}
+        for j in range(n_items)
+    ]
+    return {
+        'pk': {'S': f'PEDIDO#ord_{index}'}, 'sk': {'S': 'PEDIDO'}, 'id': {'S': f'ord_{index}'},
+        'tipo_item': {'S': 'PEDIDO'}, 'status': {'S': status}, 'cliente_nome': {'S': f'Cliente {index}'},
+        'criado_em': {'S': f'2025-01-{1 + index % 28:02d}T10:{index % 60:02d}:00'},
+        'data_entrega': {'S': '2025-02-01'}, 'valor_total_venda': {'N': '75.00'},
+        'custo_entrega_rateado': {'N': '7.00'}, 'versao': {'N': '2'}, 'itens': {'L': itens}
+    }
+
+
+def build_records(n_records: int, n_items: int) -> list:
+    records = []
+    for index in range(n_records):
+        change = {'SequenceNumber': str(1000 + index), 'NewImage': build_image(index, 'EM_ROTA', n_items)}
+        if index % 2:
+            change['OldImage'] = build_image(index, 'RECEBIDO', n_items)
+        records.append({'dynamodb': change})
+    return records
+
+
+def old_explode(item):
+    """Réplica do antigo facts.explode_order (float por linha)."""
+    base_record = {
+        "pedido_id": item['id'],
+        "data_venda": item.get('criado_em', datetime.now().isoformat()),
+        "status": item.get('status'),
+        "cliente_nome": item.get('cliente_nome'),
+        "forma_pagamento": item.get('forma_pagamento'),
+        "motoboy_custo_rateado": float(item.get('custo_entrega_rateado', 0) or 0)
+    }
+    itens = item.get('itens', [])
+    qtd_itens_total = sum(int(i.get('qtd', 0)) for i in itens)
+
+    rows = {}
+    for line_item in itens:
+        fact_row = base_record.copy()
+        fact_row['produto_id'] = line_item.get('cookie_id')
+        fact_row['sabor'] = line_item.get('sabor')
+        fact_row['qtd'] = int(line_item.get('qtd', 0))
+        preco_venda = float(line_item.get('preco_venda_unitario', 0))
+        custo_prod = float(line_item.get('custo_producao_unitario', 0))
+        fact_row['receita_item'] = preco_venda * fact_row['qtd']
+        fact_row['custo_item'] = custo_prod * fact_row['qtd']
+        if qtd_itens_total > 0:
+            fact_row['custo_logistico_item'] = base_record['motoboy_custo_rateado'] / qtd_itens_total
+        else:
+            fact_row['custo_logistico_item'] = 0
+        fact_row['lucro_liquido'] = fact_row['receita_item'] - fact_row['custo_item'] - fact_row[
+            'custo_logistico_item']
+        rows[fact_row['produto_id']] = fact_row
+    return rows
+
+
+def old_partition(data_venda):
+    dt_obj = datetime.fromisoformat(data_venda)
+    return f"year={dt_obj.year}/month={dt_obj.month:02d}/day={dt_obj.day:02d}"
+
+
+def old_transform(records):
+    out = []
+    for record in records:
+        change = record['dynamodb']
+        old_image = change.get('OldImage')
+        new_image = change.get('NewImage')
+        old_item = {k: deserializer.deserialize(v) for k, v in old_image.items()} if old_image else None
+        new_item = {k: deserializer.deserialize(v) for k, v in new_image.items()} if new_image else None
+        rows = facts.diff_rows(old_explode(old_item) if old_item else {}, old_explode(new_item) if new_item else {},
+                               change['SequenceNumber'])
+        out.extend({"path": old_partition(row['data_venda']), "row": row} for row in rows)
+    return out
+
+
+def new_transform(records):
+    batch = facts.FactBatch()
+    changes = []
+    for record in records:
+        change = record['dynamodb']
+        old_image = change.get('OldImage')
+        new_image = change.get('NewImage')
+        changes.append((change['SequenceNumber'], batch.add_image(old_image) if old_image else None,
+                        batch.add_image(new_image) if new_image else None))
+
+    exploded = batch.explode()
+    out = []
+    for sequence, old_index, new_index in changes:
+        rows = facts.diff_rows(exploded[old_index] if old_index is not None else {},
+                               exploded[new_index] if new_index is not None else {}, sequence)
+        out.extend({"path": facts.partition_for(row['data_venda']), "row": row} for row in rows)
+    return out
+
+
+def measure(func, records, repeat):
+    # Melhor de 5 rodadas, para reduzir ruído do sistema
+    return min(timeit.repeat(lambda: func(records), number=repeat, repeat=5)) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--items', type=int, default=3, help="itens por pedido")
+    args = parser.parse_args()
+
+    numpy = facts.np
+    print(f"{'registros':>10} {'linhas':>8} {'antigo (ms)':>12} {'lote numpy (ms)':>16} {'lote python (ms)':>17}")
+    for n_records in args.records:
+        records = build_records(n_records, args.items)
+        repeat = max(1, 2000 // n_records)
+        rows = len(new_transform(records))
+
+        old = measure(old_transform, records, repeat)
+        facts.np = numpy
+        vectorized = measure(new_transform, records, repeat) if numpy is not None else float('nan')
+        facts.np = None
+        pure = measure(new_transform, records, repeat)
+        facts.np = numpy
+
+        print(f"{n_records:>10} {rows:>8} {old * 1000:>12.2f} {vectorized * 1000:>16.2f} {pure * 1000:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: NDJSON x Parquet para as linhas de fato do Data Lake.
+
+Gera linhas no mesmo formato que o stream_handler grava e compara, para um
+arquivo de partição, bytes gravados, tempo de escrita e tempo de leitura
+de uma consulta típica (receita por sabor).
+
+Uso:
+    python benchmarks/bench_lake_formats.py --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analytics.writers import NdjsonWriter, ParquetWriter  # noqa: E402
+
+SABORES = ['Red Velvet', 'Chocolate', 'Nutella', 'Pistache', 'Doce De Leite', 'Limão', 'Oreo', 'Café']
+STATUS = ['RECEBIDO', 'EM_PREPARO', 'EM_ROTA', 'CONCLUIDO', 'EXTRAVIADO']
+
+
+def generate_rows(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        qtd = rnd.randint(1, 12)
+        preco = rnd.choice([8.5, 9.0, 10.0, 12.5])
+        custo = round(preco * 0.4, 2)
+        rateado = rnd.choice([0.0, 5.0, 7.5, 10.0])
+        logistico = rateado / qtd
+        rows.append({
+            "pedido_id": f"ord_{i // 3:08x}",
+            "data_venda": f"2025-01-10T{rnd.randint(8, 20):02d}:{rnd.randint(0, 59):02d}:00",
+            "status": rnd.choice(STATUS),
+            "cliente_nome": f"Cliente {rnd.randint(1, 5000)}",
+            "forma_pagamento": None,
+            "motoboy_custo_rateado": rateado,
+            "produto_id": f"cookie-{rnd.randint(1, 40)}",
+            "sabor": rnd.choice(SABORES),
+            "qtd": qtd,
+            "receita_item": preco * qtd,
+            "custo_item": custo * qtd,
+            "custo_logistico_item": logistico,
+            "lucro_liquido": preco * qtd - custo * qtd - logistico,
+            "fato_id": f"ord_{i // 3:08x}#cookie-{i % 3}",
+            "operacao": "UPSERT",
+            "sinal": 1,
+            "evento_seq": str(10 ** 20 + i),
+        })
+    return rows
+
+
+def scan_ndjson(payload: bytes) -> dict:
+    totals = defaultdict(float)
+    for line in payload.splitlines():
+        row = json.loads(line)
+        totals[row['sabor']] += row['receita_item']
+    return totals
+
+
+def scan_parquet(payload: bytes) -> dict:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(pa.BufferReader(payload), columns=['sabor', 'receita_item'])
+    grouped = table.group_by('sabor').aggregate([('receita_item', 'sum')])
+    return dict(zip(grouped['sabor'].to_pylist(), grouped['receita_item_sum'].to_pylist()))
+
+
+def timed(fn, *args, repeat: int = 3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows, args.seed)
+    print(f"Linhas de fato: {len(rows)}")
+    print(f"{'formato':<10}{'bytes':>14}{'escrita (s)':>14}{'leitura (s)':>14}")
+
+    for name, writer, scan in (
+        ('ndjson', NdjsonWriter(), scan_ndjson),
+        ('parquet', ParquetWriter(), scan_parquet),
+    ):
+        payload, write_time = timed(writer.serialize, rows)
+        _, scan_time = timed(scan, payload)
+        print(f"{name:<10}{len(payload):>14,}{write_time:>14.3f}{scan_time:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
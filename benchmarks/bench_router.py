@@ -0,0 +1,99 @@
+"""
+Benchmark: custo de despacho por requisição.
+
+Compara o Router (árvore de segmentos compilada no import) com uma réplica da
+antiga cadeia de if/elif do index.handler, resolvendo uma mistura de paths
+reais da API. A réplica só encontra a rota: não chama serviço nenhum.
+
+Uso:
+    python benchmarks/bench_router.py --requests 200000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from core.router import Router  # noqa: E402
+
+# (método, path) na proporção aproximada de uso da API
+REQUESTS = [
+    ('GET', '/cookies'), ('GET', '/orders'), ('GET', '/orders'), ('POST', '/orders'),
+    ('PATCH', '/orders/ord_123/status'), ('PATCH', '/orders/ord_456/status'),
+    ('POST', '/orders/ord_789/loss'), ('PUT', '/cookies/ck_1'), ('POST', '/logistics/routes'),
+    ('GET', '/analytics/daily'), ('GET', '/analytics/sales'), ('GET', '/nao/existe'),
+]
+
+ROUTES = [
+    ('GET', '/cookies'), ('POST', '/cookies'), ('PUT', '/cookies/{cookie_id}'),
+    ('GET', '/orders'), ('POST', '/orders'), ('PATCH', '/orders/{pedido_id}/status'),
+    ('POST', '/orders/{pedido_id}/loss'), ('POST', '/logistics/routes'),
+    ('GET', '/analytics/daily'), ('GET', '/analytics/sales'),
+]
+
+
+def build_router():
+    router = Router()
+    for method, pattern in ROUTES:
+        router.route(method, pattern)(lambda event, **params: None)
+    return router
+
+
+def legacy_dispatch(method, path):
+    """Réplica da cadeia de if/elif (com split manual) usada antes do Router."""
+    if path == '/cookies':
+        if method == 'GET':
+            return 'list_cookies', {}
+        elif method == 'POST':
+            return 'create_cookie', {}
+    elif path == '/orders':
+        if method == 'GET':
+            return 'list_orders', {}
+        elif method == 'POST':
+            return 'create_order', {}
+    elif path == '/logistics/routes' and method == 'POST':
+        return 'create_route', {}
+    elif path.startswith('/cookies/') and method == 'PUT':
+        return 'update_cookie', {'cookie_id': path.split('/')[-1]}
+    elif path.startswith('/orders/') and path.endswith('/status') and method == 'PATCH':
+        return 'update_status', {'pedido_id': path.split('/')[2]}
+    elif path.startswith('/orders/') and path.endswith('/loss') and method == 'POST':
+        return 'register_loss', {'pedido_id': path.split('/')[2]}
+    elif path == '/analytics/daily' and method == 'GET':
+        return 'daily_sales', {}
+    elif path == '/analytics/sales' and method == 'GET':
+        return 'query_sales', {}
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200000)
+    args = parser.parse_args()
+
+    router = build_router()
+    rounds = max(1, args.requests // len(REQUESTS))
+    total = rounds * len(REQUESTS)
+
+    def run_router():
+        for method, path in REQUESTS:
+            router.resolve(method, path)
+
+    def run_legacy():
+        for method, path in REQUESTS:
+            legacy_dispatch(method, path)
+
+    compile_s = timeit.timeit(build_router, number=100) / 100
+    router_s = min(timeit.repeat(run_router, number=rounds, repeat=5))
+    legacy_s = min(timeit.repeat(run_legacy, number=rounds, repeat=5))
+
+    print(f"Requisições: {total:,}  rotas: {len(ROUTES)}")
+    print(f"Compilação das rotas (import): {compile_s * 1e6:.1f} µs")
+    print(f"{'despacho':<12}{'µs/req':>10}")
+    print(f"{'Router':<12}{router_s / total * 1e6:>10.2f}")
+    print(f"{'if/elif':<12}{legacy_s / total * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,719 @@
+"""
+Teste de carga offline: API (index.handler) e stream (stream_handler.handler).
+
+Sobe um DynamoDB/S3 em processo (moto) com as mesmas tabelas e índices do
+CookieAdminServerlessStack, popula catálogo, pedidos, histórico e lake com
+um gerador determinístico (--seed) e chama os handlers como o Lambda chama:
+eventos do HTTP API (payload 2.0) para cada rota e lotes sintéticos do
+DynamoDB Stream para o stream_handler. Por rota (e por tamanho de lote):
+
+- latência p50/p95/p99 do handler, descontado o tempo gasto dentro do
+  stand-in (que não representa o DynamoDB real) e no próprio medidor;
+- RCU/WCU estimados por requisição, pelas regras de cobrança do DynamoDB
+  (o moto devolve valores fixos): leitura em blocos de 4 KB, metade se
+  eventualmente consistente; escrita em blocos de 1 KB, em dobro numa
+  transação, mais uma escrita por GSI em que o item aparece;
+- bytes de item lidos/gravados, bytes no S3 e tamanho da resposta.
+
+Os resultados são comparados com a baseline salva (benchmarks/baselines/):
+capacidade e bytes são determinísticos para a mesma seed, então qualquer
+aumento acima de --capacity-tolerance é regressão; latência depende da
+máquina e tem tolerância própria (--latency-tolerance). Com regressão, a
+saída é 1.
+
+O moto não é thread-safe: as chamadas ao stand-in são serializadas, mas as
+threads da aplicação (lotes, rotas em paralelo) continuam as mesmas. Uma
+rodada completa leva alguns minutos, quase todos dentro do moto.
+
+Uso:
+    python benchmarks/load_test.py                      # compara com a baseline
+    python benchmarks/load_test.py --update-baseline    # grava a baseline atual
+    python benchmarks/load_test.py --only api --iterations 50
+"""
+import argparse
+import base64
+import contextlib
+import gzip
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import types
+from collections import defaultdict, deque
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'load_test.json')
+
+TABLE_NAME = 'CookiesTable-v2-load'
+HISTORY_TABLE_NAME = 'OrderHistoryTable-load'
+ROLLUP_TABLE_NAME = 'SalesRollupTable-load'
+BUCKET_NAME = 'cookie-admin-datalake-load'
+
+# Chaves e GSIs (hash, range) de cada tabela, como no CookieAdminServerlessStack
+TABLES = {
+    TABLE_NAME: (('pk', 'sk'), {
+        'StatusIndex': ('status', 'criado_em'),
+        'DeliveryIndex': ('mes_entrega', 'data_entrega'),
+        'FlavorIndex': ('tipo_item', 'sabor'),
+    }),
+    HISTORY_TABLE_NAME: (('pedido_id', 'chave'), {}),
+    ROLLUP_TABLE_NAME: (('metrica', 'chave'), {}),
+}
+
+SABORES = ['Red Velvet', 'Chocolate', 'Nutella', 'Pistache', 'Doce De Leite', 'Limão', 'Oreo', 'Café']
+CLIENTES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabi', 'Heitor']
+
+# Loja e dias usados pelos pedidos sintéticos
+ORIGEM = (-23.5614, -46.6559)
+PLAN_DAY = '2025-03-01'
+ORDER_DAYS = [f'2025-03-{day:02d}' for day in range(2, 16)]
+PLAN_DAY_ORDERS = 60
+HISTORY_ORDERS = 30
+
+# Lotes do stream: pedidos criados em janeiro de 2025 (consultados por /analytics)
+LAKE_MONTH = ('2025-01-01', '2025-01-31')
+
+METRICS = ('chamadas', 'rcu', 'wcu', 'bytes_lidos', 'bytes_gravados', 's3_bytes', 'resposta_bytes')
+CAPACITY_METRICS = ('rcu', 'wcu', 'bytes_lidos', 'bytes_gravados', 's3_bytes')
+
+# Diferenças de latência abaixo disso são ruído, qualquer que seja a porcentagem
+LATENCY_NOISE_MS = 2.0
+
+READ_BLOCK = 4096
+WRITE_BLOCK = 1024
+
+
+# --- Tamanho de item e unidades de capacidade -------------------------------
+
+def item_size(item: dict) -> int:
+    """Tamanho de um item no formato tipado, pelas regras do DynamoDB."""
+    return sum(len(name.encode()) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value: dict) -> int:
+    (kind, data), = value.items()
+    if kind == 'S':
+        return len(data.encode())
+    if kind == 'N':
+        return _number_size(data)
+    if kind == 'B':
+        return len(base64.b64decode(data)) if isinstance(data, str) else len(data)
+    if kind in ('BOOL', 'NULL'):
+        return 1
+    if kind == 'L':
+        return 3 + sum(1 + _value_size(v) for v in data)
+    if kind == 'M':
+        return 3 + sum(1 + len(k.encode()) + _value_size(v) for k, v in data.items())
+    if kind == 'SS':
+        return sum(len(v.encode()) for v in data)
+    if kind == 'NS':
+        return sum(_number_size(v) for v in data)
+    if kind == 'BS':
+        return sum(_value_size({'B': v}) for v in data)
+    return 0
+
+
+def _number_size(text: str) -> int:
+    # 1 byte a cada dois dígitos significativos, mais 1
+    mantissa = text.lstrip('-').lower().split('e')[0].replace('.', '').strip('0')
+    return (len(mantissa) + 1) // 2 + 1
+
+
+def read_units(size: int, consistent: bool = False) -> float:
+    return max(1, math.ceil(size / READ_BLOCK)) * (1.0 if consistent else 0.5)
+
+
+def write_units(size: int) -> float:
+    return float(max(1, math.ceil(size / WRITE_BLOCK)))
+
+
+class CapacityMeter:
+    """
+    Acumula, por rótulo (rota ou lote), as chamadas ao DynamoDB e ao S3 com a
+    capacidade estimada e os bytes de item. Registrado nos eventos do
+    botocore da sessão padrão: vale para todo client criado depois.
+    """
+
+    def __init__(self):
+        # Client fora da sessão medida: lê o item depois de um UpdateItem
+        # (a escrita é cobrada pelo tamanho do item resultante)
+        self.peek_client = None
+        self.label = None
+        self.totals = defaultdict(lambda: dict.fromkeys(METRICS, 0.0))
+        # Tempo fora da aplicação (stand-in e o próprio medidor), descontado da latência
+        self.excluded_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, events):
+        events.register('provide-client-params.dynamodb', self._keep_params)
+        events.register('after-call.dynamodb', self._after_dynamodb)
+        events.register('provide-client-params.s3.PutObject', self._s3_put)
+        events.register('after-call.s3', self._after_s3)
+
+    @contextlib.contextmanager
+    def scope(self, label: str):
+        self.label = label
+        try:
+            yield self.totals[label]
+        finally:
+            self.label = None
+
+    def _add(self, **values):
+        if self.label is None:
+            return
+        with self._lock:
+            totals = self.totals[self.label]
+            for name, value in values.items():
+                totals[name] += value
+
+    def _keep_params(self, params, context, **kwargs):
+        context['load_test_params'] = params
+
+    def _after_dynamodb(self, parsed, model, context, **kwargs):
+        if self.label is None:
+            return
+        # O tempo do stand-in durante a medição já está dentro deste intervalo
+        excluded, start = self.excluded_seconds, time.perf_counter()
+        try:
+            self._measure(parsed, model.name, context.get('load_test_params', {}))
+        finally:
+            self.excluded_seconds = excluded + (time.perf_counter() - start)
+
+    def _measure(self, parsed: dict, operation: str, params: dict):
+        failed = 'Error' in parsed
+        rcu = wcu = read = written = 0.0
+
+        if operation == 'GetItem':
+            size = item_size(parsed.get('Item') or {})
+            rcu, read = read_units(size, params.get('ConsistentRead', False)), size
+        elif operation in ('Query', 'Scan'):
+            size = sum(item_size(item) for item in parsed.get('Items', []))
+            rcu, read = read_units(size, params.get('ConsistentRead', False)), size
+        elif operation == 'BatchGetItem':
+            for table, spec in params.get('RequestItems', {}).items():
+                found = parsed.get('Responses', {}).get(table, [])
+                consistent = spec.get('ConsistentRead', False)
+                for item in found:
+                    size = item_size(item)
+                    rcu, read = rcu + read_units(size, consistent), read + size
+                rcu += read_units(0, consistent) * max(0, len(spec.get('Keys', [])) - len(found))
+        elif operation == 'TransactGetItems':
+            for response in parsed.get('Responses', []):
+                size = item_size(response.get('Item') or {})
+                rcu, read = rcu + 2 * read_units(size, True), read + size
+        elif operation in ('PutItem', 'UpdateItem', 'DeleteItem'):
+            wcu, written = self._write(operation, params, failed)
+        elif operation == 'BatchWriteItem':
+            for table, requests in params.get('RequestItems', {}).items():
+                for request in requests:
+                    (kind, spec), = request.items()
+                    units, size = self._write('PutItem' if kind == 'PutRequest' else 'DeleteItem',
+                                              {'TableName': table, **spec}, failed)
+                    wcu, written = wcu + units, written + size
+        elif operation == 'TransactWriteItems':
+            for action in params.get('TransactItems', []):
+                (kind, spec), = action.items()
+                units, size = self._write(f'{kind}Item' if kind != 'ConditionCheck' else kind, spec, failed)
+                wcu, written = wcu + 2 * units, written + size
+
+        self._add(chamadas=1, rcu=rcu, wcu=wcu, bytes_lidos=read, bytes_gravados=written)
+
+    def _write(self, operation: str, params: dict, failed: bool):
+        """(WCU, bytes) de uma escrita, incluindo as cópias nos GSIs."""
+        table = params.get('TableName')
+        if failed or operation in ('DeleteItem', 'ConditionCheck'):
+            return 1.0, 0
+        if operation == 'PutItem':
+            item = params.get('Item', {})
+        else:
+            item = self.peek_client.get_item(TableName=table, Key=params['Key'], ConsistentRead=True).get('Item', {})
+
+        size = item_size(item)
+        units = write_units(size)
+        _, indexes = TABLES.get(table, ((), {}))
+        for hash_key, range_key in indexes.values():
+            if hash_key in item and range_key in item:
+                units += write_units(size)
+        return units, size
+
+    def _s3_put(self, params, **kwargs):
+        body = params.get('Body') or b''
+        self._add(s3_bytes=len(body))
+
+    def _after_s3(self, parsed, model, **kwargs):
+        read = parsed.get('ContentLength', 0) if model.name == 'GetObject' else 0
+        self._add(chamadas=1, s3_bytes=read)
+
+
+# --- Gerador determinístico ---------------------------------------------------
+
+class Workload:
+    """Catálogo, pedidos, localizações e registros do stream, reproduzíveis pela seed."""
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+        self.sequence = 10 ** 20
+
+    def cookie(self, index: int) -> dict:
+        preco = self.random.choice(['9.90', '12.50', '14.00', '15.90'])
+        return {
+            'sabor': f"{SABORES[index % len(SABORES)]} {index:04d}",
+            'preco_venda': preco,
+            'custo_producao': f"{float(preco) * self.random.uniform(0.3, 0.45):.2f}",
+            'descricao': 'Cookie recheado, 120 g'
+        }
+
+    def order(self, cookie_ids: list, day: str) -> dict:
+        chosen = self.random.sample(cookie_ids, self.random.randint(1, 4))
+        return {
+            'cliente_nome': f"{self.random.choice(CLIENTES)} {self.random.randint(1, 999)}",
+            'data_entrega': day,
+            'itens': [{'cookie_id': cookie_id, 'qtd': self.random.randint(1, 6)} for cookie_id in chosen]
+        }
+
+    def location(self) -> dict:
+        return {'lat': round(ORIGEM[0] + self.random.uniform(-0.06, 0.06), 6),
+                'lng': round(ORIGEM[1] + self.random.uniform(-0.06, 0.06), 6)}
+
+    def stream_batch(self, size: int, order_ids: deque) -> list:
+        """Lote do stream: metade pedidos novos (INSERT), metade mudanças de status (MODIFY)."""
+        records = []
+        for _ in range(size):
+            self.sequence += 1
+            if order_ids and self.random.random() < 0.5:
+                old = order_ids.popleft()
+                new = dict(old, status={'S': 'EM_ROTA'}, custo_entrega_rateado={'N': '7.5'})
+                change = {'OldImage': old, 'NewImage': new}
+            else:
+                new = self._order_image()
+                order_ids.append(new)
+                change = {'NewImage': new}
+            change.update(SequenceNumber=str(self.sequence), StreamViewType='NEW_AND_OLD_IMAGES')
+            records.append({'eventName': 'MODIFY' if 'OldImage' in change else 'INSERT',
+                            'eventSource': 'aws:dynamodb', 'dynamodb': change})
+        return records
+
+    def _order_image(self) -> dict:
+        pedido_id = f"ord_{self.random.getrandbits(32):08x}"
+        itens = []
+        for index in self.random.sample(range(len(SABORES)), self.random.randint(1, 4)):
+            qtd = self.random.randint(1, 6)
+            itens.append({'M': {
+                'cookie_id': {'S': f'ck_{index}'}, 'sabor': {'S': SABORES[index]}, 'qtd': {'N': str(qtd)},
+                'preco_venda_unitario': {'N': '12.5'}, 'custo_producao_unitario': {'N': '4.35'},
+                'subtotal_venda': {'N': str(12.5 * qtd)}
+            }})
+        dia = self.random.randint(1, 28)
+        return {
+            'pk': {'S': f'PEDIDO#{pedido_id}'}, 'sk': {'S': 'PEDIDO'}, 'id': {'S': pedido_id},
+            'tipo_item': {'S': 'PEDIDO'}, 'status': {'S': 'RECEBIDO'},
+            'cliente_nome': {'S': self.random.choice(CLIENTES)},
+            'criado_em': {'S': f'2025-01-{dia:02d}T{self.random.randint(8, 20):02d}:00:00'},
+            'data_entrega': {'S': f'2025-01-{dia:02d}'}, 'valor_total_venda': {'N': '50'},
+            'custo_entrega_rateado': {'NULL': True}, 'versao': {'N': '1'}, 'itens': {'L': itens}
+        }
+
+
+def api_event(method: str, route: str, path: str = None, body=None, query: dict = None) -> dict:
+    """Evento do API Gateway HTTP API (payload 2.0), como o Lambda recebe."""
+    path = path or route
+    now = time.time()
+    event = {
+        'version': '2.0',
+        'routeKey': f'{method} {route}',
+        'rawPath': path,
+        'rawQueryString': urlencode(query or {}),
+        'headers': {
+            'accept': 'application/json',
+            'accept-encoding': 'gzip, deflate, br',
+            'content-type': 'application/json',
+            'host': 'api.cookie-admin.example',
+            'user-agent': 'Mozilla/5.0 (load-test)',
+            'x-forwarded-for': '203.0.113.10',
+        },
+        'requestContext': {
+            'accountId': '123456789012',
+            'apiId': 'loadtest',
+            'domainName': 'api.cookie-admin.example',
+            'http': {'method': method, 'path': path, 'protocol': 'HTTP/1.1',
+                     'sourceIp': '203.0.113.10', 'userAgent': 'Mozilla/5.0 (load-test)'},
+            'requestId': f'req-{int(now * 1e6)}',
+            'routeKey': f'{method} {route}',
+            'stage': '$default',
+            'timeEpoch': int(now * 1000),
+        },
+        'isBase64Encoded': False,
+    }
+    if query:
+        event['queryStringParameters'] = query
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+
+# --- Ambiente --------------------------------------------------------------------
+
+def setup_environment():
+    """Variáveis do Lambda, stand-in em processo, tabelas/bucket e o medidor."""
+    os.environ.update(
+        AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='load-test', AWS_SECRET_ACCESS_KEY='load-test',
+        TABLE_NAME=TABLE_NAME, HISTORY_TABLE_NAME=HISTORY_TABLE_NAME, ROLLUP_TABLE_NAME=ROLLUP_TABLE_NAME,
+        ANALYTICS_BUCKET_NAME=BUCKET_NAME, ANALYTICS_FORMAT='ndjson',
+    )
+    os.environ.pop('AWS_PROFILE', None)
+
+    import boto3
+    from moto import mock_aws
+    from moto.core.models import botocore_stubber
+
+    meter = CapacityMeter()
+    mock_aws().start()
+    _serialize_stand_in(botocore_stubber, meter)
+    _snapshot_tables_once()
+
+    admin = boto3.session.Session()
+    dynamodb = admin.client('dynamodb')
+    for table, ((hash_key, range_key), indexes) in TABLES.items():
+        attributes = {hash_key, range_key, *(name for keys in indexes.values() for name in keys)}
+        params = {
+            'TableName': table,
+            'KeySchema': [{'AttributeName': hash_key, 'KeyType': 'HASH'},
+                          {'AttributeName': range_key, 'KeyType': 'RANGE'}],
+            'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attributes)],
+            'BillingMode': 'PAY_PER_REQUEST',
+        }
+        if indexes:
+            params['GlobalSecondaryIndexes'] = [
+                {'IndexName': name, 'Projection': {'ProjectionType': 'ALL'},
+                 'KeySchema': [{'AttributeName': h, 'KeyType': 'HASH'}, {'AttributeName': r, 'KeyType': 'RANGE'}]}
+                for name, (h, r) in indexes.items()
+            ]
+        dynamodb.create_table(**params)
+    admin.client('s3').create_bucket(Bucket=BUCKET_NAME)
+
+    meter.peek_client = dynamodb
+    boto3.setup_default_session()
+    meter.register(boto3.DEFAULT_SESSION.events)
+    return meter
+
+
+def _serialize_stand_in(stubber, meter: CapacityMeter):
+    """Uma chamada por vez no moto, medindo o tempo gasto nele."""
+    lock = threading.Lock()
+    process_request = stubber.process_request
+
+    def serialized(request):
+        with lock:
+            start = time.perf_counter()
+            try:
+                return process_request(request)
+            finally:
+                meter.excluded_seconds += time.perf_counter() - start
+
+    stubber.process_request = serialized
+
+
+def _snapshot_tables_once():
+    """
+    O TransactWriteItems do moto copia a tabela inteira (para o rollback)
+    uma vez por ação da transação, o que torna as rotas transacionais
+    quadráticas no tamanho da tabela. Aqui cada objeto é copiado uma vez por
+    transação; como nenhuma chave se repete numa transação, as cópias são
+    as mesmas.
+    """
+    import copy
+    from moto.dynamodb import models
+
+    transact_write_items = models.DynamoDBBackend.transact_write_items
+
+    def once_per_transaction(backend, transact_items):
+        copies = {}
+
+        def deepcopy(obj, memo=None):
+            if id(obj) not in copies:
+                copies[id(obj)] = (obj, copy.deepcopy(obj))
+            return copies[id(obj)][1]
+
+        models.copy = types.SimpleNamespace(deepcopy=deepcopy)
+        try:
+            return transact_write_items(backend, transact_items)
+        finally:
+            models.copy = copy
+
+    models.DynamoDBBackend.transact_write_items = once_per_transaction
+
+
+LAMBDA_CONTEXT = types.SimpleNamespace(function_name='load-test', aws_request_id='load-test',
+                                       get_remaining_time_in_millis=lambda: 10_000)
+
+
+def call(handler, event):
+    # Os handlers imprimem progresso (ex: "Salvo no S3"); fora da medição
+    with contextlib.redirect_stdout(io.StringIO()):
+        return handler(event, LAMBDA_CONTEXT)
+
+
+def expect(response: dict, *statuses):
+    """Confere o status e devolve o corpo já decodificado (a resposta pode vir comprimida)."""
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded'):
+        data = base64.b64decode(body)
+        encoding = response['headers'].get('Content-Encoding')
+        if encoding == 'gzip':
+            data = gzip.decompress(data)
+        elif encoding == 'br':
+            import brotli
+            data = brotli.decompress(data)
+        body = data.decode()
+    if response['statusCode'] not in statuses:
+        raise RuntimeError(f"Resposta {response['statusCode']} inesperada: {body[:300]}")
+    return json.loads(body) if body else None
+
+
+# --- Cenários --------------------------------------------------------------------
+
+def seed_data(index, stream_handler, workload: Workload, iterations: int) -> dict:
+    """Catálogo, pedidos (um estoque por rota que os consome), histórico e lake."""
+    cookies = [expect(call(index.handler, api_event('POST', '/cookies', body=workload.cookie(i))), 201)
+               for i in range(len(SABORES) * 2)]
+    cookie_ids = [cookie['id'] for cookie in cookies]
+
+    def create(days: list) -> list:
+        ids = []
+        for start in range(0, len(days), 100):
+            payloads = [workload.order(cookie_ids, day) for day in days[start:start + 100]]
+            result = expect(call(index.handler, api_event('POST', '/orders/batch', body={'pedidos': payloads})), 200)
+            ids += [r['pedido']['id'] for r in result['resultados'] if r['status'] == 201]
+        return ids
+
+    # Cada iteração consome: 1 (status) + 20 (status em lote) + 1 (extravio) + 5 (rota)
+    stock = create([ORDER_DAYS[i % len(ORDER_DAYS)] for i in range(iterations * 27)])
+    plan_orders = create([PLAN_DAY] * PLAN_DAY_ORDERS)
+    history_orders = create([ORDER_DAYS[0]] * HISTORY_ORDERS)
+    for pedido_id in history_orders:
+        for status in ('EM_PREPARO', 'EM_ROTA'):
+            expect(call(index.handler, api_event('PATCH', '/orders/{pedido_id}/status', f'/orders/{pedido_id}/status',
+                                                 body={'status': status})), 200)
+
+    # Lake e agregados de janeiro/2025, para as rotas de /analytics
+    open_images = deque()
+    for _ in range(3):
+        call(stream_handler.handler, {'Records': workload.stream_batch(200, open_images)})
+
+    return {
+        'cookie_ids': cookie_ids,
+        'stock': deque(stock),
+        'plan': {pedido_id: workload.location() for pedido_id in plan_orders},
+        'history': history_orders,
+        'stream_images': open_images,
+    }
+
+
+def api_scenarios(workload: Workload, data: dict) -> list:
+    """(rota, fábrica de eventos por iteração, status esperados)."""
+    stock = data['stock']
+    cookie_ids = data['cookie_ids']
+
+    def take(n: int) -> list:
+        return [stock.popleft() for _ in range(n)]
+
+    plan_body = {
+        'data_entrega': PLAN_DAY,
+        'origem': {'lat': ORIGEM[0], 'lng': ORIGEM[1]},
+        'motoboys': [{'nome': f'Motoboy {i}', 'capacidade': 60, 'custo_base': '12.00', 'custo_km': '1.10'}
+                     for i in range(4)],
+        'locais': data['plan'],
+        'confirmar': False,
+    }
+
+    return [
+        ('GET /cookies', lambda i: api_event('GET', '/cookies'), (200,)),
+        ('POST /cookies', lambda i: api_event('POST', '/cookies', body=workload.cookie(1000 + i)), (201,)),
+        ('PUT /cookies/{cookie_id}', lambda i: api_event(
+            'PUT', '/cookies/{cookie_id}', f'/cookies/{cookie_ids[i % len(cookie_ids)]}',
+            body={'preco_venda': f'{12 + i % 5}.50'}), (200,)),
+        ('GET /orders', lambda i: api_event('GET', '/orders'), (200,)),
+        ('GET /orders?status', lambda i: api_event(
+            'GET', '/orders', query={'status': 'RECEBIDO', 'limit': '50'}), (200,)),
+        ('GET /orders?entrega', lambda i: api_event(
+            'GET', '/orders', query={'entrega_de': ORDER_DAYS[0], 'entrega_ate': ORDER_DAYS[2], 'limit': '50'}),
+         (200,)),
+        ('POST /orders', lambda i: api_event(
+            'POST', '/orders', body=workload.order(cookie_ids, ORDER_DAYS[i % len(ORDER_DAYS)])), (201,)),
+        ('POST /orders/batch', lambda i: api_event('POST', '/orders/batch', body={
+            'pedidos': [workload.order(cookie_ids, ORDER_DAYS[-1]) for _ in range(25)]}), (200,)),
+        ('PATCH /orders/{pedido_id}/status', lambda i: _path_event(
+            'PATCH', '/orders/{pedido_id}/status', take(1)[0], {'status': 'EM_PREPARO'}), (200,)),
+        ('PATCH /orders/status:batch', lambda i: api_event(
+            'PATCH', '/orders/status:batch', body={'ids': take(20), 'status': 'EM_PREPARO'}), (200,)),
+        ('GET /orders/{pedido_id}/history', lambda i: api_event(
+            'GET', '/orders/{pedido_id}/history', f"/orders/{data['history'][i % HISTORY_ORDERS]}/history",
+            query={'limit': '20'}), (200,)),
+        ('POST /orders/{pedido_id}/loss', lambda i: _path_event(
+            'POST', '/orders/{pedido_id}/loss', take(1)[0], {'motivo': 'Caiu da moto'}), (200,)),
+        ('POST /logistics/routes', lambda i: api_event('POST', '/logistics/routes', body={
+            'motoboy_nome': f'Motoboy {i % 4}', 'custo_total': '30.00', 'pedidos_ids': take(5)}), (200,)),
+        ('POST /logistics/plan', lambda i: api_event('POST', '/logistics/plan', body=plan_body), (200,)),
+        ('GET /analytics/daily', lambda i: api_event(
+            'GET', '/analytics/daily', query={'inicio': LAKE_MONTH[0], 'fim': LAKE_MONTH[1]}), (200,)),
+        ('GET /analytics/sales', lambda i: api_event(
+            'GET', '/analytics/sales', query={'inicio': LAKE_MONTH[0], 'fim': LAKE_MONTH[1], 'group_by': 'sabor'}),
+         (200,)),
+    ]
+
+
+def _path_event(method: str, route: str, pedido_id: str, body: dict) -> dict:
+    return api_event(method, route, route.replace('{pedido_id}', pedido_id), body=body)
+
+
+def run_api(index, meter: CapacityMeter, scenarios: list, iterations: int) -> dict:
+    results = {}
+    for route, build, statuses in scenarios:
+        latencies, response_bytes = [], 0
+        with meter.scope(route) as totals:
+            for i in range(iterations):
+                event = build(i)
+                response, latency = timed(meter, index.handler, event)
+                latencies.append(latency)
+                expect(response, *statuses)
+                response_bytes += len(response.get('body') or '')
+            totals['resposta_bytes'] += response_bytes
+        results[route] = summarize(latencies, meter.totals[route])
+    return results
+
+
+def run_stream(stream_handler, meter: CapacityMeter, workload: Workload, data: dict,
+               sizes: list, batches: int) -> dict:
+    results = {}
+    for size in sizes:
+        label = f'stream {size} registros'
+        latencies = []
+        with meter.scope(label):
+            for _ in range(batches):
+                event = {'Records': workload.stream_batch(size, data['stream_images'])}
+                response, latency = timed(meter, stream_handler.handler, event)
+                latencies.append(latency)
+                if response['batchItemFailures']:
+                    raise RuntimeError(f"Lote com falhas: {response['batchItemFailures']}")
+        results[label] = summarize(latencies, meter.totals[label])
+    return results
+
+
+def timed(meter: CapacityMeter, handler, event):
+    """(resposta, latência do handler sem o tempo gasto dentro do stand-in)."""
+    stand_in = meter.excluded_seconds
+    start = time.perf_counter()
+    response = call(handler, event)
+    elapsed = time.perf_counter() - start
+    return response, elapsed - (meter.excluded_seconds - stand_in)
+
+
+def summarize(latencies: list, totals: dict) -> dict:
+    """Percentis de latência (ms) e médias por requisição."""
+    ms = sorted(latency * 1000 for latency in latencies)
+    cuts = statistics.quantiles(ms, n=100, method='inclusive') if len(ms) > 1 else ms * 99
+    result = {'n': len(ms), 'p50_ms': cuts[49], 'p95_ms': cuts[94], 'p99_ms': cuts[98]}
+    for metric in METRICS:
+        result[metric] = totals[metric] / len(ms)
+    return {name: round(value, 3) for name, value in result.items()}
+
+
+# --- Relatório e baseline --------------------------------------------------------
+
+def print_report(results: dict):
+    header = (f"{'rota / lote':<34}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'chamadas':>9}"
+              f"{'RCU':>8}{'WCU':>8}{'lidos B':>10}{'gravados B':>11}{'S3 B':>10}{'resposta B':>11}")
+    print(header)
+    print('-' * len(header))
+    for label, r in results.items():
+        print(f"{label:<34}{r['n']:>5}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['chamadas']:>9.1f}{r['rcu']:>8.1f}{r['wcu']:>8.1f}{r['bytes_lidos']:>10.0f}"
+              f"{r['bytes_gravados']:>11.0f}{r['s3_bytes']:>10.0f}{r['resposta_bytes']:>11.0f}")
+    print("(médias por requisição; RCU/WCU estimados pelas regras de cobrança do DynamoDB)")
+
+
+def compare(results: dict, baseline: dict, latency_tolerance: float, capacity_tolerance: float) -> list:
+    """Regressões em relação à baseline (lista vazia = ok)."""
+    problems = []
+    for label, base in baseline.items():
+        current = results.get(label)
+        if current is None:
+            continue
+        limit = max(base['p95_ms'] * (1 + latency_tolerance), base['p95_ms'] + LATENCY_NOISE_MS)
+        if current['p95_ms'] > limit:
+            problems.append(f"{label}: p95 {current['p95_ms']:.2f} ms (baseline {base['p95_ms']:.2f} ms)")
+        for metric in CAPACITY_METRICS:
+            if current[metric] > base[metric] * (1 + capacity_tolerance) + 1e-6:
+                problems.append(f"{label}: {metric} {current[metric]:.1f} (baseline {base[metric]:.1f})")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga offline de index.handler e stream_handler.handler.")
+    parser.add_argument('--iterations', type=int, default=30, help="requisições por rota")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stream-sizes', type=int, nargs='+', default=[100, 1000], help="registros por lote")
+    parser.add_argument('--stream-batches', type=int, default=3, help="lotes por tamanho")
+    parser.add_argument('--only', choices=('api', 'stream'))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help="grava os resultados como a nova baseline")
+    parser.add_argument('--latency-tolerance', type=float, default=0.5, help="aumento de p95 tolerado (0.5 = +50%%)")
+    parser.add_argument('--capacity-tolerance', type=float, default=0.05, help="aumento de RCU/WCU/bytes tolerado")
+    parser.add_argument('--json', help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    meter = setup_environment()
+    import index
+    import stream_handler
+
+    workload = Workload(args.seed)
+    data = seed_data(index, stream_handler, workload, args.iterations)
+
+    results = {}
+    if args.only != 'stream':
+        results.update(run_api(index, meter, api_scenarios(workload, data), args.iterations))
+    if args.only != 'api':
+        results.update(run_stream(stream_handler, meter, workload, data, args.stream_sizes, args.stream_batches))
+
+    print(f"seed={args.seed} iterações={args.iterations}")
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    run_config = {'seed': args.seed, 'iterations': args.iterations,
+                  'stream_sizes': args.stream_sizes, 'stream_batches': args.stream_batches}
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'config': run_config, 'resultados': results}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Sem baseline em {args.baseline} (rode com --update-baseline).")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != run_config:
+        # Médias por requisição dependem da configuração (ex: cache do catálogo amortizado)
+        print(f"A baseline foi gerada com outra configuração: {baseline.get('config')}.")
+        return 2
+
+    problems = compare(results, baseline['resultados'], args.latency_tolerance, args.capacity_tolerance)
+    for problem in problems:
+        print(f"REGRESSÃO {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
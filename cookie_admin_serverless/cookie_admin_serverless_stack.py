@@ -6,6 +6,8 @@ from aws_cdk import (
     aws_apigatewayv2_integrations as integrations,
     aws_s3 as s3,
     aws_logs as logs,
+    aws_events as events,
+    aws_events_targets as targets,
     CfnOutput,
     RemovalPolicy,
     Duration
@@ -20,14 +22,86 @@ class CookieAdminServerlessStack(Stack):
         super().__init__(scope, construct_id, **kwargs)
 
         # 1. DynamoDB
-        table = dynamodb.Table(self, "CookiesTable",
-                               table_name=f"CookiesTable-{environment_tag}",
-                               partition_key=dynamodb.Attribute(name="id", type=dynamodb.AttributeType.STRING),
+        # Layout v1 (só `id` como chave). Mantida até rodar a migração
+        # (python -m migrations.key_schema_v2) e depois removida do stack.
+        legacy_table = dynamodb.Table(self, "CookiesTable",
+                                      table_name=f"CookiesTable-{environment_tag}",
+                                      partition_key=dynamodb.Attribute(name="id", type=dynamodb.AttributeType.STRING),
+                                      billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                                      stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
+                                      removal_policy=RemovalPolicy.RETAIN
+                                      )
+
+        # Layout v2 (ver src/core/keys.py): pk "<TIPO>#<id>", sk = tipo do item,
+        # e um GSI por padrão de acesso, para que nenhuma listagem precise de Scan.
+        table = dynamodb.Table(self, "CookiesTableV2",
+                               table_name=f"CookiesTable-v2-{environment_tag}",
+                               partition_key=dynamodb.Attribute(name="pk", type=dynamodb.AttributeType.STRING),
+                               sort_key=dynamodb.Attribute(name="sk", type=dynamodb.AttributeType.STRING),
                                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
                                stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
                                removal_policy=RemovalPolicy.DESTROY
                                )
 
+        # Índice por status: atende GET /orders (pedidos em aberto) via Query,
+        # sem varrer cookies, entregas e pedidos finalizados.
+        table.add_global_secondary_index(index_name="StatusIndex",
+                                         partition_key=dynamodb.Attribute(name="status",
+                                                                          type=dynamodb.AttributeType.STRING),
+                                         sort_key=dynamodb.Attribute(name="criado_em",
+                                                                     type=dynamodb.AttributeType.STRING),
+                                         projection_type=dynamodb.ProjectionType.ALL
+                                         )
+
+        # Pedidos por data de entrega (GET /orders?entrega_de=&entrega_ate=):
+        # o intervalo vira condição de chave. Particionado pelo mês de entrega
+        # ("AAAA-MM"), e não por tipo_item, para que as escritas de pedidos não
+        # caiam todas numa partição só do GSI (ver src/core/keys.py).
+        # Esparso: só pedidos levam mes_entrega.
+        table.add_global_secondary_index(index_name="DeliveryIndex",
+                                         partition_key=dynamodb.Attribute(name="mes_entrega",
+                                                                          type=dynamodb.AttributeType.STRING),
+                                         sort_key=dynamodb.Attribute(name="data_entrega",
+                                                                     type=dynamodb.AttributeType.STRING),
+                                         projection_type=dynamodb.ProjectionType.ALL
+                                         )
+
+        # Catálogo por sabor (GET /cookies): Query em tipo_item = COOKIE, já
+        # ordenado. Esparso: só itens com `sabor` no topo (cookies e reservas).
+        table.add_global_secondary_index(index_name="FlavorIndex",
+                                         partition_key=dynamodb.Attribute(name="tipo_item",
+                                                                          type=dynamodb.AttributeType.STRING),
+                                         sort_key=dynamodb.Attribute(name="sabor",
+                                                                     type=dynamodb.AttributeType.STRING),
+                                         projection_type=dynamodb.ProjectionType.ALL
+                                         )
+
+        # Agregados diários de vendas (dia x sabor), mantidos pelo stream.
+        # PK fixa por granularidade + SK "AAAA-MM-DD#Sabor": um ano de
+        # dashboard é um único Query por intervalo na chave primária.
+        rollup_table = dynamodb.Table(self, "SalesRollupTable",
+                                      table_name=f"SalesRollupTable-{environment_tag}",
+                                      partition_key=dynamodb.Attribute(name="metrica",
+                                                                       type=dynamodb.AttributeType.STRING),
+                                      sort_key=dynamodb.Attribute(name="chave", type=dynamodb.AttributeType.STRING),
+                                      billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                                      # Marcadores de idempotência do stream expiram sozinhos
+                                      time_to_live_attribute="expira_em",
+                                      removal_policy=RemovalPolicy.DESTROY
+                                      )
+
+        # Histórico de status dos pedidos: um item por transição, fora do item
+        # do pedido (que assim não cresce a cada mudança de status).
+        # PK: pedido_id + SK "data#sufixo" = histórico em ordem num Query.
+        history_table = dynamodb.Table(self, "OrderHistoryTable",
+                                       table_name=f"OrderHistoryTable-{environment_tag}",
+                                       partition_key=dynamodb.Attribute(name="pedido_id",
+                                                                        type=dynamodb.AttributeType.STRING),
+                                       sort_key=dynamodb.Attribute(name="chave", type=dynamodb.AttributeType.STRING),
+                                       billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                                       removal_policy=RemovalPolicy.DESTROY
+                                       )
+
         # 2. Analytics Bucket
         analytics_bucket = s3.Bucket(self, "AnalyticsBucket",
                                      bucket_name=f"cookie-admin-datalake-{environment_tag}",
@@ -57,6 +131,18 @@ class CookieAdminServerlessStack(Stack):
             allowed_origin = site_bucket.bucket_website_url
 
         # 4. Lambda Principal
+        # POST /logistics/plan usa numpy: vem de uma layer (-c numpy_layer_arn=arn:...),
+        # ex: a AWS SDK for pandas. Sem ela, só o planejamento fica indisponível (503).
+        api_layers = []
+        numpy_layer = None
+        numpy_layer_arn = self.node.try_get_context("numpy_layer_arn")
+        if numpy_layer_arn:
+            numpy_layer = _lambda.LayerVersion.from_layer_version_arn(self, "NumpyLayer", numpy_layer_arn)
+            api_layers.append(numpy_layer)
+
+        # Métricas de desempenho por rota (EMF, ver src/core/metrics.py): -c perf_metrics=1
+        perf_metrics = "1" if self.node.try_get_context("perf_metrics") in ("1", "true", True) else "0"
+
         cookie_handler = _lambda.Function(self, "CookieHandler",
                                           function_name=f"CookieHandler-{environment_tag}",
                                           runtime=_lambda.Runtime.PYTHON_3_12,
@@ -64,13 +150,21 @@ class CookieAdminServerlessStack(Stack):
                                           code=_lambda.Code.from_asset("src"),
                                           environment={
                                               "TABLE_NAME": table.table_name,
+                                              "ROLLUP_TABLE_NAME": rollup_table.table_name,
+                                              "HISTORY_TABLE_NAME": history_table.table_name,
+                                              "ANALYTICS_BUCKET_NAME": analytics_bucket.bucket_name,
                                               "ENV_TYPE": environment_tag,
-                                              "ALLOWED_ORIGIN": allowed_origin
+                                              "ALLOWED_ORIGIN": allowed_origin,
+                                              "PERF_METRICS": perf_metrics
                                           },
+                                          layers=api_layers,
                                           timeout=Duration.seconds(10),
                                           log_retention=logs.RetentionDays.ONE_WEEK,
                                           )
         table.grant_read_write_data(cookie_handler)
+        history_table.grant_read_write_data(cookie_handler)
+        rollup_table.grant_read_data(cookie_handler)
+        analytics_bucket.grant_read(cookie_handler)
 
         # API Gateway com CORS
         http_api = apigw.HttpApi(self, "CookieApi",
@@ -84,7 +178,9 @@ class CookieAdminServerlessStack(Stack):
                                          apigw.CorsHttpMethod.PATCH,
                                          apigw.CorsHttpMethod.OPTIONS
                                      ],
-                                     allow_headers=["Content-Type", "Authorization"]
+                                     allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+                                     # Permite ao frontend ler o ETag (GET condicional)
+                                     expose_headers=["ETag"]
                                  )
                                  )
 
@@ -94,29 +190,103 @@ class CookieAdminServerlessStack(Stack):
         http_api.add_routes(path="/cookies/{id}", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
         http_api.add_routes(path="/orders", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
         http_api.add_routes(path="/orders/{id}/status", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
+        http_api.add_routes(path="/orders/{id}/history", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
+        http_api.add_routes(path="/orders/batch", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
+        http_api.add_routes(path="/orders/status:batch", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
         http_api.add_routes(path="/logistics/routes", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
+        http_api.add_routes(path="/logistics/plan", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
         http_api.add_routes(path="/orders/{id}/loss", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
+        http_api.add_routes(path="/analytics/daily", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
+        http_api.add_routes(path="/analytics/sales", methods=[apigw.HttpMethod.ANY], integration=lambda_int)
 
         # 5. Stream Lambda
+        # Formato do Data Lake (-c analytics_format=parquet). Parquet exige o
+        # pyarrow, fornecido por uma layer (-c pyarrow_layer_arn=arn:...),
+        # ex: a AWS SDK for pandas (AWSSDKPandas-Python312).
+        # As finanças dos fatos (analytics/facts.py) usam o numpy se ele estiver
+        # no pacote: a layer do pyarrow já o traz, e no ndjson vai a mesma
+        # layer da API (numpy_layer_arn). Sem nenhuma das duas (o deploy
+        # padrão), o stream roda o caminho em Python puro, com o mesmo resultado.
+        analytics_format = self.node.try_get_context("analytics_format") or "ndjson"
+        stream_layers = []
+        if analytics_format == "parquet":
+            pyarrow_layer_arn = self.node.try_get_context("pyarrow_layer_arn")
+            if not pyarrow_layer_arn:
+                raise ValueError("analytics_format=parquet requer o contexto pyarrow_layer_arn.")
+            stream_layers.append(_lambda.LayerVersion.from_layer_version_arn(self, "PyArrowLayer",
+                                                                             pyarrow_layer_arn))
+        elif numpy_layer:
+            stream_layers.append(numpy_layer)
+
         stream_handler = _lambda.Function(self, "StreamHandler",
                                           function_name=f"StreamHandler-{environment_tag}",
                                           runtime=_lambda.Runtime.PYTHON_3_12,
                                           handler="stream_handler.handler",
                                           code=_lambda.Code.from_asset("src"),
                                           environment={
-                                              "ANALYTICS_BUCKET_NAME": analytics_bucket.bucket_name
+                                              "ANALYTICS_BUCKET_NAME": analytics_bucket.bucket_name,
+                                              "ANALYTICS_FORMAT": analytics_format,
+                                              "ROLLUP_TABLE_NAME": rollup_table.table_name
                                           },
+                                          layers=stream_layers,
+                                          memory_size=512 if analytics_format == "parquet" else 128,
                                           timeout=Duration.seconds(30),
                                           log_retention=logs.RetentionDays.ONE_WEEK
                                           )
         analytics_bucket.grant_write(stream_handler)
+        # Leitura: o RollupWriter confere os marcadores PROCESSADO (BatchGetItem)
+        rollup_table.grant_read_write_data(stream_handler)
+        # Lotes maiores + janela de agrupamento = menos arquivos (e maiores)
+        # por partição no lake. Com report_batch_item_failures só o trecho do
+        # lote a partir do registro com erro é reenviado, e as chaves
+        # determinísticas no S3 tornam o reprocessamento idempotente.
+        # Filtros (OR): só registros de PEDIDO invocam a função; COOKIE,
+        # ENTREGA, reservas etc. são descartados pelo próprio Lambda.
+        # Pedidos copiados pela migração v1 -> v2 (com `migrado`) só entram
+        # a partir da primeira alteração: o INSERT da cópia não tem OldImage
+        # e não passa, senão cada venda antiga seria somada de novo.
         stream_handler.add_event_source(eventsources.DynamoEventSource(table,
                                                                        starting_position=_lambda.StartingPosition.LATEST,
-                                                                       batch_size=5,
+                                                                       batch_size=1000,
+                                                                       max_batching_window=Duration.seconds(60),
                                                                        bisect_batch_on_error=True,
-                                                                       retry_attempts=2
+                                                                       report_batch_item_failures=True,
+                                                                       retry_attempts=5,
+                                                                       filters=[
+                                                                           _lambda.FilterCriteria.filter({
+                                                                               "dynamodb": {"NewImage": {
+                                                                                   "tipo_item": {"S": _lambda.FilterRule.is_equal("PEDIDO")},
+                                                                                   # exists só vale em folha: o BOOL, não o atributo
+                                                                                   "migrado": {"BOOL": _lambda.FilterRule.not_exists()}}}
+                                                                           }),
+                                                                           _lambda.FilterCriteria.filter({
+                                                                               "dynamodb": {"OldImage": {"tipo_item": {
+                                                                                   "S": _lambda.FilterRule.is_equal("PEDIDO")}}}
+                                                                           })
+                                                                       ]
                                                                        ))
 
+        # 6. Compactação do Data Lake (agendada, 1x por dia)
+        compaction_handler = _lambda.Function(self, "CompactionHandler",
+                                              function_name=f"CompactionHandler-{environment_tag}",
+                                              runtime=_lambda.Runtime.PYTHON_3_12,
+                                              handler="compaction_handler.handler",
+                                              code=_lambda.Code.from_asset("src"),
+                                              environment={
+                                                  "ANALYTICS_BUCKET_NAME": analytics_bucket.bucket_name
+                                              },
+                                              layers=stream_layers,
+                                              memory_size=1024,
+                                              timeout=Duration.minutes(10),
+                                              log_retention=logs.RetentionDays.ONE_WEEK
+                                              )
+        analytics_bucket.grant_read_write(compaction_handler)
+        analytics_bucket.grant_delete(compaction_handler)
+        events.Rule(self, "CompactionSchedule",
+                    schedule=events.Schedule.cron(minute="0", hour="6"),
+                    targets=[targets.LambdaFunction(compaction_handler)]
+                    )
+
         # Outputs
         CfnOutput(self, "ApiUrl", value=http_api.url)
         # Output volta a ser o link do S3
@@ -0,0 +1,213 @@
+"""
+Compactação do Data Lake: junta os vendas_*.<ext> pequenos de cada dia
+fechado em poucos arquivos grandes (compactado_<run>_<n>.<ext>).
+
+Passos por dia (seguro para reexecutar e para rodar junto do stream_handler):
+  1. Lock do dia com PUT condicional (If-None-Match): uma compactação por vez.
+  2. Termina trocas interrompidas (manifesto com entradas ainda não apagadas)
+     e remove saídas órfãs de execuções que morreram antes do commit.
+  3. Escolhe as entradas: só arquivos do stream com mais de INPUT_MIN_AGE.
+     Reenvios do stream (mesma chave, ver stream_handler) só acontecem dentro
+     da retenção de 24h, então uma entrada antiga nunca é reescrita depois.
+  4. Lê as entradas em streaming e grava saídas de ~target_bytes.
+  5. Grava o manifesto (ponto de commit: leitores passam a ver as saídas e
+     a ignorar as entradas de uma vez só) e apaga as entradas.
+
+Uso (CLI, a partir de src/):
+    python -m analytics.compaction --bucket cookie-admin-datalake-dev \\
+        --inicio 2025-01-01 --fim 2025-01-31 --target-mb 128
+"""
+import argparse
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from analytics.lake import (
+    COMPACTED_PREFIX, LOCK_NAME, MANIFEST_SUFFIX, LocalSource, LockHeld, S3Source,
+    day_prefix, days_between
+)
+
+DEFAULT_TARGET_BYTES = 128 * 1024 * 1024
+# Parquet: dados decodificados (Arrow) acumulados antes de gravar um row group
+ROW_GROUP_BYTES = 32 * 1024 * 1024
+INPUT_MIN_AGE = timedelta(hours=26)
+LOCK_STALE_AFTER = timedelta(minutes=15)
+# Dia "fechado": mais antigo que isso (em UTC) em relação a hoje
+CLOSED_AFTER_DAYS = 2
+STREAM_FILE_PREFIX = 'vendas_'
+
+
+def compact_day(source, day: date, target_bytes: int = DEFAULT_TARGET_BYTES, now: datetime = None) -> dict:
+    prefix = day_prefix(day)
+    now = now or datetime.now(timezone.utc)
+    run_id = f"{now:%Y%m%d%H%M%S}{uuid.uuid4().hex[:6]}"
+    lock_key = prefix + LOCK_NAME
+
+    try:
+        source.create_exclusive(lock_key, run_id.encode(), LOCK_STALE_AFTER)
+    except LockHeld:
+        return {'dia': day.isoformat(), 'status': 'EM_ANDAMENTO'}
+
+    try:
+        objects = list(source.list_objects(prefix))
+        committed = _finish_pending(source, objects)
+        _remove_orphans(source, prefix, objects, committed, now)
+
+        inputs = {}
+        for obj in objects:
+            name = obj['key'][len(prefix):]
+            if not name.startswith(STREAM_FILE_PREFIX) or obj['key'] in committed['entradas']:
+                continue
+            if now - obj['modificado_em'] < INPUT_MIN_AGE:
+                continue
+            extension = name.rsplit('.', 1)[-1]
+            inputs.setdefault(extension, []).append(obj['key'])
+
+        entradas, saidas = [], []
+        for extension, keys in sorted(inputs.items()):
+            if len(keys) < 2:
+                continue
+            merge = _merge_ndjson if extension == 'json' else _merge_parquet
+            saidas.extend(merge(source, keys, f"{prefix}{COMPACTED_PREFIX}{run_id}", target_bytes))
+            entradas.extend(keys)
+
+        if not entradas:
+            return {'dia': day.isoformat(), 'status': 'NADA_A_FAZER'}
+
+        # Commit: a partir daqui os leitores enxergam as saídas, não as entradas
+        manifest_key = f"{prefix}_{COMPACTED_PREFIX}{run_id}{MANIFEST_SUFFIX}"
+        source.put_bytes(manifest_key, json.dumps({'entradas': entradas, 'saidas': saidas}).encode())
+        source.delete_keys(entradas)
+        # Entradas já apagadas: o manifesto só precisa manter as saídas visíveis
+        source.put_bytes(manifest_key, json.dumps({'entradas': [], 'saidas': saidas}).encode())
+
+        return {'dia': day.isoformat(), 'status': 'COMPACTADO', 'entradas': len(entradas), 'saidas': len(saidas)}
+    finally:
+        source.delete_keys([lock_key])
+
+
+def _finish_pending(source, objects: list) -> dict:
+    """Conclui trocas cujo manifesto foi gravado mas as entradas não foram apagadas."""
+    committed = {'entradas': set(), 'saidas': set()}
+    for obj in objects:
+        if not obj['key'].endswith(MANIFEST_SUFFIX):
+            continue
+
+        manifest = json.loads(source.read_bytes(obj['key']))
+        if manifest.get('entradas'):
+            source.delete_keys(manifest['entradas'])
+            committed['entradas'].update(manifest['entradas'])
+            source.put_bytes(obj['key'], json.dumps({'entradas': [], 'saidas': manifest['saidas']}).encode())
+        committed['saidas'].update(manifest.get('saidas', []))
+    return committed
+
+
+def _remove_orphans(source, prefix: str, objects: list, committed: dict, now: datetime):
+    """Saídas sem manifesto de execuções que morreram (já invisíveis aos leitores)."""
+    orphans = [
+        obj['key'] for obj in objects
+        if obj['key'][len(prefix):].startswith(COMPACTED_PREFIX)
+        and obj['key'] not in committed['saidas']
+        and now - obj['modificado_em'] > LOCK_STALE_AFTER
+    ]
+    if orphans:
+        source.delete_keys(orphans)
+
+
+def _merge_ndjson(source, keys: list, base_key: str, target_bytes: int) -> list:
+    outputs = []
+    buffer = io.BytesIO()
+
+    def flush():
+        key = f"{base_key}_{len(outputs)}.json"
+        source.put_bytes(key, buffer.getvalue())
+        outputs.append(key)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for key in keys:
+        for line in source.iter_lines(key):
+            if buffer.tell():
+                buffer.write(b'\n')
+            buffer.write(line)
+            if buffer.tell() >= target_bytes:
+                flush()
+    if buffer.tell():
+        flush()
+    return outputs
+
+
+def _merge_parquet(source, keys: list, base_key: str, target_bytes: int) -> list:
+    """
+    Grava as saídas em streaming (pq.ParquetWriter): a memória fica em até
+    ROW_GROUP_BYTES de tabelas decodificadas mais a saída já comprimida, e não
+    em target_bytes de Parquet comprimido expandido em Arrow (e copiado pelo
+    concat e pelo write_table), que estoura o Lambda.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    outputs = []
+    writer, out = None, None
+    tables, decoded_bytes = [], 0
+
+    def write_row_group():
+        # Entradas pequenas viram um row group só (row groups minúsculos deixam a leitura lenta)
+        nonlocal tables, decoded_bytes
+        if tables:
+            writer.write_table(pa.concat_tables(tables))
+            tables, decoded_bytes = [], 0
+
+    def close_output():
+        nonlocal writer, out
+        write_row_group()
+        writer.close()
+        key = f"{base_key}_{len(outputs)}.parquet"
+        source.put_bytes(key, out.getvalue())
+        outputs.append(key)
+        writer, out = None, None
+
+    for key in keys:
+        table = pq.read_table(pa.BufferReader(source.read_bytes(key)))
+        if writer is not None and not table.schema.equals(writer.schema):
+            # Schema diferente não entra no mesmo arquivo: fecha e abre outro
+            close_output()
+        if writer is None:
+            out = io.BytesIO()
+            writer = pq.ParquetWriter(out, table.schema, compression='snappy')
+
+        tables.append(table)
+        decoded_bytes += table.nbytes
+        if decoded_bytes >= ROW_GROUP_BYTES:
+            write_row_group()
+        if out.tell() >= target_bytes:
+            close_output()
+    if writer is not None:
+        close_output()
+    return outputs
+
+
+def closed_days(today: date, lookback_days: int):
+    """Dias fechados a compactar: de hoje-CLOSED_AFTER_DAYS para trás."""
+    last = today - timedelta(days=CLOSED_AFTER_DAYS)
+    return days_between(last - timedelta(days=lookback_days - 1), last)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compacta os arquivos pequenos do Data Lake por dia.")
+    parser.add_argument('--inicio', required=True, type=date.fromisoformat)
+    parser.add_argument('--fim', required=True, type=date.fromisoformat)
+    parser.add_argument('--target-mb', type=int, default=DEFAULT_TARGET_BYTES // (1024 * 1024))
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--bucket')
+    origem.add_argument('--local-dir')
+    args = parser.parse_args(argv)
+
+    source = S3Source(args.bucket) if args.bucket else LocalSource(args.local_dir)
+    for day in days_between(args.inicio, args.fim):
+        print(json.dumps(compact_day(source, day, args.target_mb * 1024 * 1024)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+
+# Layout do Data Lake gravado pelo stream_handler:
+#   sales_data/year=AAAA/month=MM/day=DD/vendas_<seq>.<json|parquet>
+# A compactação (analytics.compaction) acrescenta, no mesmo prefixo:
+#   compactado_<run>_<n>.<ext>   arquivos grandes que substituem os pequenos
+#   _compactado_<run>.manifest   commit da troca (entradas -> saídas)
+#   _compactacao.lock            exclusão mútua entre compactações do dia
+LAKE_PREFIX = 'sales_data'
+COMPACTED_PREFIX = 'compactado_'
+MANIFEST_SUFFIX = '.manifest'
+LOCK_NAME = '_compactacao.lock'
+
+
+class LockHeld(Exception):
+    """Outra compactação está trabalhando no mesmo dia."""
+
+
+def day_prefix(day: date) -> str:
+    return f"{LAKE_PREFIX}/year={day.year}/month={day.month:02d}/day={day.day:02d}/"
+
+
+def days_between(inicio: date, fim: date):
+    """Poda de partições: só os dias do intervalo são listados/lidos."""
+    day = inicio
+    while day <= fim:
+        yield day
+        day += timedelta(days=1)
+
+
+def read_manifests(source, objects: list) -> list:
+    return [
+        json.loads(source.read_bytes(obj['key']))
+        for obj in objects if obj['key'].endswith(MANIFEST_SUFFIX)
+    ]
+
+
+def visible_keys(source, prefix: str):
+    """
+    Arquivos de dados que um leitor deve considerar no prefixo do dia.
+    O manifesto é o ponto de commit da compactação: antes dele, as saídas
+    são invisíveis; depois dele, as entradas listadas é que somem. Assim o
+    leitor nunca vê as mesmas linhas duas vezes, mesmo no meio da troca.
+    """
+    objects = list(source.list_objects(prefix))
+    hidden = set()
+    committed = set()
+    for manifest in read_manifests(source, objects):
+        hidden.update(manifest.get('entradas', []))
+        committed.update(manifest.get('saidas', []))
+
+    for obj in objects:
+        key = obj['key']
+        name = key[len(prefix):]
+        if name.startswith('_') or key in hidden:
+            continue
+        if name.startswith(COMPACTED_PREFIX) and key not in committed:
+            continue
+        yield key
+
+
+class S3Source:
+    """Lake no S3. Objetos são lidos em streaming, linha a linha."""
+
+    def __init__(self, bucket: str, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+        self.bucket = bucket
+        self.client = client
+
+    def list_objects(self, prefix: str):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield {'key': obj['Key'], 'size': obj['Size'], 'modificado_em': obj['LastModified']}
+
+    def list_keys(self, prefix: str):
+        for obj in self.list_objects(prefix):
+            yield obj['key']
+
+    def iter_lines(self, key: str):
+        body = self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+        for line in body.iter_lines():
+            if line:
+                yield line
+
+    def read_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def put_bytes(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def create_exclusive(self, key: str, data: bytes, stale_after: timedelta):
+        """
+        PUT condicional (If-None-Match): só um processo cria o objeto.
+        Um lock mais velho que stale_after é tomado com If-Match no ETag dele.
+        """
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, IfNoneMatch='*')
+            return
+        except self.client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'PreconditionFailed':
+                raise
+
+        current = self.client.head_object(Bucket=self.bucket, Key=key)
+        if datetime.now(timezone.utc) - current['LastModified'] < stale_after:
+            raise LockHeld(key)
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, IfMatch=current['ETag'])
+        except self.client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise LockHeld(key)
+            raise
+
+    def delete_keys(self, keys: list):
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True}
+            )
+
+
+class LocalSource:
+    """Mesmo layout num diretório local (cópia do bucket, testes, benchmarks)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def list_objects(self, prefix: str):
+        directory = os.path.join(self.root, prefix)
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                yield {
+                    'key': prefix + name,
+                    'size': stat.st_size,
+                    'modificado_em': datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                }
+
+    def list_keys(self, prefix: str):
+        for obj in self.list_objects(prefix):
+            yield obj['key']
+
+    def iter_lines(self, key: str):
+        with open(os.path.join(self.root, key), 'rb') as f:
+            for line in f:
+                line = line.rstrip(b'\n')
+                if line:
+                    yield line
+
+    def read_bytes(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), 'rb') as f:
+            return f.read()
+
+    def put_bytes(self, key: str, data: bytes):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escreve ao lado e renomeia: o arquivo aparece inteiro ou não aparece
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def create_exclusive(self, key: str, data: bytes, stale_after: timedelta):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            modified = datetime.fromtimestamp(os.stat(path).st_mtime, timezone.utc)
+            if datetime.now(timezone.utc) - modified < stale_after:
+                raise LockHeld(key)
+            self.put_bytes(key, data)
+            return
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+    def delete_keys(self, keys: list):
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,133 @@
+"""
+Consultas ad-hoc sobre o Data Lake (sales_data/year=/month=/day=).
+
+- Poda de partições: só os prefixos dos dias do intervalo são listados.
+- Filtros de sabor/status são empurrados para antes do parse: linhas NDJSON
+  que nem contêm o valor procurado são descartadas sem json.loads.
+- Tudo é gerador: objetos são lidos em streaming e a agregação guarda só um
+  acumulador por grupo (memória constante em relação ao número de linhas).
+
+Como as linhas de ESTORNO já vêm com valores negativos, SUM simples dá o
+estado atual dos pedidos; 'linhas' é a soma de 'sinal' (linhas líquidas).
+
+Uso (CLI, a partir de src/):
+    python -m analytics.query --inicio 2025-01-01 --fim 2025-01-31 \\
+        --group-by sabor --bucket cookie-admin-datalake-dev
+    python -m analytics.query --inicio 2025-01-01 --fim 2025-01-31 \\
+        --status CONCLUIDO --local-dir ./copia-do-lake
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from decimal import Decimal
+
+from analytics.lake import LocalSource, S3Source, day_prefix, days_between, visible_keys
+
+METRICS = ('qtd', 'receita_item', 'custo_item', 'custo_logistico_item', 'lucro_liquido')
+FILTER_COLUMNS = ('sabor', 'status')
+GROUP_COLUMNS = ('dia', 'sabor', 'status', 'produto_id', 'cliente_nome')
+
+
+def iter_rows(source, inicio: date, fim: date, sabor: str = None, status: str = None):
+    """Gera as linhas de fato do intervalo que passam nos filtros."""
+    filters = {column: value for column, value in (('sabor', sabor), ('status', status)) if value}
+    # Mesma serialização do NdjsonWriter (json.dumps com separadores padrão)
+    needles = [f'"{column}": {json.dumps(value)}'.encode() for column, value in filters.items()]
+
+    for day in days_between(inicio, fim):
+        for key in visible_keys(source, day_prefix(day)):
+            if key.endswith('.json'):
+                yield from _iter_ndjson(source, key, filters, needles)
+            elif key.endswith('.parquet'):
+                yield from _iter_parquet(source, key, filters)
+
+
+def _iter_ndjson(source, key: str, filters: dict, needles: list):
+    for line in source.iter_lines(key):
+        if not all(needle in line for needle in needles):
+            continue
+        row = json.loads(line)
+        if all(row.get(column) == value for column, value in filters.items()):
+            yield row
+
+
+def _iter_parquet(source, key: str, filters: dict):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(
+        pa.BufferReader(source.read_bytes(key)),
+        filters=[(column, '=', value) for column, value in filters.items()] or None
+    )
+    for batch in table.to_batches():
+        yield from batch.to_pylist()
+
+
+def aggregate(rows, group_by=(), metrics=METRICS) -> list:
+    """SUM das métricas + contagem líquida de linhas, por grupo."""
+    groups = {}
+    for row in rows:
+        key = tuple(_group_value(row, column) for column in group_by)
+        acc = groups.get(key)
+        if acc is None:
+            acc = groups[key] = {'linhas': 0, **{metric: Decimal('0') for metric in metrics}}
+
+        acc['linhas'] += row.get('sinal', 1)
+        for metric in metrics:
+            value = row.get(metric)
+            if value is not None:
+                acc[metric] += value if isinstance(value, Decimal) else Decimal(str(value))
+
+    result = []
+    for key in sorted(groups, key=lambda k: tuple('' if v is None else str(v) for v in k)):
+        acc = groups[key]
+        # Grupo totalmente estornado (ex: status pelo qual o pedido só passou)
+        if acc['linhas'] == 0 and not any(acc[metric] for metric in metrics):
+            continue
+
+        line = dict(zip(group_by, key))
+        line['linhas'] = acc['linhas']
+        for metric in metrics:
+            line[metric] = int(acc[metric]) if metric == 'qtd' else float(acc[metric])
+        result.append(line)
+    return result
+
+
+def run(source, inicio: date, fim: date, sabor: str = None, status: str = None, group_by=()) -> list:
+    invalid = [column for column in group_by if column not in GROUP_COLUMNS]
+    if invalid:
+        raise ValueError(f"Agrupamento inválido: {', '.join(invalid)}. Use: {', '.join(GROUP_COLUMNS)}.")
+    if fim < inicio:
+        raise ValueError("'fim' deve ser maior ou igual a 'inicio'.")
+    return aggregate(iter_rows(source, inicio, fim, sabor, status), group_by)
+
+
+def _group_value(row: dict, column: str):
+    if column == 'dia':
+        return (row.get('data_venda') or '')[:10]
+    return row.get(column)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta agregada no Data Lake de vendas.")
+    parser.add_argument('--inicio', required=True, type=date.fromisoformat)
+    parser.add_argument('--fim', required=True, type=date.fromisoformat)
+    parser.add_argument('--sabor')
+    parser.add_argument('--status')
+    parser.add_argument('--group-by', default='', help=f"Colunas separadas por vírgula: {', '.join(GROUP_COLUMNS)}")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--bucket')
+    origem.add_argument('--local-dir')
+    args = parser.parse_args(argv)
+
+    source = S3Source(args.bucket) if args.bucket else LocalSource(args.local_dir)
+    group_by = tuple(column for column in args.group_by.split(',') if column)
+
+    for line in run(source, args.inicio, args.fim, args.sabor, args.status, group_by):
+        json.dump(line, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import time
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_EVEN
+
+# Chave de partição dos agregados diários na tabela de rollups.
+# Ordenação por 'chave' = "AAAA-MM-DD#Sabor": um intervalo de datas é um
+# único Query (BETWEEN) na chave primária.
+DAILY = 'DIARIO'
+
+COUNTERS = ('qtd', 'receita', 'custo_producao', 'custo_logistico', 'lucro_liquido', 'prejuizo_extravio')
+
+# Marcadores de idempotência (um por registro do stream já somado). Expiram
+# via TTL bem depois da retenção do stream (24h).
+PROCESSED = 'PROCESSADO'
+MARKER_TTL_SECONDS = 7 * 24 * 3600
+
+# Limites do DynamoDB por chamada
+TRANSACTION_LIMIT = 100
+BATCH_GET_LIMIT = 100
+CONFLICT_MAX_ATTEMPTS = 4
+_QUANTUM = Decimal('0.0001')
+
+
+def daily_key(dia: str, sabor: str) -> str:
+    return f"{dia}#{sabor}"
+
+
+def rollup_deltas(fact_rows: list) -> dict:
+    """
+    Soma as linhas de delta (UPSERT/ESTORNO já vêm com sinal) em contadores
+    por dia x sabor. Pedidos EXTRAVIADO também acumulam o prejuízo
+    (custo de produção + logística) do dia.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, Decimal('0')))
+    for row in fact_rows:
+        counters = totals[daily_key(row['data_venda'][:10], row.get('sabor') or '?')]
+        counters['qtd'] += row['qtd']
+        counters['receita'] += _money(row['receita_item'])
+        counters['custo_producao'] += _money(row['custo_item'])
+        counters['custo_logistico'] += _money(row['custo_logistico_item'])
+        counters['lucro_liquido'] += _money(row['lucro_liquido'])
+        if row.get('status') == 'EXTRAVIADO':
+            counters['prejuizo_extravio'] += _money(row['custo_item']) + _money(row['custo_logistico_item'])
+
+    # Deltas que se anulam (ex: só o status mudou entre abertos) não geram escrita
+    return {
+        key: counters for key, counters in totals.items()
+        if any(value != 0 for value in counters.values())
+    }
+
+
+class RollupWriter:
+    """
+    Aplica os deltas de um lote do stream com ADD atômico.
+
+    Os registros são agrupados em transações (até 100 ações): os deltas do
+    grupo somados por dia x sabor + um marcador PROCESSADO#<SequenceNumber>
+    por registro, gravado só se ainda não existir. Num retry, os registros
+    que já têm marcador são pulados, então nada é somado duas vezes.
+    """
+
+    def __init__(self, client, table_name: str):
+        self.client = client
+        self.table_name = table_name
+
+    def apply(self, pending: list):
+        """
+        pending: [(indice, sequence_number, deltas)] na ordem do stream.
+        Retorna o índice do primeiro registro que não pôde ser aplicado, ou None.
+        """
+        try:
+            applied = self._already_applied([sequence for _, sequence, _ in pending])
+        except Exception as e:
+            # Sem saber o que já foi somado, nada do lote pode ser aplicado
+            print(f"Erro ao consultar os marcadores a partir do registro {pending[0][1]}: {e}")
+            return pending[0][0]
+        pending = [entry for entry in pending if entry[1] not in applied]
+
+        for group in self._groups(pending):
+            try:
+                self._write_group(group)
+            except Exception as e:
+                print(f"Erro ao atualizar rollups a partir do registro {group[0][1]}: {e}")
+                return group[0][0]
+        return None
+
+    @staticmethod
+    def _groups(pending: list):
+        """Agrupa registros enquanto marcadores + chaves couberem numa transação."""
+        group, keys = [], set()
+        for entry in pending:
+            entry_keys = keys | set(entry[2])
+            if group and len(group) + 1 + len(entry_keys) > TRANSACTION_LIMIT:
+                yield group
+                group, entry_keys = [], set(entry[2])
+            group.append(entry)
+            keys = entry_keys
+        if group:
+            yield group
+
+    def _write_group(self, group: list):
+        totals = {}
+        for _, _, deltas in group:
+            for key, counters in deltas.items():
+                current = totals.setdefault(key, dict.fromkeys(COUNTERS, Decimal('0')))
+                for name, value in counters.items():
+                    current[name] += value
+
+        expira_em = str(int(time.time()) + MARKER_TTL_SECONDS)
+        actions = [{'Put': {
+            'TableName': self.table_name,
+            'Item': {
+                'metrica': {'S': PROCESSED},
+                'chave': {'S': sequence},
+                'expira_em': {'N': expira_em}
+            },
+            'ConditionExpression': 'attribute_not_exists(chave)'
+        }} for _, sequence, _ in group]
+        actions.extend(self._update(key, counters) for key, counters in sorted(totals.items()))
+
+        for attempt in range(CONFLICT_MAX_ATTEMPTS):
+            try:
+                self.client.transact_write_items(TransactItems=actions)
+                return
+            except self.client.exceptions.TransactionCanceledException as e:
+                # Outro shard atualizando o mesmo dia x sabor ao mesmo tempo
+                reasons = [r.get('Code') for r in e.response.get('CancellationReasons', [])]
+                if 'TransactionConflict' not in reasons or attempt == CONFLICT_MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05 * (2 ** attempt))
+
+    def _already_applied(self, sequences: list) -> set:
+        applied = set()
+        for start in range(0, len(sequences), BATCH_GET_LIMIT):
+            request = {self.table_name: {
+                'Keys': [
+                    {'metrica': {'S': PROCESSED}, 'chave': {'S': sequence}}
+                    for sequence in sequences[start:start + BATCH_GET_LIMIT]
+                ],
+                'ProjectionExpression': 'chave'
+            }}
+            while request:
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    applied.add(item['chave']['S'])
+                request = response.get('UnprocessedKeys') or {}
+        return applied
+
+    def _update(self, key: str, counters: dict) -> dict:
+        names = {f"#{name}": name for name in counters}
+        values = {f":{name}": {'N': str(value)} for name, value in counters.items()}
+        dia, sabor = key.split('#', 1)
+        values[':dia'] = {'S': dia}
+        values[':sabor'] = {'S': sabor}
+
+        return {'Update': {
+            'TableName': self.table_name,
+            'Key': {'metrica': {'S': DAILY}, 'chave': {'S': key}},
+            'UpdateExpression': "SET dia = :dia, sabor = :sabor ADD " + ", ".join(
+                f"#{name} :{name}" for name in counters
+            ),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }}
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)).quantize(_QUANTUM, rounding=ROUND_HALF_EVEN)
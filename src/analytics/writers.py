@@ -0,0 +1,101 @@
+import io
+import json
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from core.codec import to_number
+
+# Colunas monetárias: gravadas como decimal (escala fixa) no Parquet,
+# nunca como float, para que somas no lake batam centavo a centavo.
+MONEY_COLUMNS = (
+    'motoboy_custo_rateado',
+    'receita_item',
+    'custo_item',
+    'custo_logistico_item',
+    'lucro_liquido',
+)
+MONEY_PRECISION = 18
+MONEY_SCALE = 4
+_MONEY_QUANTUM = Decimal(1).scaleb(-MONEY_SCALE)
+
+STRING_COLUMNS = (
+    'pedido_id',
+    'data_venda',
+    'status',
+    'cliente_nome',
+    'forma_pagamento',
+    'produto_id',
+    'sabor',
+    'fato_id',
+    'operacao',
+    'evento_seq',
+)
+INT_COLUMNS = ('qtd', 'sinal')
+
+
+class NdjsonWriter:
+    """Formato original: um JSON por linha."""
+    extension = 'json'
+    content_type = 'application/json'
+
+    def serialize(self, rows: list) -> bytes:
+        return "\n".join(json.dumps(row, default=_json_default) for row in rows).encode('utf-8')
+
+
+class ParquetWriter:
+    """
+    Parquet colunar e comprimido, com schema tipado.
+    O pyarrow é importado só aqui: quem grava NDJSON não paga esse custo.
+    """
+    extension = 'parquet'
+    content_type = 'application/vnd.apache.parquet'
+
+    def __init__(self, compression: str = 'snappy'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.compression = compression
+        self.schema = pa.schema(
+            [(name, pa.string()) for name in STRING_COLUMNS]
+            + [(name, pa.int64()) for name in INT_COLUMNS]
+            + [(name, pa.decimal128(MONEY_PRECISION, MONEY_SCALE)) for name in MONEY_COLUMNS]
+        )
+
+    def serialize(self, rows: list) -> bytes:
+        columns = {name: [] for name in self.schema.names}
+        for row in rows:
+            for name in STRING_COLUMNS:
+                value = row.get(name)
+                columns[name].append(None if value is None else str(value))
+            for name in INT_COLUMNS:
+                columns[name].append(row.get(name))
+            for name in MONEY_COLUMNS:
+                columns[name].append(to_money(row.get(name)))
+
+        table = self._pa.Table.from_pydict(columns, schema=self.schema)
+        buffer = io.BytesIO()
+        self._pq.write_table(table, buffer, compression=self.compression)
+        return buffer.getvalue()
+
+
+def _json_default(value):
+    # Valores monetários (Decimal) continuam números no JSON, como antes
+    if isinstance(value, Decimal):
+        return to_number(value)
+    return str(value)
+
+
+def to_money(value):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(_MONEY_QUANTUM, rounding=ROUND_HALF_EVEN)
+
+
+def get_writer(fmt: str):
+    if fmt == 'parquet':
+        try:
+            return ParquetWriter()
+        except ImportError:
+            raise RuntimeError("ANALYTICS_FORMAT=parquet exige o pyarrow no pacote da Lambda.")
+    return NdjsonWriter()
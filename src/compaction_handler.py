@@ -0,0 +1,29 @@
+import os
+from datetime import datetime, timezone
+
+from analytics.compaction import closed_days, compact_day
+from analytics.lake import S3Source
+
+# Configuração
+BUCKET_NAME = os.environ.get('ANALYTICS_BUCKET_NAME')
+TARGET_BYTES = int(os.environ.get('COMPACTION_TARGET_MB', '128')) * 1024 * 1024
+# Quantos dias fechados revisitar a cada execução (pega eventos atrasados)
+LOOKBACK_DAYS = int(os.environ.get('COMPACTION_LOOKBACK_DAYS', '7'))
+
+source = S3Source(BUCKET_NAME)
+
+
+def handler(event, context):
+    """
+    Job agendado: compacta os arquivos pequenos dos dias fechados do lake.
+    Aceita {"dias": ["AAAA-MM-DD", ...]} para compactar dias específicos.
+    """
+    if event and event.get('dias'):
+        days = [datetime.fromisoformat(d).date() for d in event['dias']]
+    else:
+        days = closed_days(datetime.now(timezone.utc).date(), LOOKBACK_DAYS)
+
+    results = [compact_day(source, day, TARGET_BYTES) for day in days]
+    for result in results:
+        print(result)
+    return {"resultados": results}
@@ -0,0 +1,70 @@
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache em memória do container (sobrevive entre invocações "quentes").
+    Cada entrada expira após `ttl_seconds` e, ao passar de `max_size`,
+    a entrada usada há mais tempo é descartada (LRU).
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Versão do catálogo conhecida por este container e se ela já foi
+        # conferida na invocação atual.
+        self.version = None
+        self._version_checked = False
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def begin_request(self):
+        """Chamado no início de cada invocação: força reconferir a versão."""
+        self._version_checked = False
+
+    def sync_version(self, load_version):
+        """
+        Confere a versão do catálogo no máximo uma vez por invocação.
+        Se outro container publicou uma versão nova, descarta tudo.
+        """
+        if self._version_checked:
+            return
+
+        current = load_version()
+        if current != self.version:
+            self.clear()
+            self.version = current
+        self._version_checked = True
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,155 @@
+"""
+Conversões entre modelos, itens do DynamoDB e o JSON das respostas.
+
+O DynamoDB devolve números como Decimal e não aceita float; o JSON das
+respostas não conhece Decimal. Em vez de ida e volta por texto
+(model_dump_json -> json.loads -> varredura trocando float por Decimal),
+cada lado faz uma única passada:
+
+- to_item: modelo pydantic -> dict com Decimal (pronto para o put_item);
+- dumps: item -> JSON. Decimal sai como texto exato ("12.50"), o contrato
+  da API desde sempre (era o default=str): o frontend lê dinheiro de
+  pedidos como string. Quem quer número (catálogo, analytics) converte
+  no próprio serviço.
+
+E, entre os repositórios e o client de baixo nível do DynamoDB,
+serialize/deserialize convertem dict Python <-> formato tipado
+({'S': ...}, {'N': ...}) com despacho por tipo, no lugar do
+TypeSerializer/TypeDeserializer do boto3.
+"""
+import base64
+import json
+from decimal import Decimal
+from enum import Enum
+
+# Um double representa exatamente qualquer decimal de até 15 dígitos
+# significativos: float(d) volta para o mesmo texto no JSON.
+FLOAT_SAFE_DIGITS = 15
+
+def to_item(model) -> dict:
+    """
+    Modelo pydantic -> item do DynamoDB. model_dump (modo python) já mantém
+    Decimal como Decimal; enums saem como valor via use_enum_values do modelo.
+    """
+    return model.model_dump()
+
+
+def to_number(value: Decimal):
+    """Decimal -> int (inteiros), float (até 15 dígitos) ou str (sem perder precisão)."""
+    if not value.is_finite():
+        return str(value)
+
+    sign, digits, exponent = value.as_tuple()
+    if exponent >= 0:
+        return int(value)
+    if len(digits) <= FLOAT_SAFE_DIGITS:
+        return float(value)
+    return str(value)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        # Texto exato, sem passar por float (mesmo formato do antigo default=str)
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        # Sets do DynamoDB (SS/NS)
+        return sorted(value, key=str)
+    return str(value)
+
+
+def dumps(body) -> str:
+    """Serializa a resposta numa passada só (o `default` só é chamado para Decimal & cia)."""
+    return json.dumps(body, default=_default)
+
+
+# --- Formato tipado do DynamoDB -------------------------------------------
+
+def serialize(value) -> dict:
+    """Valor Python -> AttributeValue ({'S': 'x'}, {'N': '1.5'}, {'M': {...}}...)."""
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        encoder = _encoder_for(value)
+    return encoder(value)
+
+
+def serialize_item(item: dict) -> dict:
+    return {key: serialize(value) for key, value in item.items()}
+
+
+def deserialize(attribute: dict):
+    """AttributeValue -> valor Python (números como Decimal, como no boto3)."""
+    (tag, value), = attribute.items()
+    return _DECODERS[tag](value)
+
+
+def deserialize_item(item: dict) -> dict:
+    return {key: deserialize(value) for key, value in item.items()}
+
+
+def _encode_number(value) -> dict:
+    if type(value) is Decimal and not value.is_finite():
+        raise TypeError(f"Número inválido para o DynamoDB: {value}")
+    return {'N': str(value)}
+
+
+def _encode_float(value):
+    raise TypeError("Float não é aceito pelo DynamoDB: use Decimal.")
+
+
+def _encode_set(value) -> dict:
+    if not value:
+        raise TypeError("O DynamoDB não aceita sets vazios.")
+    sample = next(iter(value))
+    if isinstance(sample, str):
+        return {'SS': list(value)}
+    if isinstance(sample, (bytes, bytearray)):
+        return {'BS': [bytes(v) for v in value]}
+    return {'NS': [_encode_number(v)['N'] for v in value]}
+
+
+_ENCODERS = {
+    str: lambda value: {'S': value},
+    Decimal: _encode_number,
+    int: _encode_number,
+    bool: lambda value: {'BOOL': value},
+    type(None): lambda value: {'NULL': True},
+    dict: lambda value: {'M': {k: serialize(v) for k, v in value.items()}},
+    list: lambda value: {'L': [serialize(v) for v in value]},
+    tuple: lambda value: {'L': [serialize(v) for v in value]},
+    set: _encode_set,
+    frozenset: _encode_set,
+    bytes: lambda value: {'B': value},
+    bytearray: lambda value: {'B': bytes(value)},
+    float: _encode_float,
+}
+
+
+def _encoder_for(value):
+    """Subclasses (ex: enums de str) caem no encoder da classe base."""
+    if isinstance(value, Enum):
+        return lambda member: serialize(member.value)
+    for base, encoder in _ENCODERS.items():
+        if isinstance(value, base):
+            return encoder
+    raise TypeError(f"Tipo não suportado pelo DynamoDB: {type(value).__name__}")
+
+
+def _binary(value) -> bytes:
+    """Binário já decodificado pelo botocore, ou em base64 no JSON cru."""
+    return base64.b64decode(value) if isinstance(value, str) else bytes(value)
+
+
+_DECODERS = {
+    'S': lambda value: value,
+    'N': Decimal,
+    'BOOL': lambda value: value,
+    'NULL': lambda value: None,
+    'M': lambda value: {k: deserialize(v) for k, v in value.items()},
+    'L': lambda value: [deserialize(v) for v in value],
+    'SS': set,
+    'NS': lambda value: {Decimal(v) for v in value},
+    'B': lambda value: _binary(value),
+    'BS': lambda value: {_binary(v) for v in value},
+}
@@ -1,36 +1,116 @@
-import boto3
+import json
 import os
 import logging
+import threading
+
+from core import metrics
 
 logger = logging.getLogger()
 
+# Sintonia do client (sobrescrevível por variável de ambiente).
+# O Lambda da API tem 10 s: 3 tentativas x (1 s conexão + 2 s leitura) cabem
+# no orçamento com folga para o backoff, em vez de uma única chamada presa
+# no read_timeout padrão de 60 s.
+DEFAULT_MAX_POOL_CONNECTIONS = 16   # rotas gravam em até 8 threads (ROUTE_MAX_WORKERS)
+DEFAULT_CONNECT_TIMEOUT = 1.0
+DEFAULT_READ_TIMEOUT = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Campos da resposta que carregam itens (AttributeValues) e que o botocore
+# percorreria shape a shape. O JSON cru já tem o formato tipado: eles vão
+# direto para core.codec.deserialize, sem esse passo intermediário.
+RAW_RESPONSE_FIELDS = ('Item', 'Items', 'Attributes', 'Responses')
+
+
 class Database:
     _instance = None
-    _table_resource = None
+    _table_name = None
+    _client = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(Database, cls).__new__(cls)
-            cls._instance._initialize()
+            # Criação lazy: duas threads no primeiro uso não podem ver a
+            # instância antes do client existir
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(Database, cls).__new__(cls)
+                    instance._initialize()
+                    cls._instance = instance
         return cls._instance
 
     def _initialize(self):
         """
-        Inicializa o recurso do DynamoDB apenas uma vez.
+        Inicializa o client do DynamoDB apenas uma vez.
         """
         table_name = os.environ.get('TABLE_NAME')
         if not table_name:
             logger.error("Variavel de ambiente TABLE_NAME nao definida.")
             raise RuntimeError("Configuração de tabela ausente.")
 
-        # O boto3.resource é mais alto nível que o client
-        dynamodb = boto3.resource('dynamodb')
-        self._table_resource = dynamodb.Table(table_name)
+        # Importado aqui: só paga o custo do boto3 quem realmente usa o banco
+        import boto3
+
+        # Client de baixo nível: os repositórios fazem a (de)serialização
+        # com core.codec, mais rápida que a camada de resource do boto3
+        self._client = boto3.client('dynamodb', config=client_config())
+        self._client.meta.events.register('before-parse.dynamodb', skip_item_parsing)
+        if metrics.ENABLED:
+            # ConsumedCapacity e latência de cada chamada (ver core.metrics)
+            metrics.instrument_client(self._client)
+        self._table_name = table_name
         logger.info(f"Conexão com DynamoDB estabelecida na tabela: {table_name}")
 
     @property
-    def table(self):
-        return self._table_resource
+    def table_name(self) -> str:
+        return self._table_name
+
+    @property
+    def client(self):
+        return self._client
+
+
+def client_config():
+    """Pool, keep-alive, retries adaptativos e timeouts dentro do orçamento do Lambda."""
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS)),
+        tcp_keepalive=True,
+        connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+        retries={
+            # adaptive: além do backoff, segura o ritmo do próprio client
+            # quando o DynamoDB devolve throttling
+            'mode': 'adaptive',
+            'max_attempts': int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+        }
+    )
+
+
+def skip_item_parsing(response_dict, customized_response_dict, **kwargs):
+    """
+    Handler do evento before-parse: tira os itens do corpo antes do parser do
+    botocore e os devolve crus via customized_response_dict (que o botocore
+    mescla na resposta). O resto (LastEvaluatedKey, ConsumedCapacity, erros)
+    segue pelo parser normal.
+    """
+    if response_dict.get('status_code', 500) >= 300 or not response_dict.get('body'):
+        return
+
+    body = json.loads(response_dict['body'])
+    moved = [field for field in RAW_RESPONSE_FIELDS if field in body]
+    if not moved:
+        return
+
+    for field in moved:
+        customized_response_dict[field] = body.pop(field)
+    response_dict['body'] = json.dumps(body).encode()
+
 
-# Instância global para ser importada pelos repositórios
-db_instance = Database()
\ No newline at end of file
+def get_database() -> Database:
+    """
+    Singleton criado no primeiro uso (e não no import do módulo), para que
+    rotas que não tocam o DynamoDB não paguem a criação do client.
+    """
+    return Database()
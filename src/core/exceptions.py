@@ -12,4 +12,26 @@ class BusinessRuleException(DomainException):
 
 class InfrastructureException(Exception):
     """Erros técnicos (banco fora do ar, erro de conexão)."""
-    pass
\ No newline at end of file
+    pass
+
+class ConditionalCheckFailedException(InfrastructureException):
+    """Escrita recusada pelo banco: a ConditionExpression não foi satisfeita."""
+    pass
+
+class TransactionCanceledException(InfrastructureException):
+    """
+    Transação recusada (nada foi aplicado). `codes` traz um código por ação,
+    na ordem das ações: 'None', 'ConditionalCheckFailed', 'TransactionConflict'...
+    """
+
+    def __init__(self, message: str, codes: list):
+        super().__init__(message)
+        self.codes = codes
+
+class ThrottlingException(InfrastructureException):
+    """Banco recusou por limite de vazão ou erro interno transitório: pode ser reenviado."""
+    pass
+
+class ServiceUnavailableException(InfrastructureException):
+    """Dependência opcional fora do pacote da Lambda (ex: numpy): a rota responde 503."""
+    pass
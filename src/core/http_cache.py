@@ -0,0 +1,117 @@
+"""
+ETag / GET condicional e compressão das respostas da API.
+
+- O ETag é forte e vem de uma versão (catálogo) ou de um hash barato do
+  conteúdo (pedidos): dá para responder 304 antes de serializar o corpo.
+- Corpos maiores que COMPRESS_MIN_BYTES saem em br (se o módulo `brotli`
+  estiver no pacote) ou gzip, conforme o Accept-Encoding do cliente.
+  O API Gateway (HTTP API) exige corpo binário em base64.
+"""
+import base64
+import gzip
+import hashlib
+
+# Abaixo disso a compressão custa mais CPU do que economiza de rede
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Muda quando o formato das respostas muda: invalida os caches dos clientes
+ETAG_FORMAT = 'v1'
+
+# Sem max-age: o navegador sempre revalida (If-None-Match) antes de reusar
+CACHE_CONTROL = 'private, no-cache'
+
+_brotli = None
+
+
+def make_etag(*parts) -> str:
+    """ETag forte a partir de uma versão/hash: "v1-catalogo-42"."""
+    return '"' + '-'.join([ETAG_FORMAT, *map(str, parts)]) + '"'
+
+
+def content_hash(values) -> str:
+    """Hash curto de uma sequência de strings (ex: id:status:versao de cada pedido)."""
+    digest = hashlib.blake2b(digest_size=12)
+    for value in values:
+        digest.update(value.encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def etag_matches(headers: dict, etag: str) -> bool:
+    """
+    Compara o If-None-Match com o ETag atual. A representação comprimida leva
+    um sufixo (-gzip/-br) no ETag; aqui ele é ignorado, porque o conteúdo é o mesmo.
+    """
+    header = headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        for suffix in ('-gzip"', '-br"'):
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)] + '"'
+                break
+        if candidate == etag:
+            return True
+    return False
+
+
+def accepted_encodings(headers: dict) -> set:
+    """Codificações aceitas pelo Accept-Encoding (q=0 recusa)."""
+    accepted = set()
+    for entry in (headers.get('accept-encoding') or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def compress_response(headers: dict, response: dict) -> dict:
+    """Comprime o corpo (in-place) se o cliente aceitar e valer a pena."""
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response['headers']['Vary'] = 'Accept-Encoding'
+    accepted = accepted_encodings(headers)
+
+    if 'br' in accepted and _load_brotli():
+        encoding, data = 'br', _brotli.compress(body.encode(), quality=BROTLI_QUALITY)
+    elif 'gzip' in accepted:
+        encoding, data = 'gzip', gzip.compress(body.encode(), compresslevel=GZIP_LEVEL)
+    else:
+        return response
+
+    response['headers']['Content-Encoding'] = encoding
+    etag = response['headers'].get('ETag')
+    if etag:
+        response['headers']['ETag'] = f'{etag[:-1]}-{encoding}"'
+    response['body'] = base64.b64encode(data).decode()
+    response['isBase64Encoded'] = True
+    return response
+
+
+def _load_brotli() -> bool:
+    """brotli é opcional: sem ele, só gzip."""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return bool(_brotli)
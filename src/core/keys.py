@@ -0,0 +1,87 @@
+"""
+Layout de chaves da tabela principal (versão 2).
+
+v1: só `id` como partition key; os tipos eram separados por `tipo_item` e
+qualquer listagem precisava de Scan.
+
+v2: pk = "<TIPO>#<id>" e sk = tipo do item, mais três GSIs definidos no
+CookieAdminServerlessStack, um por padrão de acesso:
+
+- StatusIndex   (status, criado_em):          pedidos por status, em ordem de criação;
+- DeliveryIndex (mes_entrega, data_entrega):  pedidos por data de entrega;
+- FlavorIndex   (tipo_item, sabor):           catálogo em ordem de sabor.
+
+Cada item é lido pelo próprio id; as ordenações por data/status ficam nos
+índices. `id` continua gravado no item: é ele que a API devolve.
+
+Partições dos GSIs: toda escrita num item indexado também é escrita na
+partição do GSI, e um GSI com throttling segura as escritas da tabela base
+(~1000 WCU/s por valor de partition key). Por isso o DeliveryIndex é
+particionado pelo mês de entrega ("AAAA-MM", preenchido por with_key) e não
+por tipo_item: com uma chave só ('PEDIDO'), todo pedido gravado (inclusive
+os lotes de POST /orders/batch) cairia na mesma partição. Um intervalo de
+datas vira um Query por mês (ver delivery_months). O FlavorIndex continua
+em tipo_item: só cookies e reservas de sabor entram nele, com pouca escrita.
+"""
+
+KEY_SCHEMA_VERSION = 2
+
+# Atributos só do layout (chave primária e partição do DeliveryIndex): ficam fora da API
+KEY_ATTRIBUTES = ('pk', 'sk', 'mes_entrega')
+
+STATUS_INDEX = 'StatusIndex'
+DELIVERY_INDEX = 'DeliveryIndex'
+FLAVOR_INDEX = 'FlavorIndex'
+
+# (partition key, sort key) de cada GSI, como no stack
+INDEX_KEYS = {
+    STATUS_INDEX: ('status', 'criado_em'),
+    DELIVERY_INDEX: ('mes_entrega', 'data_entrega'),
+    FLAVOR_INDEX: ('tipo_item', 'sabor'),
+}
+
+# Tipos cujo id é um uuid "solto" e ganha o prefixo do tipo na pk. Os demais
+# (SABOR_RESERVA, CATALOGO_VERSAO) já usam ids compostos ("SABOR#...").
+_PREFIXES = {
+    'COOKIE': 'COOKIE#',
+    'PEDIDO': 'PEDIDO#',
+    'ENTREGA': 'ENTREGA#',
+}
+
+
+def item_key(tipo_item: str, item_id: str) -> dict:
+    """Chave primária de um item: item_key('PEDIDO', 'ord_1') -> {'pk': 'PEDIDO#ord_1', 'sk': 'PEDIDO'}."""
+    return {'pk': _PREFIXES.get(tipo_item, '') + item_id, 'sk': tipo_item}
+
+
+def with_key(item: dict) -> dict:
+    """Item pronto para o PutItem (id + tipo_item -> pk/sk, e a partição do DeliveryIndex)."""
+    keyed = {**item, **item_key(item['tipo_item'], item['id'])}
+    # Só pedidos entram no DeliveryIndex (a ENTREGA também tem data_entrega)
+    if item['tipo_item'] == 'PEDIDO' and item.get('data_entrega'):
+        keyed['mes_entrega'] = delivery_month(item['data_entrega'])
+    return keyed
+
+
+def delivery_month(data_entrega: str) -> str:
+    """Partition key do DeliveryIndex: '2025-02-10T09:00' -> '2025-02'."""
+    return data_entrega[:7]
+
+
+def delivery_months(de: str, ate: str) -> list:
+    """Meses (partições do DeliveryIndex) de um intervalo, em ordem: ['2025-01', '2025-02', ...]."""
+    year, month = int(de[:4]), int(de[5:7])
+    last = delivery_month(ate)
+    months = []
+    while True:
+        current = f"{year:04d}-{month:02d}"
+        months.append(current)
+        if current >= last:
+            return months
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def key_id(key: dict) -> str:
+    """Id de volta a partir da chave (para reportar falhas por pedido)."""
+    prefix = _PREFIXES.get(key['sk'], '')
+    return key['pk'][len(prefix):]
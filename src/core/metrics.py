@@ -0,0 +1,187 @@
+"""
+Métricas de desempenho por invocação, no formato EMF (Embedded Metric
+Format) do CloudWatch: uma linha JSON no stdout que o CloudWatch Logs
+transforma em métricas, com a rota como dimensão.
+
+Ligadas por PERF_METRICS=1. Desligadas, nada é registrado: o client do
+DynamoDB não recebe os hooks, o index.handler não abre spans e span()
+devolve sempre o mesmo contexto vazio.
+
+O que vai na linha (tempos em ms, spans inclusivos):
+- HandlerTime: a invocação inteira (rota + compressão);
+- ServiceTime: a função da rota, que inclui as três abaixo;
+- DynamoDBTime / DynamoDBCalls: soma das chamadas do client (com retries);
+- DeserializationTime: formato tipado -> dict Python (os Decimal) nos repositórios;
+- SerializationTime: dumps do corpo da resposta;
+- CompressionTime: gzip/br do corpo;
+- ConsumedRCU / ConsumedWCU: ReturnConsumedCapacity de cada chamada.
+E, fora das métricas (só no log), o detalhe de cada chamada ao DynamoDB.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.environ.get('PERF_METRICS', '').lower() in ('1', 'true', 'on')
+NAMESPACE = os.environ.get('PERF_METRICS_NAMESPACE', 'CookieAdmin')
+
+# Operações que consomem leitura; as demais consomem escrita
+READ_OPERATIONS = frozenset(('GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'))
+
+# Spans -> nome da métrica
+SPAN_METRICS = {
+    'handler': 'HandlerTime',
+    'service': 'ServiceTime',
+    'deserialization': 'DeserializationTime',
+    'serialization': 'SerializationTime',
+    'compression': 'CompressionTime',
+}
+
+_NOOP = nullcontext()
+
+# Invocação em andamento (uma por vez por container; None fora dela)
+_current = None
+
+
+class Invocation:
+    """Acumula spans e chamadas de uma invocação. Chamadas podem vir de várias threads."""
+
+    def __init__(self, route: str, request_id: str = None):
+        self.route = route
+        self.request_id = request_id
+        self.spans = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def add_call(self, operation: str, table: str, index: str, seconds: float, capacity, error: str = None):
+        call = {'operacao': operation, 'tabela': table, 'ms': round(seconds * 1000, 3),
+                'capacidade': _capacity_units(capacity)}
+        if index:
+            call['indice'] = index
+        if error:
+            call['erro'] = error
+        with self._lock:
+            self.calls.append(call)
+
+    def emf(self, timestamp_ms: int = None) -> dict:
+        """Documento EMF da invocação."""
+        values = {metric: 0.0 for metric in SPAN_METRICS.values()}
+        for name, seconds in self.spans.items():
+            values[SPAN_METRICS.get(name, name)] = seconds * 1000
+
+        rcu = sum(c['capacidade'] for c in self.calls if c['operacao'] in READ_OPERATIONS)
+        wcu = sum(c['capacidade'] for c in self.calls if c['operacao'] not in READ_OPERATIONS)
+        values.update(DynamoDBTime=sum(c['ms'] for c in self.calls), DynamoDBCalls=len(self.calls),
+                      ConsumedRCU=rcu, ConsumedWCU=wcu)
+
+        units = {'DynamoDBCalls': 'Count', 'ConsumedRCU': 'Count', 'ConsumedWCU': 'Count'}
+        document = {
+            '_aws': {
+                'Timestamp': timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['Route']],
+                    'Metrics': [{'Name': name, 'Unit': units.get(name, 'Milliseconds')} for name in values]
+                }]
+            },
+            'Route': self.route,
+            **{name: round(value, 3) for name, value in values.items()},
+            'DynamoDBCallDetails': self.calls
+        }
+        if self.request_id:
+            document['RequestId'] = self.request_id
+        return document
+
+
+class _Span:
+    __slots__ = ('invocation', 'name', 'started')
+
+    def __init__(self, invocation: Invocation, name: str):
+        self.invocation = invocation
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.invocation.add_span(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def start(route: str, request_id: str = None) -> Invocation:
+    """Abre a invocação (descarta o que tiver sobrado de uma anterior)."""
+    global _current
+    _current = Invocation(route, request_id)
+    return _current
+
+
+def span(name: str):
+    """Mede o bloco `with` no span `name` (tempos somados); fora de uma invocação, não faz nada."""
+    invocation = _current
+    if invocation is None:
+        return _NOOP
+    return _Span(invocation, name)
+
+
+def flush():
+    """Emite a linha EMF da invocação e a encerra."""
+    global _current
+    invocation, _current = _current, None
+    if invocation is not None:
+        # print e não logger: o EMF exige a linha JSON pura, sem o prefixo do log
+        print(json.dumps(invocation.emf(), ensure_ascii=False), flush=True)
+
+
+# Hooks do client do DynamoDB (registrados por core.database só com ENABLED)
+
+def instrument_client(client):
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', request_consumed_capacity)
+    events.register('before-call.dynamodb', start_call)
+    events.register('after-call.dynamodb', end_call)
+    events.register('after-call-error.dynamodb', end_call_error)
+
+
+def request_consumed_capacity(params, model, context, **kwargs):
+    """Toda chamada pede o ConsumedCapacity (o chamador pode ter pedido INDEXES)."""
+    params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+    # O contexto é da chamada (threads diferentes não se misturam) e chega
+    # aos eventos seguintes, que não recebem mais os parâmetros
+    table = params.get('TableName') or ','.join(params.get('RequestItems', {})) or None
+    context['metrics_call'] = (model.name, table, params.get('IndexName'))
+
+
+def start_call(context, **kwargs):
+    context['metrics_started'] = time.perf_counter()
+
+
+def end_call(parsed, context, **kwargs):
+    _record(context, parsed.get('ConsumedCapacity'), parsed.get('Error', {}).get('Code'))
+
+
+def end_call_error(exception, context, **kwargs):
+    _record(context, None, type(exception).__name__)
+
+
+def _record(context, capacity, error):
+    invocation = _current
+    started = context.pop('metrics_started', None)
+    if invocation is None or started is None or 'metrics_call' not in context:
+        return
+    operation, table, index = context['metrics_call']
+    invocation.add_call(operation, table, index, time.perf_counter() - started, capacity, error)
+
+
+def _capacity_units(capacity) -> float:
+    """ConsumedCapacity (um dict, ou uma lista nas operações em lote/transação) -> unidades."""
+    if not capacity:
+        return 0.0
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return float(sum(entry.get('CapacityUnits', 0) for entry in capacity))
@@ -0,0 +1,41 @@
+"""
+Cursor opaco das listagens paginadas.
+
+O cliente recebe `next` (base64 url-safe de um JSON com a posição da
+leitura) e o devolve como está na próxima chamada. O conteúdo é detalhe
+interno: pode mudar sem quebrar o frontend.
+"""
+import base64
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+def encode_cursor(state: dict) -> str:
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> dict:
+    """Cursor -> estado. Qualquer cursor malformado vira ValueError (400)."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido.")
+    if not isinstance(state, dict):
+        raise ValueError("Cursor inválido.")
+    return state
+
+
+def parse_limit(value, default: int = DEFAULT_LIMIT) -> int:
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' deve ser um número inteiro.")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"'limit' deve estar entre 1 e {MAX_LIMIT}.")
+    return limit
@@ -0,0 +1,152 @@
+"""
+Roteador declarativo do index.handler.
+
+As rotas são registradas com decorators e compiladas, no import, numa árvore
+de segmentos. Paths sem parâmetros resolvem num único dict lookup; os demais
+percorrem um nó por segmento do path. Nos dois casos o custo não depende de
+quantas rotas existem.
+
+    router = Router()
+
+    @router.patch('/orders/{pedido_id}/status')
+    def update_status(event, pedido_id):
+        ...
+
+Parâmetros podem ter tipo: '{n:int}' só casa com inteiros e já chega como int.
+"""
+
+# Conversores de parâmetros tipados ({nome:tipo})
+CONVERTERS = {
+    'str': str,
+    'int': int,
+}
+
+
+class Match:
+    """Resultado de Router.resolve."""
+
+    __slots__ = ('handler', 'params', 'allowed', 'pattern')
+
+    def __init__(self, handler, params, allowed, pattern=None):
+        self.handler = handler      # None quando o path existe mas o método não
+        self.params = params
+        self.allowed = allowed      # métodos aceitos no path (para Allow / 405)
+        self.pattern = pattern      # padrão registrado (ex: '/orders/{pedido_id}'), p/ métricas
+
+
+class _Node:
+    __slots__ = ('static', 'param', 'handlers', 'allowed', 'pattern')
+
+    def __init__(self):
+        self.static = {}            # segmento literal -> _Node
+        self.param = []             # [(nome, conversor, _Node)], na ordem de registro
+        self.handlers = {}          # método HTTP -> função
+        self.allowed = []           # métodos de `handlers`, ordenados
+        self.pattern = None         # padrão que levou a este nó
+
+
+class Router:
+    def __init__(self):
+        self._root = _Node()
+        self._static_paths = {}     # '/orders' -> _Node (rotas sem parâmetros)
+
+    def route(self, method: str, pattern: str):
+        """Registra `func` para `method` + `pattern` (ex: '/orders/{pedido_id}/loss')."""
+        def decorator(func):
+            node = self._compile(pattern)
+            method_upper = method.upper()
+            if method_upper in node.handlers:
+                raise ValueError(f"Rota duplicada: {method_upper} {pattern}")
+            node.handlers[method_upper] = func
+            node.allowed = sorted(node.handlers)
+            node.pattern = node.pattern or pattern
+            if '{' not in pattern:
+                self._static_paths['/' + '/'.join(_segments(pattern))] = node
+            return func
+        return decorator
+
+    def get(self, pattern: str):
+        return self.route('GET', pattern)
+
+    def post(self, pattern: str):
+        return self.route('POST', pattern)
+
+    def put(self, pattern: str):
+        return self.route('PUT', pattern)
+
+    def patch(self, pattern: str):
+        return self.route('PATCH', pattern)
+
+    def delete(self, pattern: str):
+        return self.route('DELETE', pattern)
+
+    def resolve(self, method: str, path: str):
+        """
+        Devolve um Match, ou None se nenhum padrão casa com o path.
+        Match.handler é None quando o path existe mas não aceita o método.
+        """
+        params = {}
+        node = self._static_paths.get(path)
+        if node is None:
+            node = self._walk(self._root, _segments(path), 0, params)
+            if node is None:
+                return None
+
+        return Match(node.handlers.get(method), params, node.allowed, node.pattern)
+
+    def _compile(self, pattern: str) -> _Node:
+        node = self._root
+        for segment in _segments(pattern):
+            if segment.startswith('{') and segment.endswith('}'):
+                name, _, kind = segment[1:-1].partition(':')
+                converter = CONVERTERS.get(kind or 'str')
+                if not name or converter is None:
+                    raise ValueError(f"Parâmetro inválido '{segment}' em {pattern}")
+
+                for existing_name, existing_converter, child in node.param:
+                    if existing_converter is converter:
+                        if existing_name != name:
+                            raise ValueError(f"Parâmetros conflitantes em {pattern}: '{existing_name}' x '{name}'")
+                        node = child
+                        break
+                else:
+                    child = _Node()
+                    node.param.append((name, converter, child))
+                    # Tipos mais restritos (int) são testados antes de str
+                    node.param.sort(key=lambda entry: entry[1] is str)
+                    node = child
+            else:
+                node = node.static.setdefault(segment, _Node())
+        return node
+
+    def _walk(self, node, segments, index, params):
+        """
+        Segmentos literais têm prioridade sobre parâmetros; se um ramo não
+        leva a uma rota, tenta o próximo (ex: '/orders/batch' x '/orders/{pedido_id}').
+        """
+        if index == len(segments):
+            return node if node.handlers else None
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            found = self._walk(child, segments, index + 1, params)
+            if found is not None:
+                return found
+
+        for name, converter, child in node.param:
+            try:
+                value = converter(segment)
+            except ValueError:
+                continue
+            found = self._walk(child, segments, index + 1, params)
+            if found is not None:
+                params[name] = value
+                return found
+
+        return None
+
+
+def _segments(path: str) -> list:
+    """'/orders/123/status/' -> ['orders', '123', 'status'] (barras extras ignoradas)."""
+    return [segment for segment in (path or '/').split('/') if segment]
@@ -1,22 +1,61 @@
 import json
 import logging
 import os
-from decimal import Decimal
+from functools import lru_cache
 
-# Importando Exceções e Serviços
-from core.exceptions import BusinessRuleException, EntityNotFoundException
-from services.catalog_service import CatalogService
-from services.order_service import OrderService
-from services.logistics_service import LogisticsService
+# Importando Exceções (os serviços são importados sob demanda, abaixo)
+from core import metrics
+from core.cache import TTLCache
+from core.codec import dumps
+from core.http_cache import CACHE_CONTROL, compress_response, content_hash, etag_matches, make_etag
+from core.exceptions import BusinessRuleException, EntityNotFoundException, ServiceUnavailableException
+from core.router import Router
 
 # Setup
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Injeção de Dependências
-catalog_service = CatalogService()
-order_service = OrderService()
-logistics_service = LogisticsService()
+# Cache do catálogo (vive enquanto o container estiver quente)
+catalog_cache = TTLCache(
+    max_size=int(os.environ.get('CATALOG_CACHE_MAX_SIZE', '256')),
+    ttl_seconds=float(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '300'))
+)
+
+
+# Injeção de Dependências (lazy)
+# Cada serviço (e o que ele importa: boto3, pydantic, models...) só é
+# carregado na primeira rota que o usa e reaproveitado enquanto o container
+# estiver quente. Um pre-flight OPTIONS não carrega nada disso, e GET /cookies
+# não carrega pydantic.
+@lru_cache(maxsize=None)
+def get_catalog_service():
+    from services.catalog_service import CatalogService
+    return CatalogService(cache=catalog_cache)
+
+
+@lru_cache(maxsize=None)
+def get_order_service():
+    from services.order_service import OrderService
+    return OrderService(catalog_cache=catalog_cache)
+
+
+@lru_cache(maxsize=None)
+def get_logistics_service():
+    from services.logistics_service import LogisticsService
+    return LogisticsService()
+
+
+@lru_cache(maxsize=None)
+def get_analytics_service():
+    from services.analytics_service import AnalyticsService
+    return AnalyticsService()
+
+
+# Query params que ativam a listagem paginada de GET /orders
+ORDER_PAGE_PARAMS = ('limit', 'next', 'fields', 'status', 'entrega_de', 'entrega_ate')
+
+# Rotas registradas com @router.<método>(padrão) ao final do módulo
+router = Router()
 
 # Lê a origem permitida (injetada pelo stack.py) ou usa '*' como fallback
 ALLOWED_ORIGIN = os.environ.get('ALLOWED_ORIGIN', '*')
@@ -28,81 +67,41 @@ def handler(event, context):
     """
     method = event.get('requestContext', {}).get('http', {}).get('method')
     path = event.get('rawPath', '/')
+    match = router.resolve(method, path)
 
     # 1. Tratamento de Pre-flight (Browser pergunta: Posso chamar?)
     if method == 'OPTIONS':
-        return response(200, "")
+        if match is None:
+            return response(200, "")
+        return response(200, "", headers=allow_headers(match.allowed))
+
+    if match is None:
+        return response(404, {'error': 'Rota não encontrada'})
+    if match.handler is None:
+        return response(405, {'error': 'Método não permitido'}, headers=allow_headers(match.allowed))
 
+    # Versão do catálogo é reconferida (uma vez) a cada invocação
+    catalog_cache.begin_request()
+
+    if not metrics.ENABLED:
+        return dispatch(event, match)
+
+    # Uma linha EMF por invocação, com a rota (padrão, não o path) como dimensão
+    metrics.start(f"{method} {match.pattern}", getattr(context, 'aws_request_id', None))
     try:
-        # ROTA: /cookies (Catalog)
-        if path == '/cookies':
-            if method == 'GET':
-                result = catalog_service.list_all()
-                return response(200, result)
-
-            elif method == 'POST':
-                body = parse_body(event)
-                result = catalog_service.create_product(body)
-                return response(201, result)
-
-        # ROTA: /orders (Sales)
-        elif path == '/orders':
-            if method == 'GET':
-                result = order_service.list_active()
-                return response(200, result)
-            elif method == 'POST':
-                body = parse_body(event)
-                result = order_service.create_order(body)
-                return response(201, result)
-
-        # ROTA: /logistics/routes (Delivery)
-        elif path == '/logistics/routes' and method == 'POST':
-            body = parse_body(event)
-            result = logistics_service.create_route(
-                body.get('motoboy_nome'),
-                body.get('custo_total'),
-                body.get('pedidos_ids')
-            )
-            return response(200, result)
-
-        # ROTA: /cookies/{id} (PUT para edição)
-        elif path.startswith('/cookies/') and method == 'PUT':
-            cookie_id = path.split('/')[-1]
-            body = parse_body(event)
-            result = catalog_service.update_product(cookie_id, body)
-            return response(200, result)
-
-        # ROTA: /orders/{id}/status (PATCH para status)
-        elif path.startswith('/orders/') and path.endswith('/status') and method == 'PATCH':
-            parts = path.split('/')  # ['', 'orders', '123', 'status']
-            if len(parts) < 3: raise ValueError("ID inválido")
-
-            pedido_id = parts[2]
-            body = parse_body(event)
-            novo_status = body.get('status')
-
-            if not novo_status:
-                raise ValueError("Campo 'status' obrigatório")
-
-            result = order_service.update_order_status(pedido_id, novo_status)
-            return response(200, result)
-
-        # ROTA: /orders/{id}/loss (Registrar Extravio)
-        elif path.startswith('/orders/') and path.endswith('/loss') and method == 'POST':
-            parts = path.split('/')
-            if len(parts) < 3: raise ValueError("ID inválido")
-
-            pedido_id = parts[2]
-            body = parse_body(event)
-            motivo = body.get('motivo')
-
-            if not motivo:
-                raise BusinessRuleException("É obrigatório informar o motivo.")
-
-            result = order_service.register_order_loss(pedido_id, motivo)
-            return response(200, result)
+        with metrics.span('handler'):
+            return dispatch(event, match)
+    finally:
+        metrics.flush()
 
-        return response(404, {'error': 'Rota não encontrada'})
+
+def dispatch(event, match):
+    """Executa a rota e traduz as exceções de negócio em status HTTP."""
+    try:
+        with metrics.span('service'):
+            result = match.handler(event, **match.params)
+        with metrics.span('compression'):
+            return compress_response(request_headers(event), result)
 
     # Tratamento de Erros Personalizado
     except EntityNotFoundException as e:
@@ -111,11 +110,164 @@ def handler(event, context):
         return response(400, {'error': str(e)})
     except ValueError as e:
         return response(400, {'error': str(e)})
+    except ServiceUnavailableException as e:
+        logger.warning(str(e))
+        return response(503, {'error': str(e)})
     except Exception as e:
         logger.error(f"Erro Crítico: {e}", exc_info=True)
         return response(500, {'error': 'Erro interno do servidor'})
 
 
+# ROTA: /cookies (Catalog)
+@router.get('/cookies')
+def list_cookies(event):
+    # ETag pela versão do catálogo: 304 sem nem fazer o Scan
+    service = get_catalog_service()
+    return conditional_response(event, make_etag('catalogo', service.version()), service.list_all)
+
+
+@router.post('/cookies')
+def create_cookie(event):
+    body = parse_body(event)
+    return response(201, get_catalog_service().create_product(body))
+
+
+# ROTA: /cookies/{cookie_id} (PUT para edição)
+@router.put('/cookies/{cookie_id}')
+def update_cookie(event, cookie_id):
+    body = parse_body(event)
+    return response(200, get_catalog_service().update_product(cookie_id, body))
+
+
+# ROTA: /orders (Sales)
+@router.get('/orders')
+def list_orders(event):
+    params = event.get('queryStringParameters') or {}
+    service = get_order_service()
+
+    # Sem parâmetros: lista completa em array (contrato original do frontend)
+    if not any(name in params for name in ORDER_PAGE_PARAMS):
+        items = service.list_active()
+        return conditional_response(event, orders_etag(items), lambda: items)
+
+    page = service.list_page(
+        limit=params.get('limit'),
+        cursor=params.get('next'),
+        fields=params.get('fields'),
+        status=params.get('status'),
+        entrega_de=params.get('entrega_de'),
+        entrega_ate=params.get('entrega_ate')
+    )
+    return conditional_response(event, orders_etag(page['items'], page['next']), lambda: page)
+
+
+def orders_etag(items: list, cursor: str = None) -> str:
+    """ETag pelo hash de id:status:versao de cada pedido: 304 sem serializar."""
+    keys = (f"{i['id']}:{i.get('status')}:{i.get('versao', 0)}" for i in items)
+    return make_etag('pedidos', content_hash([*keys, cursor or '']))
+
+
+@router.post('/orders')
+def create_order(event):
+    body = parse_body(event)
+    return response(201, get_order_service().create_order(body))
+
+
+# ROTA: /orders/batch (Criação em massa)
+@router.post('/orders/batch')
+def create_orders_batch(event):
+    body = parse_body(event)
+    return response(200, get_order_service().create_orders(body.get('pedidos')))
+
+
+# ROTA: /orders/status:batch (Transição de status em massa)
+@router.patch('/orders/status:batch')
+def update_status_batch(event):
+    body = parse_body(event)
+    novo_status = body.get('status')
+
+    if not novo_status:
+        raise ValueError("Campo 'status' obrigatório")
+
+    return response(200, get_order_service().update_statuses(body.get('ids'), novo_status))
+
+
+# ROTA: /orders/{pedido_id}/history (Histórico de status, paginado)
+@router.get('/orders/{pedido_id}/history')
+def list_order_history(event, pedido_id):
+    params = event.get('queryStringParameters') or {}
+    page = get_order_service().list_history(pedido_id, limit=params.get('limit'), cursor=params.get('next'))
+    return response(200, page)
+
+
+# ROTA: /orders/{pedido_id}/status (PATCH para status)
+@router.patch('/orders/{pedido_id}/status')
+def update_order_status(event, pedido_id):
+    body = parse_body(event)
+    novo_status = body.get('status')
+
+    if not novo_status:
+        raise ValueError("Campo 'status' obrigatório")
+
+    return response(200, get_order_service().update_order_status(pedido_id, novo_status))
+
+
+# ROTA: /orders/{pedido_id}/loss (Registrar Extravio)
+@router.post('/orders/{pedido_id}/loss')
+def register_order_loss(event, pedido_id):
+    body = parse_body(event)
+    motivo = body.get('motivo')
+
+    if not motivo:
+        raise BusinessRuleException("É obrigatório informar o motivo.")
+
+    return response(200, get_order_service().register_order_loss(pedido_id, motivo))
+
+
+# ROTA: /logistics/routes (Delivery)
+@router.post('/logistics/routes')
+def create_route(event):
+    body = parse_body(event)
+    result = get_logistics_service().create_route(
+        body.get('motoboy_nome'),
+        body.get('custo_total'),
+        body.get('pedidos_ids')
+    )
+    return response(200, result)
+
+
+# ROTA: /logistics/plan (Planejamento das rotas de um dia)
+@router.post('/logistics/plan')
+def plan_routes(event):
+    return response(200, get_logistics_service().plan_routes(parse_body(event)))
+
+
+# ROTA: /analytics/daily (Agregados diários por sabor)
+@router.get('/analytics/daily')
+def daily_sales(event):
+    params = event.get('queryStringParameters') or {}
+    result = get_analytics_service().daily_sales(
+        params.get('inicio'),
+        params.get('fim'),
+        params.get('sabor')
+    )
+    return response(200, result)
+
+
+# ROTA: /analytics/sales (Consulta agregada no Data Lake)
+@router.get('/analytics/sales')
+def query_sales(event):
+    params = event.get('queryStringParameters') or {}
+    result = get_analytics_service().query_sales(
+        params.get('inicio'),
+        params.get('fim'),
+        params.get('sabor'),
+        params.get('status'),
+        params.get('group_by')
+    )
+    return response(200, result)
+
+
 def parse_body(event):
     """Helper para evitar crash se o body vier vazio ou inválido"""
     try:
@@ -124,7 +276,29 @@ def parse_body(event):
         raise ValueError("O corpo da requisição não é um JSON válido.")
 
 
-def response(status, body):
+def allow_headers(methods: list) -> dict:
+    """Métodos aceitos pelo path, para respostas OPTIONS e 405."""
+    allowed = ",".join(["OPTIONS", *methods])
+    return {"Allow": allowed, "Access-Control-Allow-Methods": allowed}
+
+
+def request_headers(event) -> dict:
+    """Headers da requisição (o HTTP API já entrega os nomes em minúsculas)."""
+    return event.get('headers') or {}
+
+
+def conditional_response(event, etag: str, load):
+    """
+    GET condicional: se o cliente já tem este ETag, 304 sem corpo;
+    senão chama `load()` e devolve 200 com o ETag.
+    """
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if etag_matches(request_headers(event), etag):
+        return response(304, None, headers=headers)
+    return response(200, load(), headers=headers)
+
+
+def response(status, body, headers=None):
     """
     Gera a resposta HTTP com os headers de CORS obrigatórios.
     """
@@ -134,8 +308,18 @@ def response(status, body):
             "Content-Type": "application/json",
             # AQUI ESTAVA FALTANDO:
             "Access-Control-Allow-Origin": ALLOWED_ORIGIN,
-            "Access-Control-Allow-Headers": "Content-Type,Authorization",
-            "Access-Control-Allow-Methods": "OPTIONS,POST,GET,PUT,PATCH"
+            "Access-Control-Allow-Headers": "Content-Type,Authorization,If-None-Match",
+            "Access-Control-Allow-Methods": "OPTIONS,POST,GET,PUT,PATCH",
+            "Access-Control-Expose-Headers": "ETag",
+            **(headers or {})
         },
-        "body": json.dumps(body, default=str)
-    }
\ No newline at end of file
+        # 304 vai sem corpo
+        "body": _body(body)
+    }
+
+
+def _body(body) -> str:
+    if body is None:
+        return ""
+    with metrics.span('serialization'):
+        return dumps(body)
\ No newline at end of file
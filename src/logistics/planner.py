@@ -0,0 +1,200 @@
+"""
+Planejamento das rotas de um dia de entregas.
+
+Heurística em três passos, toda em cima de arrays do numpy:
+
+1. Varredura (sweep): os pedidos são ordenados pelo ângulo em volta da
+   loja, começando no maior "buraco" angular (para não partir um bairro ao
+   meio), e vão enchendo os motoboys na ordem, até a capacidade de cada um.
+2. Ordem de visita: vizinho mais próximo sobre a matriz de distâncias da
+   rota (calculada de uma vez por broadcasting), melhorada por 2-opt com
+   todos os pares de arestas avaliados numa operação vetorizada.
+3. Frete: o custo de cada rota (base + km) é rateado por distância x peso
+   (quem está mais longe e leva mais paga mais), com os centavos fechando
+   exatamente no total.
+
+Distâncias em km numa projeção plana local (equiretangular): erro
+desprezível na escala de uma cidade, multiplicado por ROAD_FACTOR para
+aproximar o trajeto pelas ruas.
+
+O numpy é importado aqui (e só aqui): a Lambda da API precisa dele no
+pacote (ex: a layer AWS SDK for pandas) apenas para POST /logistics/plan.
+"""
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+
+# Linha reta -> trajeto pelas ruas (média urbana)
+ROAD_FACTOR = 1.3
+
+# Passadas de 2-opt por rota (cada passada aplica a melhor troca)
+TWO_OPT_MAX_PASSES = 50
+
+_CENT = Decimal('0.01')
+
+
+def project(lat, lng, origin_lat: float, origin_lng: float):
+    """Coordenadas -> (x, y) em km, com a loja na origem."""
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    x = (lng - origin_lng) * KM_PER_DEGREE_LNG * np.cos(np.radians(origin_lat))
+    y = (lat - origin_lat) * KM_PER_DEGREE_LAT
+    return x, y
+
+
+def sweep(x, y, pesos, capacidades: list):
+    """
+    Agrupa os pedidos pela varredura angular.
+    Retorna ([índices de cada rota, na ordem das capacidades], índices que sobraram).
+    """
+    n = len(pesos)
+    if n == 0:
+        return [[] for _ in capacidades], []
+
+    angles = np.arctan2(y, x)
+    order = np.argsort(angles, kind='stable')
+    if n > 1:
+        # Começa depois do maior intervalo vazio entre dois pedidos vizinhos
+        sorted_angles = angles[order]
+        gaps = np.diff(np.concatenate([sorted_angles, sorted_angles[:1] + 2 * np.pi]))
+        order = np.roll(order, -((int(np.argmax(gaps)) + 1) % n))
+
+    routes = [[] for _ in capacidades]
+    leftover = []
+    route, load = 0, 0
+    for index in order.tolist():
+        peso = pesos[index]
+        # Fecha a rota atual quando o pedido não cabe mais nela (se ela está
+        # vazia, é o pedido que não cabe em motoboy nenhum desse tamanho)
+        while route < len(capacidades) and load and load + peso > capacidades[route]:
+            route, load = route + 1, 0
+        if route == len(capacidades) or peso > capacidades[route]:
+            leftover.append(index)
+            continue
+        routes[route].append(index)
+        load += peso
+    return routes, leftover
+
+
+def distance_matrix(x, y):
+    """Matriz de distâncias (km pelas ruas) entre todos os pontos, numa operação."""
+    dx = x[:, None] - x[None, :]
+    dy = y[:, None] - y[None, :]
+    return np.hypot(dx, dy) * ROAD_FACTOR
+
+
+def order_stops(x, y, members: list, retorno: bool = True):
+    """
+    Ordem de visita dos pedidos de uma rota, saindo da loja (0, 0).
+    Retorna (membros na ordem de visita, distância total em km).
+    """
+    if not members:
+        return [], 0.0
+
+    px = np.concatenate([[0.0], x[members]])
+    py = np.concatenate([[0.0], y[members]])
+    dist = distance_matrix(px, py)
+    size = len(px)
+
+    # Vizinho mais próximo a partir da loja
+    tour = [0]
+    visited = np.zeros(size, dtype=bool)
+    visited[0] = True
+    for _ in range(size - 1):
+        row = np.where(visited, np.inf, dist[tour[-1]])
+        nxt = int(np.argmin(row))
+        tour.append(nxt)
+        visited[nxt] = True
+
+    # Percurso fechado (volta à loja) ou aberto, para o 2-opt e o total
+    tour = np.array(tour + [0] if retorno else tour)
+    tour = _two_opt(tour, dist, fixed_end=retorno)
+
+    total = float(dist[tour[:-1], tour[1:]].sum())
+    stops = [members[i - 1] for i in tour.tolist() if i != 0]
+    return stops, total
+
+
+def _two_opt(tour, dist, fixed_end: bool):
+    """
+    2-opt vetorizado: para cada par de arestas (a-b, c-d) calcula de uma vez
+    o ganho de trocar por (a-c, b-d) e aplica a melhor troca, até não haver ganho.
+    """
+    n = len(tour)
+    last = n - 1 if fixed_end else n
+    if last < 3:
+        return tour
+
+    for _ in range(TWO_OPT_MAX_PASSES):
+        i = np.arange(1, last - 1)[:, None]
+        j = np.arange(2, last)[None, :]
+        valid = j > i
+        a, b = tour[i - 1], tour[i]
+        c = tour[j]
+        d = tour[np.minimum(j + 1, n - 1)]
+        # Percurso aberto: a última aresta não existe (sem volta à loja)
+        tail = np.where(j + 1 < n, dist[c, d], 0.0)
+        new_tail = np.where(j + 1 < n, dist[b, d], 0.0)
+        delta = dist[a, c] + new_tail - dist[a, b] - tail
+        delta = np.where(valid, delta, 0.0)
+
+        best = np.unravel_index(int(np.argmin(delta)), delta.shape)
+        if delta[best] >= -1e-9:
+            break
+        start, end = int(i[best[0], 0]), int(j[0, best[1]])
+        tour[start:end + 1] = tour[start:end + 1][::-1].copy()
+    return tour
+
+
+def split_freight(custo_total: Decimal, distancias, pesos) -> list:
+    """
+    Rateio do custo da rota por distância x peso, em centavos exatos:
+    cada pedido recebe o piso da sua parte e os centavos que sobram vão para
+    as maiores frações (a soma fecha no total).
+    """
+    weights = np.asarray(distancias, dtype=float) * np.asarray(pesos, dtype=float)
+    if weights.sum() <= 0:
+        weights = np.asarray(pesos, dtype=float)
+    if weights.sum() <= 0:
+        weights = np.ones(len(weights))
+
+    cents = int((custo_total / _CENT).to_integral_value())
+    exact = weights / weights.sum() * cents
+    shares = np.floor(exact).astype(np.int64)
+    remainder = cents - int(shares.sum())
+    if remainder:
+        shares[np.argsort(-(exact - shares), kind='stable')[:remainder]] += 1
+    return [(Decimal(int(s)) * _CENT).quantize(_CENT, rounding=ROUND_DOWN) for s in shares]
+
+
+def plan(origin: tuple, lat, lng, pesos: list, motoboys: list, retorno: bool = True) -> dict:
+    """
+    Planeja as rotas do dia.
+
+    origin: (lat, lng) da loja; lat/lng/pesos: um por pedido;
+    motoboys: [{'capacidade': int, 'custo_base': Decimal, 'custo_km': Decimal}].
+    Retorna {'rotas': [{'motoboy': i, 'paradas': [...], 'distancia_km', 'custo_total',
+    'rateio': [...]}], 'sobras': [...]} com índices dos pedidos.
+    """
+    x, y = project(lat, lng, *origin)
+    radial = np.hypot(x, y) * ROAD_FACTOR
+    groups, leftover = sweep(x, y, pesos, [m['capacidade'] for m in motoboys])
+
+    rotas = []
+    for motoboy, members in enumerate(groups):
+        if not members:
+            continue
+        stops, distancia = order_stops(x, y, members, retorno)
+        km = Decimal(str(round(distancia, 2)))
+        custo = (motoboys[motoboy]['custo_base'] + motoboys[motoboy]['custo_km'] * km).quantize(_CENT)
+        rotas.append({
+            'motoboy': motoboy,
+            'paradas': stops,
+            'distancia_km': km,
+            'custo_total': custo,
+            'rateio': split_freight(custo, radial[stops], [pesos[i] for i in stops])
+        })
+    return {'rotas': rotas, 'sobras': leftover}
@@ -0,0 +1,271 @@
+"""
+Migração da tabela principal do layout v1 (só `id`) para o v2 (pk/sk + GSIs).
+
+A chave de uma tabela do DynamoDB não muda no lugar: os itens são copiados
+da tabela v1 para a v2. O Scan é paralelo (um segmento por thread) e o
+progresso de cada segmento (LastEvaluatedKey) vai para um arquivo de estado
+depois de cada página gravada; rodar de novo retoma de onde parou.
+
+A cópia nunca sobrescreve: cada item vai num PutItem condicional
+(attribute_not_exists(pk)). O que a API já gravou na v2 (pedidos novos ou
+alterados depois do deploy) é mais novo que o snapshot da v1 e fica como
+está; reprocessar uma página interrompida no meio também não duplica nada.
+
+Além da cópia:
+- os itens copiados levam `migrado`: o event source do stream descarta o
+  INSERT deles, para que vendas antigas não sejam somadas de novo nos
+  rollups nem repetidas no lake (alterações posteriores seguem normais);
+- o `historico` embutido nos pedidos vira registros na tabela de histórico
+  (chaves determinísticas) e sai do item;
+- todo cookie ganha a reserva do sabor (cookies antigos podem não ter).
+  Reservas são gravadas só se o sabor estiver livre: dois cookies com o
+  mesmo sabor são reportados como conflito, para resolver à mão.
+
+Uso (CLI, a partir de src/):
+    python -m migrations.key_schema_v2 --source CookiesTable-prod \
+        --target CookiesTable-v2-prod --history-table OrderHistoryTable-prod --segments 8
+
+Corte, nesta ordem:
+1. cdk deploy: a API passa a usar a tabela v2, ainda vazia. Faça fora do
+   horário de pico: até o passo 2 terminar, listagens e leituras só enxergam
+   o que já foi copiado.
+2. Rode a migração logo em seguida. Se for interrompida, rode o mesmo
+   comando de novo (retoma pelo arquivo de estado).
+3. Confira a saída: `concluido` verdadeiro, `conflitos` vazio e
+   itens + existentes = itens da v1 menos os ignorados. Conflitos de sabor
+   (saída 1) são resolvidos à mão e a migração roda de novo.
+4. Só então a tabela v1 sai do stack.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.codec import deserialize_item, serialize_item
+from core.database import client_config
+from core.keys import KEY_SCHEMA_VERSION, with_key
+from repositories.base_repository import BATCH_MAX_ATTEMPTS, BATCH_WRITE_LIMIT
+from repositories.catalog_repository import flavor_key
+from repositories.history_repository import history_key, legacy_entry
+from storage.dynamodb import is_retryable
+
+logger = logging.getLogger()
+
+DEFAULT_SEGMENTS = 8
+DEFAULT_PAGE_SIZE = 500
+
+# Marca dos itens copiados (o filtro do stream descarta o INSERT deles)
+MIGRATED_ATTRIBUTE = 'migrado'
+
+_COUNTERS = ('itens', 'existentes', 'historico', 'reservas', 'ignorados')
+
+
+def migrate_item(item: dict):
+    """
+    Item v1 -> (item v2 ou None, registros de histórico, reserva de sabor ou None).
+    Itens sem `id`/`tipo_item` não têm lugar no layout novo e são ignorados.
+    """
+    if not item.get('id') or not item.get('tipo_item'):
+        return None, [], None
+
+    item = {**item, MIGRATED_ATTRIBUTE: True}
+    historico = item.pop('historico', None) or []
+
+    records = []
+    for index, entry in enumerate(historico):
+        record = legacy_entry(entry, item.get('criado_em', ''))
+        record.update(pedido_id=item['id'], chave=history_key(record['data_alteracao'], f"v1-{index:04d}"))
+        records.append(record)
+
+    reservation = None
+    if item['tipo_item'] == 'COOKIE' and item.get('sabor'):
+        reservation = with_key({
+            'id': flavor_key(item['sabor']),
+            'tipo_item': 'SABOR_RESERVA',
+            'cookie_id': item['id'],
+            'sabor': item['sabor']
+        })
+
+    return with_key(item), records, reservation
+
+
+class KeySchemaMigration:
+    def __init__(self, client, source: str, target: str, history_table: str = None,
+                 state_path: str = None, segments: int = DEFAULT_SEGMENTS, page_size: int = DEFAULT_PAGE_SIZE):
+        self.client = client
+        self.source = source
+        self.target = target
+        self.history_table = history_table
+        self.segments = segments
+        self.page_size = page_size
+        self.state_path = state_path or f".migracao-{source}-v{KEY_SCHEMA_VERSION}.json"
+        self.state = self._load_state()
+        for segment in range(segments):
+            self.state['segmentos'].setdefault(str(segment), {})
+        self._lock = threading.Lock()
+
+    def run(self) -> dict:
+        """Migra todos os segmentos pendentes em paralelo; retorna os totais."""
+        pending = [segment for segment in range(self.segments) if not self._segment(segment).get('concluido')]
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                list(executor.map(self._migrate_segment, pending))
+
+        totals = {**dict.fromkeys(_COUNTERS, 0), 'conflitos': []}
+        for segment in range(self.segments):
+            progress = self._segment(segment)
+            for name in _COUNTERS:
+                totals[name] += progress.get(name, 0)
+            totals['conflitos'] += progress.get('conflitos', [])
+        totals['concluido'] = all(self._segment(s).get('concluido') for s in range(self.segments))
+        return totals
+
+    def _migrate_segment(self, segment: int):
+        progress = self._segment(segment)
+        request = {'TableName': self.source, 'Segment': segment, 'TotalSegments': self.segments,
+                   'Limit': self.page_size}
+        if progress.get('chave'):
+            request['ExclusiveStartKey'] = progress['chave']
+
+        while True:
+            response = self.client.scan(**request)
+            counts = self._migrate_page([deserialize_item(item) for item in response.get('Items', [])])
+
+            last_key = response.get('LastEvaluatedKey')
+            with self._lock:
+                for name in _COUNTERS:
+                    progress[name] = progress.get(name, 0) + counts[name]
+                progress['conflitos'] = progress.get('conflitos', []) + counts['conflitos']
+                # A posição só avança depois que a página inteira foi gravada
+                progress['chave'] = last_key
+                progress['concluido'] = not last_key
+                self._save_state()
+            if not last_key:
+                logger.info(f"Segmento {segment} concluído: {progress.get('itens', 0)} itens.")
+                return
+            request['ExclusiveStartKey'] = last_key
+
+    def _migrate_page(self, items: list) -> dict:
+        migrated, records, reservations = [], [], []
+        ignored = 0
+        for item in items:
+            new_item, item_records, reservation = migrate_item(item)
+            if new_item is None:
+                ignored += 1
+                continue
+            records.extend(item_records)
+            if reservation:
+                reservations.append(reservation)
+            # Reservas antigas passam pela mesma escrita condicional do backfill
+            if new_item['tipo_item'] == 'SABOR_RESERVA':
+                reservations.append(new_item)
+            else:
+                migrated.append(new_item)
+
+        written = sum(self._put_if_absent(item) for item in migrated)
+        if records:
+            if not self.history_table:
+                raise RuntimeError("Há pedidos com `historico` embutido: informe a tabela de histórico.")
+            self._batch_write(self.history_table, records)
+
+        conflicts = [{'cookie_id': r['cookie_id'], 'sabor': r['sabor']}
+                     for r in reservations if not self._reserve_flavor(r)]
+
+        return {'itens': written, 'existentes': len(migrated) - written, 'historico': len(records),
+                'reservas': len(reservations) - len(conflicts), 'ignorados': ignored, 'conflitos': conflicts}
+
+    def _put_if_absent(self, item: dict) -> bool:
+        """
+        Grava o item só se a chave ainda não existir na v2. Retorna False se a
+        API já o gravou (o dela é mais novo que o snapshot da v1).
+        """
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            try:
+                self.client.put_item(TableName=self.target, Item=serialize_item(item),
+                                     ConditionExpression="attribute_not_exists(pk)")
+                return True
+            except self.client.exceptions.ConditionalCheckFailedException:
+                return False
+            except self.client.exceptions.ClientError as e:
+                if not is_retryable(e):
+                    raise
+                time.sleep(0.05 * (2 ** attempt))
+        # Estado não avança: a próxima execução refaz esta página
+        raise RuntimeError(f"DynamoDB recusou (throttling) a gravação de {item['pk']} em {self.target}.")
+
+    def _batch_write(self, table: str, items: list):
+        """Registros de histórico: chaves só da migração, o BatchWriteItem não sobrescreve nada da API."""
+        for start in range(0, len(items), BATCH_WRITE_LIMIT):
+            request = {table: [{'PutRequest': {'Item': serialize_item(item)}}
+                               for item in items[start:start + BATCH_WRITE_LIMIT]]}
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                request = self.client.batch_write_item(RequestItems=request).get('UnprocessedItems') or {}
+                if not request:
+                    break
+                time.sleep(0.05 * (2 ** attempt))
+            else:
+                # Estado não avança: a próxima execução refaz esta página
+                raise RuntimeError(f"DynamoDB não processou todos os itens do lote em {table}.")
+
+    def _reserve_flavor(self, reservation: dict) -> bool:
+        """Grava a reserva se o sabor estiver livre (ou já for deste cookie)."""
+        try:
+            self.client.put_item(
+                TableName=self.target,
+                Item=serialize_item(reservation),
+                ConditionExpression="attribute_not_exists(pk) OR cookie_id = :cid",
+                ExpressionAttributeValues={':cid': {'S': reservation['cookie_id']}}
+            )
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def _segment(self, segment: int) -> dict:
+        return self.state['segmentos'][str(segment)]
+
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get('segmentos_total') != self.segments:
+                raise ValueError(
+                    f"O estado em {self.state_path} foi criado com {state.get('segmentos_total')} segmentos."
+                )
+            return state
+        return {'origem': self.source, 'destino': self.target, 'segmentos_total': self.segments, 'segmentos': {}}
+
+    def _save_state(self):
+        """Chamado com o lock. Troca atômica: uma interrupção nunca deixa o arquivo truncado."""
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migra a tabela principal do layout v1 (id) para o v2 (pk/sk).")
+    parser.add_argument('--source', required=True, help="tabela v1 (chave: id)")
+    parser.add_argument('--target', required=True, help="tabela v2 (chave: pk/sk)")
+    parser.add_argument('--history-table', help="tabela de histórico, para o `historico` embutido nos pedidos")
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS, help="segmentos do Scan (= threads)")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--state', help="arquivo de estado (padrão: .migracao-<source>-v2.json)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    import boto3
+    client = boto3.client('dynamodb', config=client_config())
+
+    totals = KeySchemaMigration(client, args.source, args.target, history_table=args.history_table,
+                                state_path=args.state, segments=args.segments, page_size=args.page_size).run()
+    print(json.dumps(totals, indent=2, ensure_ascii=False))
+    # Conflitos de sabor precisam de decisão manual antes do corte
+    return 1 if totals['conflitos'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
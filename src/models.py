@@ -1,10 +1,31 @@
-from pydantic import BaseModel, Field
+import re
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 
+# AAAA-MM-DD, com hora opcional: os 7 primeiros caracteres são o mês da
+# partição do DeliveryIndex (core.keys.delivery_month)
+_ISO_DAY = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def check_data_entrega(value: str) -> str:
+    """data_entrega ISO (data ou data e hora); qualquer outro formato é ValueError."""
+    if not isinstance(value, str) or not _ISO_DAY.match(value):
+        raise ValueError("data_entrega deve estar no formato ISO (AAAA-MM-DD).")
+    try:
+        if len(value) == 10:
+            date.fromisoformat(value)
+        else:
+            datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("data_entrega deve estar no formato ISO (AAAA-MM-DD).")
+    return value
+
+
 class StatusPedido(str, Enum):
     RECEBIDO = "RECEBIDO"
     EM_PREPARO = "EM_PREPARO"
@@ -33,6 +54,9 @@ class Ocorrencia(BaseModel):
 
 
 class PedidoModel(BaseModel):
+    # Status gravado como texto puro no model_dump (item direto pro DynamoDB)
+    model_config = ConfigDict(use_enum_values=True, validate_default=True)
+
     id: Optional[str] = None
     tipo_item: str = "PEDIDO"
     cliente_nome: str
@@ -51,4 +75,12 @@ class PedidoModel(BaseModel):
 
     # MUDANÇA: Apenas a data combinada, sem minutos calculados
     data_entrega: str  # Obrigatório (ISO Format)
-    data_conclusao: Optional[str] = None
\ No newline at end of file
+    data_conclusao: Optional[str] = None
+
+    # Incrementada a cada alteração (ETag de GET /orders)
+    versao: int = 1
+
+    @field_validator('data_entrega')
+    @classmethod
+    def _iso_data_entrega(cls, value: str) -> str:
+        return check_data_entrega(value)
@@ -1,6 +1,81 @@
-from core.database import db_instance
+from core.exceptions import TransactionCanceledException
+from storage import get_storage
+# Limites do DynamoDB por chamada (a migração e o OrderRepository importam daqui)
+from storage.dynamodb import BATCH_GET_LIMIT, BATCH_MAX_ATTEMPTS, BATCH_WRITE_LIMIT, TRANSACTION_LIMIT
+
 
 class DynamoDBRepository:
+    """
+    Base dos repositórios: helpers no formato do boto3 sobre o motor de
+    armazenamento (ver o pacote storage), DynamoDB ou SQLite local.
+    """
+
     def __init__(self):
-        # Usa a instância singleton já inicializada
-        self.table = db_instance.table
\ No newline at end of file
+        # Singleton criado na primeira instância de repositório
+        self.storage = get_storage()
+        self.table_name = self.storage.table_name
+
+    # Os helpers aceitam os mesmos parâmetros do boto3 (Key=, Item=, ...)
+    # e recebem e devolvem dicts Python comuns (Decimal, list, dict)
+
+    def _get_item(self, **kwargs):
+        """GetItem -> item (dict Python) ou None."""
+        return self.storage.get_item(self.table_name, **kwargs)
+
+    def _put_item(self, **kwargs):
+        self.storage.put_item(self.table_name, **kwargs)
+
+    def _update_item(self, **kwargs) -> dict:
+        """UpdateItem -> Attributes pedidos em ReturnValues (ou {})."""
+        return self.storage.update_item(self.table_name, **kwargs)
+
+    def _query_all(self, **kwargs):
+        """
+        Executa um Query seguindo o LastEvaluatedKey até a última página.
+        Sem isso o DynamoDB corta silenciosamente o resultado em 1 MB.
+        """
+        yield from self.storage.query(self.table_name, **kwargs)
+
+    def _query_page(self, **kwargs):
+        """
+        Uma única página de Query: (itens, LastEvaluatedKey ou None).
+        Para paginação controlada pelo cliente (cursor), em vez do _query_all.
+        """
+        return self.storage.query_page(self.table_name, **kwargs)
+
+    def _scan_all(self, **kwargs):
+        """Scan paginado, como o _query_all."""
+        yield from self.storage.scan(self.table_name, **kwargs)
+
+    def _batch_get(self, keys: list) -> list:
+        """
+        Busca várias chaves com BatchGetItem (lotes de 100), reenviando as
+        UnprocessedKeys com backoff exponencial quando há throttling.
+        """
+        return self.storage.batch_get(self.table_name, keys)
+
+    def _batch_write(self, items: list, max_workers: int = 1) -> list:
+        """
+        Grava itens com BatchWriteItem (lotes de 25, até `max_workers` em
+        paralelo), reenviando UnprocessedItems com backoff. Não é transacional:
+        devolve os itens que não foram gravados para o chamador reportar.
+        """
+        return self.storage.batch_write(self.table_name, items, max_workers=max_workers)
+
+    def _transact_write(self, actions: list, token: str = None):
+        """
+        Executa até 100 ações (Put/Update/Delete/ConditionCheck) num único
+        TransactWriteItems: ou todas são aplicadas, ou nenhuma.
+        Em caso de condição violada lança TransactionCanceledException
+        com os códigos de cancelamento na mesma ordem das ações.
+        """
+        transact_items = []
+        for action in actions:
+            (operation, params), = action.items()
+            transact_items.append({operation: {'TableName': self.table_name, **params}})
+        self.storage.transact_write(transact_items, token)
+
+    @staticmethod
+    def _cancellation_codes(error: TransactionCanceledException) -> list:
+        """Códigos de cancelamento (um por ação) de uma TransactionCanceledException."""
+        return error.codes
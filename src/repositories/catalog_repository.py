@@ -1,34 +1,141 @@
 from datetime import datetime
 
-from boto3.dynamodb.conditions import Attr
 from .base_repository import DynamoDBRepository
+from core.exceptions import BusinessRuleException, TransactionCanceledException
+from core.keys import FLAVOR_INDEX, item_key, with_key
+
+# Item "contador" do catálogo: toda escrita no catálogo incrementa a versão,
+# e cada container compara com a sua para saber se o cache ficou velho.
+CATALOG_VERSION_ID = 'CATALOGO#VERSAO'
+
+
+def flavor_key(sabor: str) -> str:
+    """
+    Chave da reserva de sabor: "  red   VELVET " -> "SABOR#red velvet".
+    Um item por sabor garante unicidade com uma única escrita condicional.
+    """
+    return f"SABOR#{' '.join(sabor.split()).casefold()}"
+
 
 class CatalogRepository(DynamoDBRepository):
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache
+
     def get_by_id(self, cookie_id: str):
-        resp = self.table.get_item(Key={'id': cookie_id})
-        return resp.get('Item')
+        cache_key = f"cookie:{cookie_id}"
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        item = self._get_item(Key=item_key('COOKIE', cookie_id))
+        if item and self.cache is not None:
+            self.cache.set(cache_key, item)
+        return dict(item) if item else item
+
+    def get_many(self, cookie_ids: list) -> dict:
+        """
+        Resolve vários cookies de uma vez: o que estiver no cache sai do cache,
+        o resto vem num único BatchGetItem. Retorna {id: item} (ids
+        inexistentes simplesmente não aparecem).
+        """
+        found = {}
+        missing = []
+        for cookie_id in dict.fromkeys(cookie_ids):
+            cached = self._cache_get(f"cookie:{cookie_id}")
+            if cached is not None:
+                found[cookie_id] = dict(cached)
+            else:
+                missing.append(cookie_id)
+
+        if missing:
+            for item in self._batch_get([item_key('COOKIE', cookie_id) for cookie_id in missing]):
+                if item.get('tipo_item') != 'COOKIE':
+                    continue
+                if self.cache is not None:
+                    self.cache.set(f"cookie:{item['id']}", item)
+                found[item['id']] = dict(item)
+
+        return found
 
     def save(self, item: dict):
-        self.table.put_item(Item=item)
+        self._put_item(Item=with_key(item))
 
     def list_active(self):
-        return self.table.scan(
-            FilterExpression=Attr('tipo_item').eq('COOKIE') & Attr('status').eq('ATIVO')
-        ).get('Items', [])
+        cached = self._cache_get('list_active')
+        if cached is not None:
+            return [dict(i) for i in cached]
+
+        # Query no FlavorIndex: só cookies, já em ordem de sabor
+        items = list(self._query_all(
+            IndexName=FLAVOR_INDEX,
+            KeyConditionExpression="tipo_item = :tipo",
+            FilterExpression="#st = :st",
+            ExpressionAttributeNames={'#st': 'status'},
+            ExpressionAttributeValues={':tipo': 'COOKIE', ':st': 'ATIVO'}
+        ))
+        if self.cache is not None:
+            self.cache.set('list_active', items)
+        return [dict(i) for i in items]
 
-    def find_by_flavor(self, sabor: str):
+    def get_version(self) -> int:
+        item = self._get_item(
+            Key=item_key('CATALOGO_VERSAO', CATALOG_VERSION_ID),
+            ProjectionExpression='versao'
+        )
+        return int((item or {}).get('versao', 0))
+
+    def current_version(self) -> int:
+        """Versão do catálogo, conferida no máximo uma vez por invocação quando há cache."""
+        if self.cache is None:
+            return self.get_version()
+        self.cache.sync_version(self.get_version)
+        return self.cache.version
+
+    def bump_version(self) -> int:
         """
-        Busca um cookie pelo nome exato (case sensitive no banco,
-        mas vamos tratar no service).
+        Publica uma nova versão do catálogo (ADD atômico). Os outros containers
+        percebem a mudança na próxima invocação e descartam o cache.
         """
-        response = self.table.scan(
-            FilterExpression=Attr('tipo_item').eq('COOKIE') & Attr('sabor').eq(sabor)
+        attributes = self._update_item(
+            Key=item_key('CATALOGO_VERSAO', CATALOG_VERSION_ID),
+            UpdateExpression="SET id = :id, tipo_item = :t ADD versao :one",
+            ExpressionAttributeValues={':id': CATALOG_VERSION_ID, ':t': 'CATALOGO_VERSAO', ':one': 1},
+            ReturnValues='UPDATED_NEW'
         )
-        return response.get('Items', [])
+        version = int(attributes['versao'])
+
+        if self.cache is not None:
+            self.cache.clear()
+            self.cache.version = version
+        return version
+
+    def _cache_get(self, key):
+        if self.cache is None:
+            return None
+        self.cache.sync_version(self.get_version)
+        return self.cache.get(key)
+
+    def create(self, item: dict):
+        """
+        Grava o cookie junto com a reserva do sabor numa transação.
+        Se o sabor já estiver reservado, nada é gravado.
+        """
+        try:
+            self._transact_write([
+                self._reserve_flavor_action(item['sabor'], item['id']),
+                {'Put': {'Item': with_key(item)}}
+            ])
+        except TransactionCanceledException as e:
+            if self._cancellation_codes(e)[0] == 'ConditionalCheckFailed':
+                raise BusinessRuleException(f"O sabor '{item['sabor']}' já está cadastrado.")
+            raise
 
-    def update(self, cookie_id: str, update_dict: dict):
+    def update(self, cookie_id: str, update_dict: dict, sabor_atual: str = None):
         """
         Monta uma query de Update dinâmica baseada nos campos enviados.
+        Se o sabor mudar, a reserva antiga é liberada e a nova é tomada na
+        mesma transação do update.
         """
         update_expression = "SET "
         expression_values = {}
@@ -48,9 +155,42 @@ class CatalogRepository(DynamoDBRepository):
         expression_values[':updated_at'] = datetime.now().isoformat()
         expression_names['#updated_at'] = 'atualizado_em'
 
-        self.table.update_item(
-            Key={'id': cookie_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_names,
-            ExpressionAttributeValues=expression_values
-        )
\ No newline at end of file
+        update_params = {
+            'Key': item_key('COOKIE', cookie_id),
+            'UpdateExpression': update_expression,
+            'ExpressionAttributeNames': expression_names,
+            'ExpressionAttributeValues': expression_values
+        }
+
+        novo_sabor = update_dict.get('sabor')
+        if not novo_sabor or (sabor_atual and flavor_key(novo_sabor) == flavor_key(sabor_atual)):
+            self._update_item(**update_params)
+            return
+
+        actions = [self._reserve_flavor_action(novo_sabor, cookie_id)]
+        if sabor_atual:
+            actions.append({'Delete': {
+                'Key': item_key('SABOR_RESERVA', flavor_key(sabor_atual)),
+                'ConditionExpression': "attribute_not_exists(id) OR cookie_id = :cid",
+                'ExpressionAttributeValues': {':cid': cookie_id}
+            }})
+        actions.append({'Update': update_params})
+
+        try:
+            self._transact_write(actions)
+        except TransactionCanceledException as e:
+            if self._cancellation_codes(e)[0] == 'ConditionalCheckFailed':
+                raise BusinessRuleException(f"O sabor '{novo_sabor}' já está cadastrado.")
+            raise
+
+    @staticmethod
+    def _reserve_flavor_action(sabor: str, cookie_id: str) -> dict:
+        return {'Put': {
+            'Item': with_key({
+                'id': flavor_key(sabor),
+                'tipo_item': 'SABOR_RESERVA',
+                'cookie_id': cookie_id,
+                'sabor': sabor
+            }),
+            'ConditionExpression': "attribute_not_exists(id)"
+        }}
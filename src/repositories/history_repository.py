@@ -0,0 +1,50 @@
+import os
+import uuid
+
+from .base_repository import DynamoDBRepository
+
+
+def history_key(data: str, suffix: str = None) -> str:
+    """
+    Chave de ordenação do registro: "2025-01-01T10:00:00#a1b2c3d4".
+    A data ISO ordena cronologicamente; o sufixo evita colisão entre
+    duas transições no mesmo instante (a migração passa um sufixo fixo,
+    para que reexecutá-la não duplique registros).
+    """
+    return f"{data}#{suffix or uuid.uuid4().hex[:8]}"
+
+
+def legacy_entry(entry: dict, criado_em: str = '') -> dict:
+    """
+    Entrada do `historico` embutido no formato dos registros: extravios
+    antigos gravavam 'data' no lugar de 'data_alteracao'.
+    """
+    data = entry.get('data_alteracao') or entry.get('data') or criado_em
+    return {**{k: v for k, v in entry.items() if k != 'data'}, 'data_alteracao': data}
+
+
+class OrderHistoryRepository(DynamoDBRepository):
+    """
+    Histórico de status dos pedidos, um item por transição (append-only).
+    PK: pedido_id, SK: chave (data#sufixo). O item do pedido não cresce.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.table_name = os.environ.get('HISTORY_TABLE_NAME')
+
+    def put_action(self, pedido_id: str, entry: dict) -> dict:
+        """Put do registro, para ir na mesma transação que altera o pedido."""
+        item = {**entry, 'pedido_id': pedido_id, 'chave': history_key(entry['data_alteracao'])}
+        return {'Put': {'TableName': self.table_name, 'Item': item}}
+
+    def list_page(self, pedido_id: str, limit: int, start_key: dict = None):
+        """Uma página do histórico, do mais antigo para o mais novo: (itens, chave ou None)."""
+        params = {
+            'KeyConditionExpression': "pedido_id = :p",
+            'ExpressionAttributeValues': {':p': pedido_id},
+            'Limit': limit
+        }
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+        return self._query_page(**params)
@@ -1,44 +1,365 @@
-from boto3.dynamodb.conditions import Attr  # <--- Adicionar este import
-from .base_repository import DynamoDBRepository
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .base_repository import DynamoDBRepository, TRANSACTION_LIMIT
+from .history_repository import OrderHistoryRepository, legacy_entry
 from decimal import Decimal
+from core.exceptions import (BusinessRuleException, InfrastructureException, ThrottlingException,
+                             TransactionCanceledException)
+from core.keys import DELIVERY_INDEX, STATUS_INDEX, delivery_month, item_key, key_id, with_key
+
+logger = logging.getLogger()
+
+# Status considerados "em aberto" (tudo menos CONCLUIDO e EXTRAVIADO)
+OPEN_STATUSES = ('RECEBIDO', 'EM_PREPARO', 'EM_ROTA')
+
+# Status a partir dos quais um pedido pode ser colocado numa rota
+ASSIGNABLE_STATUSES = ('RECEBIDO', 'EM_PREPARO')
+
+# Transações de rota (e lotes em massa) executadas em paralelo
+ROUTE_MAX_WORKERS = 8
+
+# Reenvios de um lote de transições canceladas por outros pedidos do lote
+STATUS_BATCH_ATTEMPTS = 3
+
+# Tentativas de desfazer um lote de rota já aplicado
+REVERT_MAX_ATTEMPTS = 3
 
 class OrderRepository(DynamoDBRepository):
+    def __init__(self):
+        super().__init__()
+        # Transições gravam um registro de histórico na mesma transação
+        self.history = OrderHistoryRepository()
+
     def save(self, order_dict: dict):
-        self.table.put_item(Item=order_dict)
+        self._put_item(Item=with_key(order_dict))
 
     def get_by_id(self, order_id: str):
-        return self.table.get_item(Key={'id': order_id}).get('Item')
+        return self._get_item(Key=item_key('PEDIDO', order_id))
+
+    def get_many(self, order_ids: list) -> dict:
+        """Vários pedidos num BatchGetItem: {id: item} (só itens PEDIDO)."""
+        items = self._batch_get([item_key('PEDIDO', order_id) for order_id in dict.fromkeys(order_ids)])
+        return {item['id']: item for item in items if item.get('tipo_item') == 'PEDIDO'}
+
+    def save_many(self, orders: list) -> set:
+        """
+        Grava vários pedidos novos com BatchWriteItem (lotes de 25 em paralelo).
+        Retorna os ids que não puderam ser gravados.
+        """
+        unprocessed = self._batch_write([with_key(order) for order in orders], max_workers=ROUTE_MAX_WORKERS)
+        return {item['id'] for item in unprocessed}
 
     def list_open_orders(self):
         """
         Retorna todos os pedidos que NÃO estão concluídos ou extraviados.
         """
-        # Scan filtrando tudo que ainda está "em aberto"
-        response = self.table.scan(
-            FilterExpression=Attr('status').ne('CONCLUIDO') & Attr('status').ne('EXTRAVIADO')
-        )
-        return response.get('Items', [])
-    # -------------------------------
-
-    def update_logistics(self, order_id: str, entrega_id: str, custo_rateado: Decimal):
-        self.table.update_item(
-            Key={'id': order_id},
-            UpdateExpression="SET entrega_id=:e, custo_entrega_rateado=:c, #st=:s",
+        # Um Query por status aberto no índice: o custo acompanha a quantidade
+        # de pedidos abertos, e não o tamanho da tabela.
+        items = []
+        for status in OPEN_STATUSES:
+            items.extend(self._query_all(
+                IndexName=STATUS_INDEX,
+                KeyConditionExpression="#st = :st",
+                ExpressionAttributeNames={'#st': 'status'},
+                ExpressionAttributeValues={':st': status}
+            ))
+        return items
+
+    def query_status_page(self, status: str, limit: int, start_key: dict = None, fields: list = None):
+        """
+        Uma página de pedidos de um status no StatusIndex (ordem de criação).
+        `fields` vira ProjectionExpression.
+        Retorna (itens, chave para continuar ou None).
+        """
+        params = {
+            'IndexName': STATUS_INDEX,
+            'KeyConditionExpression': "#st = :st",
+            'ExpressionAttributeNames': {'#st': 'status'},
+            'ExpressionAttributeValues': {':st': status},
+            'Limit': limit
+        }
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+
+        if fields:
+            names = {f"#p{i}": field for i, field in enumerate(fields)}
+            params['ProjectionExpression'] = ", ".join(names)
+            params['ExpressionAttributeNames'].update(names)
+
+        return self._query_page(**params)
+
+    def query_delivery_page(self, statuses: list, mes: str, entrega_de: str, entrega_ate: str, limit: int,
+                            start_key: dict = None, fields: list = None):
+        """
+        Uma página de pedidos de um mês de entrega (partição do DeliveryIndex),
+        em ordem de entrega. O intervalo de datas é condição de chave; só o
+        status é filtrado depois do Limit. Retorna (itens, chave para continuar ou None).
+        """
+        status_values = {f":s{i}": status for i, status in enumerate(statuses)}
+        params = {
+            'IndexName': DELIVERY_INDEX,
+            'KeyConditionExpression': "mes_entrega = :mes AND data_entrega BETWEEN :de AND :ate",
+            'FilterExpression': f"#st IN ({', '.join(status_values)})",
+            'ExpressionAttributeNames': {'#st': 'status'},
+            'ExpressionAttributeValues': {':mes': mes, ':de': entrega_de, ':ate': entrega_ate, **status_values},
+            'Limit': limit
+        }
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+
+        if fields:
+            names = {f"#p{i}": field for i, field in enumerate(fields)}
+            params['ProjectionExpression'] = ", ".join(names)
+            params['ExpressionAttributeNames'].update(names)
+
+        return self._query_page(**params)
+
+    def list_assignable_for_delivery(self, data_entrega: str) -> list:
+        """
+        Pedidos de um dia de entrega ainda sem rota (DeliveryIndex), só com o
+        que o planejamento usa: id, status e as quantidades dos itens.
+        """
+        return list(self._query_all(
+            IndexName=DELIVERY_INDEX,
+            # data_entrega pode trazer hora: '\uffff' fecha o dia inteiro
+            KeyConditionExpression="mes_entrega = :mes AND data_entrega BETWEEN :dia AND :fim",
+            FilterExpression="#st IN (:rec, :prep)",
+            ProjectionExpression="id, #st, itens",
             ExpressionAttributeNames={'#st': 'status'},
             ExpressionAttributeValues={
+                ':mes': delivery_month(data_entrega),
+                ':dia': data_entrega,
+                ':fim': f"{data_entrega}\uffff",
+                ':rec': ASSIGNABLE_STATUSES[0],
+                ':prep': ASSIGNABLE_STATUSES[1]
+            }
+        ))
+
+    def assign_route(self, entrega_dict: dict, pedidos_ids: list, custo_rateado, status_anteriores: dict = None):
+        """
+        Grava a ENTREGA e coloca os pedidos EM_ROTA em transações de até 100
+        ações (a entrega vai na primeira). Cada pedido leva o seu registro de
+        histórico na mesma transação, então um lote tem até 50 pedidos. Os
+        lotes rodam em paralelo e cada um é tudo-ou-nada; se algum falhar, os
+        que passaram são desfeitos (com o histórico da volta).
+        `custo_rateado` é o mesmo Decimal para todos ou {pedido_id: Decimal}.
+        `status_anteriores` ({pedido_id: status}) vem de quem já leu os pedidos;
+        sem ele, um BatchGetItem lê os status. A escrita exige o status lido.
+        """
+        if status_anteriores is None:
+            status_anteriores = {pid: order.get('status') for pid, order in self.get_many(pedidos_ids).items()}
+        invalid = [pid for pid in pedidos_ids if status_anteriores.get(pid) not in ASSIGNABLE_STATUSES]
+        if invalid:
+            raise BusinessRuleException(
+                f"Pedidos inexistentes ou fora de status despachável: {', '.join(invalid)}."
+            )
+
+        entrega_id = entrega_dict['id']
+        data_alteracao = datetime.now().isoformat()
+        chunk = [{'Put': {
+            'Item': with_key(entrega_dict),
+            'ConditionExpression': 'attribute_not_exists(pk)'
+        }}]
+        chunks = [chunk]
+        for pid in pedidos_ids:
+            custo = custo_rateado[pid] if isinstance(custo_rateado, dict) else custo_rateado
+            pair = [
+                self._assign_action(pid, entrega_id, custo, status_anteriores[pid]),
+                self.history.put_action(pid, {
+                    'status_anterior': status_anteriores[pid],
+                    'novo_status': 'EM_ROTA',
+                    'data_alteracao': data_alteracao,
+                    'entrega_id': entrega_id
+                })
+            ]
+            if len(chunk) + len(pair) > TRANSACTION_LIMIT:
+                chunk = []
+                chunks.append(chunk)
+            chunk.extend(pair)
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), ROUTE_MAX_WORKERS)) as executor:
+            results = list(executor.map(self._run_chunk, chunks))
+
+        if all(error is None for error in results):
+            return
+
+        # Desfaz os lotes que foram aplicados para não deixar a rota pela metade.
+        # Cada reversão é independente: uma que falhe não impede as outras.
+        rejected, not_reverted = [], []
+        for chunk, error in zip(chunks, results):
+            if error is None:
+                if not self._revert_chunk(chunk, entrega_id, status_anteriores):
+                    not_reverted.extend(key_id(action['Update']['Key']) for action in chunk if 'Update' in action)
+            elif isinstance(error, TransactionCanceledException):
+                codes = self._cancellation_codes(error)
+                rejected.extend(
+                    key_id(action['Update']['Key'])
+                    for action, code in zip(chunk, codes)
+                    if code == 'ConditionalCheckFailed' and 'Update' in action
+                )
+            else:
+                logger.error(f"Falha ao gravar um lote da rota {entrega_id}: {error}", exc_info=error)
+
+        if not_reverted:
+            # Estado inconsistente (pedidos EM_ROTA sem rota completa): precisa de correção manual
+            raise InfrastructureException(
+                f"Falha ao gravar a rota {entrega_id}; pedidos não revertidos: {', '.join(not_reverted)}."
+            )
+        if rejected:
+            raise BusinessRuleException(
+                f"Pedidos inexistentes ou fora de status despachável: {', '.join(rejected)}."
+            )
+        raise InfrastructureException(f"Falha ao gravar a rota {entrega_id}.")
+
+    def _run_chunk(self, chunk: list):
+        try:
+            self._transact_write(chunk)
+            return None
+        except Exception as e:
+            return e
+
+    def _revert_chunk(self, chunk: list, entrega_id: str, status_anteriores: dict) -> bool:
+        """
+        Reverte um lote aplicado, com até REVERT_MAX_ATTEMPTS tentativas.
+        Retorna False (e loga) se o lote continuar aplicado.
+        """
+        reverts = self._revert_actions(chunk, entrega_id, status_anteriores)
+        for attempt in range(REVERT_MAX_ATTEMPTS):
+            try:
+                self._transact_write(reverts)
+                return True
+            except Exception as e:
+                logger.error(f"Falha ao reverter lote da rota {entrega_id} (tentativa {attempt + 1}): {e}",
+                             exc_info=True)
+                # Condição violada (o pedido mudou no meio) não passa num reenvio
+                if isinstance(e, TransactionCanceledException) and \
+                        'TransactionConflict' not in self._cancellation_codes(e):
+                    return False
+                time.sleep(0.05 * (2 ** attempt))
+        return False
+
+    @staticmethod
+    def _assign_action(order_id: str, entrega_id: str, custo_rateado: Decimal, status_atual: str) -> dict:
+        return {'Update': {
+            'Key': item_key('PEDIDO', order_id),
+            # status_pre_rota guarda o status anterior para um eventual rollback
+            'UpdateExpression': "SET entrega_id=:e, custo_entrega_rateado=:c, status_pre_rota=#st, #st=:s ADD versao :one",
+            'ConditionExpression': "attribute_exists(pk) AND tipo_item = :tipo AND #st = :atual",
+            'ExpressionAttributeNames': {'#st': 'status'},
+            'ExpressionAttributeValues': {
                 ':e': entrega_id,
                 ':c': custo_rateado,
-                ':s': 'EM_ROTA'
+                ':s': 'EM_ROTA',
+                ':one': 1,
+                ':tipo': 'PEDIDO',
+                ':atual': status_atual
             }
-        )
+        }}
+
+    def _revert_actions(self, chunk: list, entrega_id: str, status_anteriores: dict) -> list:
+        """Volta de cada pedido do lote (com o registro de histórico) e, no primeiro, a remoção da ENTREGA."""
+        reverts = []
+        data_alteracao = datetime.now().isoformat()
+        for action in chunk:
+            if 'Put' in action:
+                if action['Put']['Item'].get('tipo_item') == 'ENTREGA':
+                    reverts.append({'Delete': {'Key': item_key('ENTREGA', entrega_id)}})
+                continue
+            pedido_id = key_id(action['Update']['Key'])
+            reverts.append({'Update': {
+                'Key': action['Update']['Key'],
+                'UpdateExpression': "SET #st = status_pre_rota REMOVE entrega_id, custo_entrega_rateado, status_pre_rota ADD versao :one",
+                'ConditionExpression': "entrega_id = :e",
+                'ExpressionAttributeNames': {'#st': 'status'},
+                'ExpressionAttributeValues': {':e': entrega_id, ':one': 1}
+            }})
+            reverts.append(self.history.put_action(pedido_id, {
+                'status_anterior': 'EM_ROTA',
+                'novo_status': status_anteriores[pedido_id],
+                'data_alteracao': data_alteracao,
+                'motivo': f"Rota {entrega_id} desfeita"
+            }))
+        return reverts
 
     def update_status(self, pedido_id: str, novo_status: str, historico_entry: dict, data_conclusao: str = None):
+        """Status + registro de histórico numa transação (o item do pedido não cresce)."""
+        self._transact_write([
+            {'Update': self._status_update(pedido_id, novo_status, data_conclusao)},
+            self.history.put_action(pedido_id, historico_entry)
+        ])
+
+    def update_status_many(self, changes: list) -> dict:
+        """
+        Aplica várias transições [(pedido_id, status_atual, novo_status, entry,
+        data_conclusao)] em transações paralelas de até 50 pedidos (cada um leva
+        o update e o registro de histórico). Cada update exige que o status
+        ainda seja o lido (sem corrida com outra tela).
+        Retorna {pedido_id: 'CONFLITO' | 'FALHA'} só para os que não passaram.
+        """
+        pairs = []
+        for pedido_id, status_atual, novo_status, entry, data_conclusao in changes:
+            params = self._status_update(pedido_id, novo_status, data_conclusao)
+            params['ConditionExpression'] = "#st = :atual"
+            params['ExpressionAttributeValues'][':atual'] = status_atual
+            pairs.append(({'Update': params}, self.history.put_action(pedido_id, entry)))
+
+        per_chunk = TRANSACTION_LIMIT // 2
+        chunks = [pairs[i:i + per_chunk] for i in range(0, len(pairs), per_chunk)]
+        if not chunks:
+            return {}
+
+        failed = {}
+        with ThreadPoolExecutor(max_workers=min(len(chunks), ROUTE_MAX_WORKERS)) as executor:
+            for chunk_failed in executor.map(self._run_status_chunk, chunks):
+                failed.update(chunk_failed)
+        return failed
+
+    def _run_status_chunk(self, pairs: list) -> dict:
+        """
+        Uma transação por lote de pares (update, histórico). Se for cancelada,
+        os pedidos com condição violada saem como CONFLITO e o resto do lote
+        é reenviado; com throttling o lote todo é reenviado e, esgotadas as
+        tentativas, sai como FALHA. Outros erros sobem para o chamador.
+        """
+        failed = {}
+        pending = pairs
+        for attempt in range(STATUS_BATCH_ATTEMPTS):
+            try:
+                self._transact_write([action for pair in pending for action in pair])
+                return failed
+            except TransactionCanceledException as e:
+                codes = self._cancellation_codes(e)
+                retry = []
+                for index, pair in enumerate(pending):
+                    # Código do update do par (o Put do histórico vem logo depois)
+                    code = codes[2 * index] if 2 * index < len(codes) else 'None'
+                    if code == 'ConditionalCheckFailed':
+                        failed[key_id(pair[0]['Update']['Key'])] = 'CONFLITO'
+                    else:
+                        retry.append(pair)
+                pending = retry
+                if not pending:
+                    return failed
+                if 'TransactionConflict' in codes:
+                    time.sleep(0.05 * (2 ** attempt))
+            except ThrottlingException as e:
+                logger.warning(f"Lote de {len(pending)} transições com throttling (tentativa {attempt + 1}): {e}")
+                time.sleep(0.05 * (2 ** attempt))
+
+        for pair in pending:
+            failed[key_id(pair[0]['Update']['Key'])] = 'FALHA'
+        return failed
+
+    @staticmethod
+    def _status_update(pedido_id: str, novo_status: str, data_conclusao: str = None) -> dict:
         # Prepara update expression
-        update_expr = "SET #st = :st, historico = list_append(if_not_exists(historico, :empty_list), :entry)"
+        update_expr = "SET #st = :st"
         attr_values = {
-            ':st': novo_status,
-            ':entry': [historico_entry],
-            ':empty_list': []
+            ':one': 1,
+            ':st': novo_status
         }
 
         # Se houver data de conclusão, adiciona ao update
@@ -46,27 +367,42 @@ class OrderRepository(DynamoDBRepository):
             update_expr += ", data_conclusao = :dc"
             attr_values[':dc'] = data_conclusao
 
-        self.table.update_item(
-            Key={'id': pedido_id},
-            UpdateExpression=update_expr,
-            ExpressionAttributeNames={'#st': 'status'},
-            ExpressionAttributeValues=attr_values
-        )
+        # Toda alteração do pedido incrementa a versão (base do ETag de GET /orders)
+        update_expr += " ADD versao :one"
+
+        return {
+            'Key': item_key('PEDIDO', pedido_id),
+            'UpdateExpression': update_expr,
+            'ExpressionAttributeNames': {'#st': 'status'},
+            'ExpressionAttributeValues': attr_values
+        }
+
+    def get_legacy_history(self, pedido_id: str):
+        """
+        Pedido com o `historico` embutido, de antes da tabela própria:
+        (existe?, lista antiga já no formato dos registros). Lê só esses dois atributos.
+        """
+        item = self._get_item(Key=item_key('PEDIDO', pedido_id), ProjectionExpression="id, tipo_item, historico")
+        if not item or item.get('tipo_item') != 'PEDIDO':
+            return False, []
+        return True, [legacy_entry(entry) for entry in item.get('historico', [])]
 
     def register_occurrence(self, pedido_id: str, ocorrencia_dict: dict):
-        self.table.update_item(
-            Key={'id': pedido_id},
-            UpdateExpression="SET #st = :st, ocorrencia = :oc, historico = list_append(if_not_exists(historico, :empty_list), :hist_entry)",
-            ExpressionAttributeNames={'#st': 'status'},
-            ExpressionAttributeValues={
-                ':st': 'EXTRAVIADO',
-                ':oc': ocorrencia_dict,
-                ':hist_entry': [{
-                    "status_anterior": "EM_ROTA",
-                    "novo_status": "EXTRAVIADO",
-                    "data": ocorrencia_dict['data'],
-                    "motivo": ocorrencia_dict['descricao']
-                }],
-                ':empty_list': []
-            }
-        )
\ No newline at end of file
+        self._transact_write([
+            {'Update': {
+                'Key': item_key('PEDIDO', pedido_id),
+                'UpdateExpression': "SET #st = :st, ocorrencia = :oc ADD versao :one",
+                'ExpressionAttributeNames': {'#st': 'status'},
+                'ExpressionAttributeValues': {
+                    ':st': 'EXTRAVIADO',
+                    ':one': 1,
+                    ':oc': ocorrencia_dict
+                }
+            }},
+            self.history.put_action(pedido_id, {
+                "status_anterior": "EM_ROTA",
+                "novo_status": "EXTRAVIADO",
+                "data_alteracao": ocorrencia_dict['data'],
+                "motivo": ocorrencia_dict['descricao']
+            })
+        ])
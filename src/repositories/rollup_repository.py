@@ -0,0 +1,23 @@
+import os
+
+from analytics.rollups import DAILY
+from .base_repository import DynamoDBRepository
+
+
+class RollupRepository(DynamoDBRepository):
+    """Leitura dos agregados diários mantidos pelo stream_handler."""
+
+    def __init__(self):
+        super().__init__()
+        self.table_name = os.environ.get('ROLLUP_TABLE_NAME')
+
+    def list_daily(self, inicio: str, fim: str, sabor: str = None) -> list:
+        # '\uffff' fecha o intervalo depois de qualquer sabor do último dia
+        params = {
+            'KeyConditionExpression': "metrica = :m AND chave BETWEEN :inicio AND :fim",
+            'ExpressionAttributeValues': {':m': DAILY, ':inicio': inicio, ':fim': f"{fim}#\uffff"}
+        }
+        if sabor:
+            params['FilterExpression'] = "sabor = :sabor"
+            params['ExpressionAttributeValues'][':sabor'] = sabor
+        return list(self._query_all(**params))
@@ -0,0 +1,75 @@
+import os
+from datetime import date
+from decimal import Decimal
+
+from analytics import query
+from analytics.lake import S3Source
+from analytics.rollups import COUNTERS
+from repositories.rollup_repository import RollupRepository
+from core.exceptions import BusinessRuleException
+
+# Dashboards pedem no máximo um ano
+MAX_RANGE_DAYS = 366
+
+# Consultas no lake leem objetos do S3: limitadas para caber no timeout da API
+LAKE_MAX_RANGE_DAYS = 31
+
+
+class AnalyticsService:
+    def __init__(self):
+        self.repo = RollupRepository()
+        self.lake = None
+
+    def daily_sales(self, inicio: str, fim: str, sabor: str = None) -> dict:
+        """
+        Receita, custos, lucro e prejuízos por dia x sabor, lidos dos
+        agregados pré-calculados (um Query, sem varrer o Data Lake).
+        """
+        self._parse_range(inicio, fim, MAX_RANGE_DAYS)
+
+        linhas = []
+        totais = dict.fromkeys(COUNTERS, Decimal('0'))
+        for item in self.repo.list_daily(inicio, fim, sabor):
+            linha = {'dia': item['dia'], 'sabor': item['sabor']}
+            for counter in COUNTERS:
+                valor = item.get(counter, Decimal('0'))
+                linha[counter] = int(valor) if counter == 'qtd' else float(valor)
+                totais[counter] += valor
+            linhas.append(linha)
+
+        return {
+            'inicio': inicio,
+            'fim': fim,
+            'dias': linhas,
+            'totais': {
+                counter: int(valor) if counter == 'qtd' else float(valor)
+                for counter, valor in totais.items()
+            }
+        }
+
+    def query_sales(self, inicio: str, fim: str, sabor: str = None, status: str = None,
+                    group_by: str = None) -> list:
+        """
+        Consulta agregada direto no Data Lake (ver analytics.query), com poda
+        por dia e filtros de sabor/status aplicados antes do parse.
+        """
+        data_inicio, data_fim = self._parse_range(inicio, fim, LAKE_MAX_RANGE_DAYS)
+        colunas = tuple(c.strip() for c in (group_by or '').split(',') if c.strip())
+
+        if self.lake is None:
+            self.lake = S3Source(os.environ.get('ANALYTICS_BUCKET_NAME'))
+        return query.run(self.lake, data_inicio, data_fim, sabor, status, colunas)
+
+    @staticmethod
+    def _parse_range(inicio: str, fim: str, max_days: int):
+        try:
+            data_inicio = date.fromisoformat(inicio)
+            data_fim = date.fromisoformat(fim)
+        except (TypeError, ValueError):
+            raise BusinessRuleException("Informe 'inicio' e 'fim' no formato AAAA-MM-DD.")
+
+        if data_fim < data_inicio:
+            raise BusinessRuleException("'fim' deve ser maior ou igual a 'inicio'.")
+        if (data_fim - data_inicio).days >= max_days:
+            raise BusinessRuleException(f"Intervalo máximo de {max_days} dias.")
+        return data_inicio, data_fim
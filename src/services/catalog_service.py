@@ -8,8 +8,8 @@ from core.exceptions import BusinessRuleException, EntityNotFoundException
 
 
 class CatalogService:
-    def __init__(self):
-        self.repo = CatalogRepository()
+    def __init__(self, cache=None):
+        self.repo = CatalogRepository(cache=cache)
 
     def create_product(self, payload: dict) -> dict:
         """
@@ -24,13 +24,7 @@ class CatalogService:
         # "  red velvet  " -> "Red Velvet"
         sabor_formatado = raw_sabor.strip().title()
 
-        # 3. Validação de Unicidade (Regra Sênior)
-        # Verifica se já existe ANTES de criar
-        existentes = self.repo.find_by_flavor(sabor_formatado)
-        if existentes:
-            raise BusinessRuleException(f"O sabor '{sabor_formatado}' já está cadastrado.")
-
-        # 4. Conversão de Tipos
+        # 3. Conversão de Tipos
         try:
             preco = Decimal(str(payload['preco_venda']))
             custo = Decimal(str(payload.get('custo_producao', '0.00')))
@@ -40,7 +34,7 @@ class CatalogService:
         except:
             raise BusinessRuleException("Preço ou custo inválido (devem ser números positivos).")
 
-        # 5. Criação do Objeto
+        # 4. Criação do Objeto
         cookie_id = str(uuid.uuid4())
         item = {
             'id': cookie_id,
@@ -53,7 +47,11 @@ class CatalogService:
             'criado_em': datetime.now().isoformat()
         }
 
-        self.repo.save(item)
+        # 5. Persistência + Unicidade (Regra Sênior)
+        # A reserva do sabor é gravada na mesma transação do cookie:
+        # dois cadastros simultâneos do mesmo sabor nunca passam juntos.
+        self.repo.create(item)
+        self.repo.bump_version()
 
         # Conversão simples para retorno JSON
         item_retorno = item.copy()
@@ -62,6 +60,10 @@ class CatalogService:
 
         return item_retorno
 
+    def version(self) -> int:
+        """Versão atual do catálogo (base do ETag de GET /cookies)."""
+        return self.repo.current_version()
+
     def list_all(self) -> list:
         # A listagem também deve converter Decimals para serializar no JSON
         items = self.repo.list_active()
@@ -88,7 +90,6 @@ class CatalogService:
         if 'sabor' in payload:
             # Se mudar o nome, formatamos igual na criação
             campos_atualizar['sabor'] = payload['sabor'].strip().title()
-            # Nota: Poderíamos validar duplicidade aqui também, mas vou simplificar.
 
         if 'status' in payload:
             campos_atualizar['status'] = payload['status']  # ATIVO / INATIVO
@@ -97,7 +98,9 @@ class CatalogService:
             raise BusinessRuleException("Nenhum campo válido para atualização.")
 
         # 3. Persistir
-        self.repo.update(cookie_id, campos_atualizar)
+        # Renomear passa pela mesma reserva de sabor da criação
+        self.repo.update(cookie_id, campos_atualizar, sabor_atual=current.get('sabor'))
+        self.repo.bump_version()
 
         # Retorna o objeto atualizado (Merge manual para retorno rápido)
         current.update(campos_atualizar)
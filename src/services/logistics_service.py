@@ -1,6 +1,13 @@
+import logging
 import uuid
-from decimal import Decimal
-from repositories.order_repository import OrderRepository
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from core.exceptions import BusinessRuleException, ServiceUnavailableException
+from repositories.order_repository import OrderRepository, ROUTE_MAX_WORKERS
+
+logger = logging.getLogger()
 
 
 class LogisticsService:
@@ -12,23 +19,169 @@ class LogisticsService:
         if not pedidos_ids:
             raise ValueError("Rota vazia")
 
+        # Um mesmo pedido não pode aparecer duas vezes na transação
+        pedidos_ids = list(dict.fromkeys(pedidos_ids))
+
         custo_total_dec = Decimal(str(custo_total))
 
         # REGRA DE NEGÓCIO: Rateio Simples
         rateio = (custo_total_dec / len(pedidos_ids)).quantize(Decimal("0.01"))
         entrega_id = f"ent_{str(uuid.uuid4())[:8]}"
 
-        # 1. Persistir a Entrega (Simplificado: usando o mesmo repo por enquanto)
+        # Entrega + pedidos gravados de forma atômica (ver OrderRepository.assign_route)
         entrega_dict = {
             'id': entrega_id,
             'tipo_item': 'ENTREGA',
             'custo_total': custo_total_dec,
             'motoboy': motoboy_nome
         }
-        self.repo.save(entrega_dict)
+        self.repo.assign_route(entrega_dict, pedidos_ids, rateio)
+
+        return {"entrega_id": entrega_id, "custo_por_pedido": rateio}
+
+    def plan_routes(self, payload: dict) -> dict:
+        """
+        Planeja (e, com "confirmar": true, grava) as rotas de um dia: todos os
+        pedidos ainda sem rota daquela data_entrega, agrupados por motoboy
+        respeitando a capacidade (em cookies), com o frete de cada rota
+        rateado por distância x peso. Ver logistics.planner.
+        """
+        # numpy só é carregado por quem planeja
+        try:
+            from logistics import planner
+        except ImportError:
+            raise ServiceUnavailableException(
+                "Planejamento de rotas indisponível: o numpy não está no pacote da Lambda (-c numpy_layer_arn).")
+
+        data_entrega = self._parse_day(payload.get('data_entrega'))
+        origem = self._parse_point(payload.get('origem'), "origem")
+        motoboys = self._parse_motoboys(payload.get('motoboys'))
+        zonas = {nome: self._parse_point(ponto, f"zona {nome}") for nome, ponto in (payload.get('zonas') or {}).items()}
+        locais = payload.get('locais') or {}
+
+        pedidos, nao_planejados, status_anteriores = [], [], {}
+        for pedido in self.repo.list_assignable_for_delivery(data_entrega):
+            status_anteriores[pedido['id']] = pedido['status']
+            ponto = self._locate(locais.get(pedido['id']), zonas)
+            if ponto is None:
+                nao_planejados.append({'id': pedido['id'], 'motivo': "Sem localização (lat/lng ou zona)."})
+                continue
+            peso = sum(int(item.get('qtd', 0)) for item in pedido.get('itens', []))
+            pedidos.append((pedido['id'], ponto, peso))
+
+        resultado = planner.plan(
+            origem,
+            [ponto[0] for _, ponto, _ in pedidos],
+            [ponto[1] for _, ponto, _ in pedidos],
+            [peso for _, _, peso in pedidos],
+            motoboys,
+            retorno=payload.get('retorno', True)
+        )
+        nao_planejados += [{'id': pedidos[i][0], 'motivo': "Sem capacidade disponível."} for i in resultado['sobras']]
+
+        rotas = []
+        for rota in resultado['rotas']:
+            ids = [pedidos[i][0] for i in rota['paradas']]
+            rotas.append({
+                'motoboy': motoboys[rota['motoboy']]['nome'],
+                'pedidos_ids': ids,
+                'peso': sum(pedidos[i][2] for i in rota['paradas']),
+                'distancia_km': rota['distancia_km'],
+                'custo_total': rota['custo_total'],
+                'rateio': dict(zip(ids, rota['rateio']))
+            })
+
+        confirmar = bool(payload.get('confirmar'))
+        if confirmar and rotas:
+            self._commit_plan(data_entrega, rotas, status_anteriores)
+
+        # Confirmado: os totais só contam o que foi gravado (rotas com 409/503 ficam de fora)
+        gravadas = [r for r in rotas if r['status'] == 201] if confirmar else rotas
+        return {
+            'data_entrega': data_entrega,
+            'confirmado': confirmar,
+            'rotas': rotas,
+            'nao_planejados': nao_planejados,
+            'totais': {
+                'pedidos': sum(len(r['pedidos_ids']) for r in gravadas),
+                'rotas': len(gravadas),
+                'distancia_km': sum((r['distancia_km'] for r in gravadas), Decimal('0')),
+                'custo_total': sum((r['custo_total'] for r in gravadas), Decimal('0.00'))
+            }
+        }
+
+    def _commit_plan(self, data_entrega: str, rotas: list, status_anteriores: dict):
+        """
+        Uma entrega (transação própria) por rota, gravadas em paralelo; resultado
+        por rota. Os status lidos no planejamento poupam a releitura dos pedidos.
+        """
+        def commit(rota):
+            entrega_id = f"ent_{str(uuid.uuid4())[:8]}"
+            entrega_dict = {
+                'id': entrega_id,
+                'tipo_item': 'ENTREGA',
+                'custo_total': rota['custo_total'],
+                'motoboy': rota['motoboy'],
+                'data_entrega': data_entrega,
+                'distancia_km': rota['distancia_km'],
+                'pedidos_ids': rota['pedidos_ids']
+            }
+            try:
+                self.repo.assign_route(entrega_dict, rota['pedidos_ids'], rota['rateio'],
+                                       {pid: status_anteriores[pid] for pid in rota['pedidos_ids']})
+                return {'entrega_id': entrega_id, 'status': 201}
+            except BusinessRuleException as e:
+                # Algum pedido mudou desde o planejamento: a rota inteira volta
+                return {'status': 409, 'erro': str(e)}
+            except Exception as e:
+                logger.error(f"Falha ao gravar a rota {entrega_id} de {rota['motoboy']}: {e}", exc_info=True)
+                return {'status': 503, 'erro': "Falha ao gravar a rota; tente novamente."}
+
+        with ThreadPoolExecutor(max_workers=min(len(rotas), ROUTE_MAX_WORKERS)) as executor:
+            for rota, resultado in zip(rotas, executor.map(commit, rotas)):
+                rota.update(resultado)
+
+    @staticmethod
+    def _parse_day(value) -> str:
+        try:
+            return date.fromisoformat(value).isoformat()
+        except (TypeError, ValueError):
+            raise BusinessRuleException("Informe 'data_entrega' no formato AAAA-MM-DD.")
+
+    @staticmethod
+    def _parse_point(value, campo: str) -> tuple:
+        try:
+            lat, lng = float(value['lat']), float(value['lng'])
+        except (TypeError, KeyError, ValueError):
+            raise BusinessRuleException(f"Coordenadas inválidas em {campo}: informe 'lat' e 'lng'.")
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise BusinessRuleException(f"Coordenadas fora do intervalo em {campo}.")
+        return lat, lng
 
-        # 2. Atualizar Pedidos
-        for pid in pedidos_ids:
-            self.repo.update_logistics(pid, entrega_id, rateio)
+    @staticmethod
+    def _parse_motoboys(values) -> list:
+        if not isinstance(values, list) or not values:
+            raise BusinessRuleException("Informe a lista 'motoboys'.")
+        motoboys = []
+        for value in values:
+            try:
+                motoboy = {
+                    'nome': str(value['nome']),
+                    'capacidade': int(value['capacidade']),
+                    'custo_base': Decimal(str(value.get('custo_base', '0'))),
+                    'custo_km': Decimal(str(value.get('custo_km', '0')))
+                }
+            except (TypeError, KeyError, ValueError, InvalidOperation):
+                raise BusinessRuleException("Cada motoboy precisa de 'nome', 'capacidade' e custos numéricos.")
+            if motoboy['capacidade'] <= 0 or motoboy['custo_base'] < 0 or motoboy['custo_km'] < 0:
+                raise BusinessRuleException(f"Capacidade/custos inválidos para {motoboy['nome']}.")
+            motoboys.append(motoboy)
+        return motoboys
 
-        return {"entrega_id": entrega_id, "custo_por_pedido": rateio}
\ No newline at end of file
+    def _locate(self, local, zonas: dict):
+        """Local do pedido: coordenadas próprias ou o centro da zona informada."""
+        if not isinstance(local, dict):
+            return None
+        if 'zona' in local:
+            return zonas.get(local['zona'])
+        return self._parse_point(local, "locais")
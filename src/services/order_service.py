@@ -1,25 +1,248 @@
 import uuid
-import json
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 # Imports dos Modelos e Repositórios
-from models import PedidoModel, ItemPedidoSnapshot, StatusPedido
+from models import PedidoModel, ItemPedidoSnapshot, StatusPedido, check_data_entrega
+from core.codec import to_item
+from core.keys import delivery_months
 from repositories.catalog_repository import CatalogRepository
-from repositories.order_repository import OrderRepository
+from repositories.order_repository import OrderRepository, OPEN_STATUSES
+from core.pagination import decode_cursor, encode_cursor, parse_limit
 from core.exceptions import BusinessRuleException, EntityNotFoundException
 
+# Atributos que podem ser pedidos em `fields` (além do modelo, os gravados
+# diretamente pelos repositórios). O histórico tem rota própria.
+ORDER_FIELDS = frozenset(PedidoModel.model_fields) | {'status_pre_rota'}
+
+# Atributos internos do registro de histórico, fora da resposta
+HISTORY_KEY_FIELDS = ('pedido_id', 'chave')
+
+# Sempre projetados: identificam o pedido e compõem o ETag da listagem
+ORDER_KEY_FIELDS = ('id', 'status', 'versao')
+
+# Operações em massa (POST /orders/batch, PATCH /orders/status:batch)
+BATCH_MAX_ORDERS = 100
+
+# Fluxo normal do pedido; EXTRAVIADO só pela rota de extravio
+STATUS_FLOW = ('RECEBIDO', 'EM_PREPARO', 'EM_ROTA', 'CONCLUIDO')
+
+# Teto de Query por página (filtros podem esvaziar páginas inteiras)
+PAGE_MAX_QUERIES = 10
+
+# Intervalo de entrega aberto (só entrega_de ou só entrega_ate) cobre um ano:
+# cada mês é uma partição do DeliveryIndex, lida com um Query próprio
+DELIVERY_OPEN_RANGE = timedelta(days=366)
+
 
 class OrderService:
-    def __init__(self):
-        self.catalog_repo = CatalogRepository()
+    def __init__(self, catalog_cache=None):
+        self.catalog_repo = CatalogRepository(cache=catalog_cache)
         self.order_repo = OrderRepository()
 
     def list_active(self):
-        items = self.order_repo.list_open_orders()
-        return self._fix_decimals(items)
+        # Decimals seguem como estão: index.response serializa numa passada só
+        return self.order_repo.list_open_orders()
+
+    def list_page(self, limit=None, cursor: str = None, fields: str = None, status: str = None,
+                  entrega_de: str = None, entrega_ate: str = None) -> dict:
+        """
+        Uma página de pedidos: {"items": [...], "next": cursor ou None}.
+        Sem intervalo de entrega, percorre os status pedidos (padrão: os
+        abertos) em sequência no StatusIndex; com intervalo, lê o
+        DeliveryIndex mês a mês, em ordem de data de entrega.
+        """
+        limit = parse_limit(limit)
+        statuses = self._parse_statuses(status)
+        projection = self._parse_fields(fields)
+        de, ate = self._parse_delivery_range(entrega_de, entrega_ate)
+
+        state = decode_cursor(cursor) if cursor else None
+        if de or ate:
+            return self._delivery_page(limit, state, statuses, projection, de, ate)
+
+        position = 0
+        start_key = None
+        if state:
+            if state.get('s') not in statuses:
+                raise ValueError("Cursor inválido para estes filtros.")
+            position = statuses.index(state['s'])
+            # 'k' nulo: o status anterior acabou, este começa do início
+            start_key = self._cursor_key(state) if state.get('k') is not None else None
+
+        items = []
+        for _ in range(PAGE_MAX_QUERIES):
+            page, start_key = self.order_repo.query_status_page(
+                statuses[position], limit - len(items), start_key, projection
+            )
+            items.extend(page)
+
+            if start_key is None:
+                position += 1
+                if position == len(statuses):
+                    return {'items': items, 'next': None}
+            if len(items) == limit:
+                break
+
+        return {'items': items, 'next': encode_cursor({'s': statuses[position], 'k': start_key})}
+
+    def _delivery_page(self, limit: int, state: dict, statuses: list, projection, de: str, ate: str) -> dict:
+        months = delivery_months(de, ate)
+        position = 0
+        start_key = None
+        if state:
+            if state.get('d') != 1 or state.get('m') not in months:
+                raise ValueError("Cursor inválido para estes filtros.")
+            position = months.index(state['m'])
+            # 'k' nulo: o mês anterior acabou, este começa do início
+            start_key = self._cursor_key(state) if state.get('k') is not None else None
+
+        items = []
+        for _ in range(PAGE_MAX_QUERIES):
+            page, start_key = self.order_repo.query_delivery_page(
+                statuses, months[position], de, ate, limit - len(items), start_key, projection
+            )
+            items.extend(page)
+
+            if start_key is None:
+                position += 1
+                if position == len(months):
+                    return {'items': items, 'next': None}
+            if len(items) == limit:
+                break
+
+        return {'items': items, 'next': encode_cursor({'d': 1, 'm': months[position], 'k': start_key})}
+
+    @staticmethod
+    def _cursor_key(state: dict) -> dict:
+        key = state.get('k')
+        if not isinstance(key, dict) or not key or not all(isinstance(v, str) for v in key.values()):
+            raise ValueError("Cursor inválido para estes filtros.")
+        return key
+
+    def list_history(self, pedido_id: str, limit=None, cursor: str = None) -> dict:
+        """
+        Histórico de status de um pedido, do mais antigo ao mais novo:
+        {"items": [...], "next": cursor ou None}. Pedidos antigos ainda
+        carregam o `historico` no próprio item: ele vem antes dos registros
+        e conta no `limit` como eles (cursor {'l': posição} enquanto durar).
+        """
+        limit = parse_limit(limit)
+
+        start_key, offset = None, 0
+        state = decode_cursor(cursor) if cursor else {}
+        if 'k' in state:
+            start_key = state['k']
+            if (not isinstance(start_key, dict) or start_key.get('pedido_id') != pedido_id
+                    or not isinstance(start_key.get('chave'), str)):
+                raise ValueError("Cursor inválido para este pedido.")
+        elif cursor:
+            offset = state.get('l')
+            if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+                raise ValueError("Cursor inválido para este pedido.")
+
+        items = []
+        if start_key is None:
+            # Fora dos registros: confirma o pedido e lê o `historico` embutido
+            exists, legacy = self.order_repo.get_legacy_history(pedido_id)
+            if not exists:
+                raise EntityNotFoundException("Pedido não encontrado")
+            items = legacy[offset:offset + limit]
+            if len(items) == limit:
+                return {'items': items, 'next': encode_cursor({'l': offset + limit})}
+
+        records, last_key = self.order_repo.history.list_page(pedido_id, limit - len(items), start_key)
+        items += [{k: v for k, v in r.items() if k not in HISTORY_KEY_FIELDS} for r in records]
+        return {'items': items, 'next': encode_cursor({'k': last_key}) if last_key else None}
+
+    @staticmethod
+    def _parse_statuses(status: str) -> list:
+        if not status:
+            return list(OPEN_STATUSES)
+        statuses = list(dict.fromkeys(s.strip() for s in status.split(',') if s.strip()))
+        invalid = [s for s in statuses if s not in StatusPedido.__members__]
+        if invalid or not statuses:
+            raise BusinessRuleException(f"Status inválido: {', '.join(invalid) or status}")
+        return statuses
+
+    @staticmethod
+    def _parse_fields(fields: str):
+        if not fields:
+            return None
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        invalid = [f for f in requested if f not in ORDER_FIELDS]
+        if invalid:
+            raise BusinessRuleException(f"Campos inválidos: {', '.join(invalid)}.")
+        return list(dict.fromkeys([*ORDER_KEY_FIELDS, *requested]))
+
+    @staticmethod
+    def _parse_delivery_range(entrega_de: str, entrega_ate: str):
+        try:
+            de = date.fromisoformat(entrega_de).isoformat() if entrega_de else None
+            ate = date.fromisoformat(entrega_ate).isoformat() if entrega_ate else None
+        except ValueError:
+            raise BusinessRuleException("Informe 'entrega_de' e 'entrega_ate' no formato AAAA-MM-DD.")
+        if de and ate and ate < de:
+            raise BusinessRuleException("'entrega_ate' deve ser maior ou igual a 'entrega_de'.")
+        if not de and not ate:
+            return None, None
+        # Intervalo aberto: fechado em DELIVERY_OPEN_RANGE (o índice é particionado por mês)
+        if not ate:
+            ate = (date.fromisoformat(de) + DELIVERY_OPEN_RANGE).isoformat()
+        if not de:
+            de = (date.fromisoformat(ate) - DELIVERY_OPEN_RANGE).isoformat()
+        # data_entrega pode trazer hora: '\uffff' inclui o dia inteiro de 'ate'
+        return de, f"{ate}\uffff"
 
     def create_order(self, payload: dict) -> dict:
+        linhas = self._validate_order(payload)
+
+        # Um único BatchGetItem para todos os sabores do carrinho
+        cookies = self.catalog_repo.get_many([cookie_id for cookie_id, _ in linhas])
+        order_dict = self._build_order(payload, linhas, cookies)
+        self.order_repo.save(order_dict)
+
+        return order_dict
+
+    def create_orders(self, payloads: list) -> dict:
+        """
+        Cria vários pedidos numa chamada. Cada pedido é validado sozinho (um
+        inválido não derruba os outros), os sabores de todos saem do mesmo
+        BatchGetItem e a gravação é feita em lotes paralelos.
+        """
+        self._check_batch_size(payloads, "pedidos")
+
+        resultados = [None] * len(payloads)
+        validos = []
+        for indice, payload in enumerate(payloads):
+            try:
+                if not isinstance(payload, dict):
+                    raise BusinessRuleException("Cada pedido deve ser um objeto.")
+                validos.append((indice, payload, self._validate_order(payload)))
+            except BusinessRuleException as e:
+                resultados[indice] = {'indice': indice, 'status': 400, 'erro': str(e)}
+
+        cookie_ids = [cookie_id for _, _, linhas in validos for cookie_id, _ in linhas]
+        cookies = self.catalog_repo.get_many(cookie_ids) if cookie_ids else {}
+
+        pedidos = []
+        for indice, payload, linhas in validos:
+            try:
+                pedidos.append((indice, self._build_order(payload, linhas, cookies)))
+            except EntityNotFoundException as e:
+                resultados[indice] = {'indice': indice, 'status': 404, 'erro': str(e)}
+
+        nao_gravados = self.order_repo.save_many([pedido for _, pedido in pedidos])
+        for indice, pedido in pedidos:
+            if pedido['id'] in nao_gravados:
+                resultados[indice] = {'indice': indice, 'status': 503, 'erro': "Falha ao gravar; tente novamente."}
+            else:
+                resultados[indice] = {'indice': indice, 'status': 201, 'pedido': pedido}
+
+        return self._batch_summary(resultados)
+
+    def _validate_order(self, payload: dict) -> list:
+        """Valida o payload de um pedido (sem I/O) e devolve [(cookie_id, qtd)]."""
         itens_entrada = payload.get('itens', [])
 
         # MUDANÇA: Recebe a data combinada
@@ -27,13 +250,17 @@ class OrderService:
 
         if not data_entrega_str:
             raise BusinessRuleException("A Data de Entrega da encomenda é obrigatória.")
+        # Antes de qualquer leitura (o PedidoModel confere de novo ao montar)
+        try:
+            check_data_entrega(data_entrega_str)
+        except ValueError as e:
+            raise BusinessRuleException(str(e))
 
         if not itens_entrada:
             raise BusinessRuleException("A encomenda deve conter pelo menos um item.")
 
-        itens_snapshot = []
-        total_venda = Decimal('0.00')
         ids_processados = set()
+        linhas = []
 
         for item_input in itens_entrada:
             cookie_id = item_input.get('cookie_id')
@@ -45,11 +272,24 @@ class OrderService:
             if qtd <= 0:
                 raise BusinessRuleException(f"Quantidade deve ser maior que zero.")
 
+            if not cookie_id:
+                raise BusinessRuleException("Todo item deve informar o cookie_id.")
+
             if cookie_id in ids_processados:
                 raise BusinessRuleException(f"Item duplicado: {cookie_id}.")
 
             ids_processados.add(cookie_id)
-            cookie_data = self.catalog_repo.get_by_id(cookie_id)
+            linhas.append((cookie_id, qtd))
+
+        return linhas
+
+    def _build_order(self, payload: dict, linhas: list, cookies: dict) -> dict:
+        """Monta o item do pedido com o snapshot de preço/custo de cada cookie."""
+        itens_snapshot = []
+        total_venda = Decimal('0.00')
+
+        for cookie_id, qtd in linhas:
+            cookie_data = cookies.get(cookie_id)
 
             if not cookie_data:
                 raise EntityNotFoundException(f"Cookie {cookie_id} não encontrado.")
@@ -75,29 +315,88 @@ class OrderService:
             itens=itens_snapshot,
             valor_total_venda=total_venda,
             status=StatusPedido.RECEBIDO,
-            data_entrega=data_entrega_str,  # Salva a data combinada
+            data_entrega=payload.get('data_entrega'),  # Salva a data combinada
             criado_em=datetime.now().isoformat()
         )
 
-        order_dict = json.loads(pedido.model_dump_json())
-        self._fix_decimals(order_dict)
-        self.order_repo.save(order_dict)
-
-        return order_dict
+        # Valores monetários gravados como Decimal (tipo N), sem passar por texto
+        return to_item(pedido)
 
-    def _fix_decimals(self, obj):
-        if isinstance(obj, float):
-            return Decimal(str(obj))
-        elif isinstance(obj, dict):
-            for k, v in obj.items():
-                if isinstance(v, float):
-                    obj[k] = Decimal(str(v))
-                else:
-                    self._fix_decimals(v)
-        elif isinstance(obj, list):
-            for item in obj:
-                self._fix_decimals(item)
-        return obj
+    def update_statuses(self, pedidos_ids: list, novo_status: str) -> dict:
+        """
+        Transição em massa: um BatchGetItem lê todos os pedidos, as transições
+        são validadas juntas e as válidas vão em transações paralelas.
+        """
+        self._check_batch_size(pedidos_ids, "ids")
+        if novo_status not in StatusPedido.__members__:
+            raise BusinessRuleException(f"Status inválido: {novo_status}")
+        if novo_status == StatusPedido.EXTRAVIADO.value:
+            raise BusinessRuleException("Extravio exige motivo: use POST /orders/{id}/loss.")
+
+        pedidos_ids = list(dict.fromkeys(pedidos_ids))
+        pedidos = self.order_repo.get_many(pedidos_ids)
+        agora = datetime.now().isoformat()
+        data_conclusao = agora if novo_status == StatusPedido.CONCLUIDO.value else None
+
+        resultados = {}
+        mudancas = []
+        for pedido_id in pedidos_ids:
+            pedido = pedidos.get(pedido_id)
+            if not pedido:
+                resultados[pedido_id] = {'id': pedido_id, 'status': 404, 'erro': "Pedido não encontrado."}
+                continue
+
+            status_anterior = pedido.get('status')
+            if status_anterior == novo_status:
+                resultados[pedido_id] = {'id': pedido_id, 'status': 200, 'status_novo': novo_status,
+                                         'message': "O pedido já está neste status."}
+                continue
+
+            if not self._is_forward(status_anterior, novo_status):
+                resultados[pedido_id] = {'id': pedido_id, 'status': 400,
+                                         'erro': f"Transição inválida: {status_anterior} -> {novo_status}."}
+                continue
+
+            entry = {"status_anterior": status_anterior, "novo_status": novo_status, "data_alteracao": agora}
+            mudancas.append((pedido_id, status_anterior, novo_status, entry, data_conclusao))
+
+        falhas = self.order_repo.update_status_many(mudancas)
+        for pedido_id, *_ in mudancas:
+            motivo = falhas.get(pedido_id)
+            if motivo == 'CONFLITO':
+                resultados[pedido_id] = {'id': pedido_id, 'status': 409,
+                                         'erro': "O pedido foi alterado por outra operação; recarregue."}
+            elif motivo:
+                resultados[pedido_id] = {'id': pedido_id, 'status': 503, 'erro': "Falha ao gravar; tente novamente."}
+            else:
+                resultados[pedido_id] = {'id': pedido_id, 'status': 200, 'status_novo': novo_status,
+                                         'concluido_em': data_conclusao}
+
+        return self._batch_summary([resultados[pedido_id] for pedido_id in pedidos_ids])
+
+    @staticmethod
+    def _is_forward(status_anterior: str, novo_status: str) -> bool:
+        """Só avança no fluxo RECEBIDO -> EM_PREPARO -> EM_ROTA -> CONCLUIDO (pode pular etapas)."""
+        if status_anterior not in STATUS_FLOW or novo_status not in STATUS_FLOW:
+            return False
+        return STATUS_FLOW.index(novo_status) > STATUS_FLOW.index(status_anterior)
+
+    @staticmethod
+    def _check_batch_size(values, campo: str):
+        if not isinstance(values, list) or not values:
+            raise BusinessRuleException(f"Informe a lista '{campo}'.")
+        if len(values) > BATCH_MAX_ORDERS:
+            raise BusinessRuleException(f"Máximo de {BATCH_MAX_ORDERS} pedidos por chamada.")
+
+    @staticmethod
+    def _batch_summary(resultados: list) -> dict:
+        sucesso = sum(1 for r in resultados if r['status'] < 300)
+        return {
+            'total': len(resultados),
+            'sucesso': sucesso,
+            'falhas': len(resultados) - sucesso,
+            'resultados': resultados
+        }
 
     def update_order_status(self, pedido_id: str, novo_status: str):
         if novo_status not in StatusPedido.__members__:
@@ -147,7 +446,8 @@ class OrderService:
             qtd = Decimal(str(item.get('qtd', '0')))
             prejuizo_produtos += (custo_unit * qtd)
 
-        prejuizo_entrega = Decimal(str(pedido.get('custo_entrega_rateado', '0.00')))
+        # Pedido ainda sem rota tem custo_entrega_rateado nulo
+        prejuizo_entrega = Decimal(str(pedido.get('custo_entrega_rateado') or '0.00'))
         prejuizo_total = prejuizo_produtos + prejuizo_entrega
 
         ocorrencia = {
@@ -162,8 +462,7 @@ class OrderService:
             }
         }
 
-        ocorrencia_dynamo = json.loads(json.dumps(ocorrencia, default=str), parse_float=Decimal)
-        self.order_repo.register_occurrence(pedido_id, ocorrencia_dynamo)
+        self.order_repo.register_occurrence(pedido_id, ocorrencia)
 
         return {
             "message": "Extravio registrado.",
@@ -0,0 +1,50 @@
+"""
+Motores de armazenamento por trás dos repositórios.
+
+Os repositórios falam com um "storage" que aceita os mesmos parâmetros do
+boto3 (Key=, Item=, KeyConditionExpression=...) com valores Python, sempre
+com a tabela como primeiro argumento:
+
+    get_item, put_item, update_item, delete_item,
+    query, query_page, scan, batch_get, batch_write, transact_write
+
+Condição violada sai como core.exceptions.ConditionalCheckFailedException
+e transação recusada como TransactionCanceledException (com os códigos),
+nos dois motores:
+
+- dynamodb (padrão): o client de baixo nível de core.database;
+- sqlite: arquivo local (SQLITE_PATH, padrão ':memory:'), para rodar e
+  perfilar sem AWS.
+
+Escolhido por STORAGE_ENGINE. O módulo de cada motor só é importado quando
+ele é usado.
+"""
+import os
+import threading
+
+ENGINES = ('dynamodb', 'sqlite')
+
+_instance = None
+_lock = threading.Lock()
+
+
+def create_storage(engine: str):
+    if engine == 'dynamodb':
+        from core.database import get_database
+        from .dynamodb import DynamoDBStorage
+        return DynamoDBStorage(get_database())
+    if engine == 'sqlite':
+        from .sqlite import SQLiteStorage, table_schemas
+        return SQLiteStorage(os.environ.get('SQLITE_PATH', ':memory:'), table_schemas(),
+                             table_name=os.environ.get('TABLE_NAME'))
+    raise RuntimeError(f"STORAGE_ENGINE inválido: {engine} (use {' ou '.join(ENGINES)}).")
+
+
+def get_storage():
+    """Singleton criado no primeiro uso, como o core.database."""
+    global _instance
+    if _instance is None:
+        with _lock:
+            if _instance is None:
+                _instance = create_storage(os.environ.get('STORAGE_ENGINE', 'dynamodb'))
+    return _instance
@@ -0,0 +1,203 @@
+"""
+Motor DynamoDB: as operações do storage sobre o client de baixo nível de
+core.database, com a (de)serialização do core.codec. Retries de lote e os
+erros do botocore traduzidos para core.exceptions ficam aqui.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics
+from core.codec import deserialize_item, serialize_item
+from core.exceptions import (ConditionalCheckFailedException, InfrastructureException, ThrottlingException,
+                             TransactionCanceledException)
+from core.keys import KEY_ATTRIBUTES
+
+logger = logging.getLogger()
+
+# Limites do DynamoDB por chamada
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+TRANSACTION_LIMIT = 100
+BATCH_MAX_ATTEMPTS = 5
+
+# Erros que o client já reenviou (retries adaptativos) e que ainda valem um
+# novo envio do lote. Os demais (ValidationException, AccessDenied...) são
+# bugs ou configuração: sobem para o chamador em vez de virar "não gravado".
+RETRYABLE_ERRORS = frozenset((
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+))
+
+# Parâmetros que levam valores Python e precisam ir no formato tipado
+_ITEM_PARAMS = ('Key', 'Item', 'ExclusiveStartKey', 'ExpressionAttributeValues')
+
+
+def is_retryable(error: Exception) -> bool:
+    """ClientError do botocore com um código de RETRYABLE_ERRORS."""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in RETRYABLE_ERRORS
+
+
+def load_item(item: dict) -> dict:
+    """Formato tipado -> dict Python, sem pk/sk/mes_entrega (detalhe do layout, fora da API)."""
+    data = deserialize_item(item)
+    for name in KEY_ATTRIBUTES:
+        data.pop(name, None)
+    return data
+
+
+class DynamoDBStorage:
+    def __init__(self, database):
+        self.table_name = database.table_name
+        # Client de baixo nível sintonizado (ver core.database)
+        self.client = database.client
+
+    @staticmethod
+    def _request(table: str, params: dict) -> dict:
+        """Parâmetros Python -> formato tipado, já com o TableName."""
+        request = {'TableName': table, **params}
+        for name in _ITEM_PARAMS:
+            if name in request:
+                request[name] = serialize_item(request[name])
+        return request
+
+    def get_item(self, table: str, **params):
+        item = self.client.get_item(**self._request(table, params)).get('Item')
+        if not item:
+            return None
+        with metrics.span('deserialization'):
+            return load_item(item)
+
+    def put_item(self, table: str, **params):
+        try:
+            self.client.put_item(**self._request(table, params))
+        except self.client.exceptions.ConditionalCheckFailedException as e:
+            raise ConditionalCheckFailedException(str(e)) from e
+
+    def update_item(self, table: str, **params) -> dict:
+        try:
+            response = self.client.update_item(**self._request(table, params))
+        except self.client.exceptions.ConditionalCheckFailedException as e:
+            raise ConditionalCheckFailedException(str(e)) from e
+        with metrics.span('deserialization'):
+            return load_item(response.get('Attributes', {}))
+
+    def delete_item(self, table: str, **params):
+        try:
+            self.client.delete_item(**self._request(table, params))
+        except self.client.exceptions.ConditionalCheckFailedException as e:
+            raise ConditionalCheckFailedException(str(e)) from e
+
+    def query(self, table: str, **params):
+        """
+        Executa um Query seguindo o LastEvaluatedKey até a última página.
+        Sem isso o DynamoDB corta silenciosamente o resultado em 1 MB.
+        """
+        yield from self._paginate(self.client.query, table, params)
+
+    def query_page(self, table: str, **params):
+        response = self.client.query(**self._request(table, params))
+        with metrics.span('deserialization'):
+            items = [load_item(item) for item in response.get('Items', [])]
+        last_key = response.get('LastEvaluatedKey')
+        return items, (deserialize_item(last_key) if last_key else None)
+
+    def scan(self, table: str, **params):
+        yield from self._paginate(self.client.scan, table, params)
+
+    def _paginate(self, operation, table: str, params: dict):
+        request = self._request(table, params)
+        while True:
+            response = operation(**request)
+            # A página é convertida de uma vez: o span não mede o consumidor do gerador
+            with metrics.span('deserialization'):
+                items = [load_item(item) for item in response.get('Items', [])]
+            yield from items
+
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            # Já vem no formato tipado: reaproveitado sem converter
+            request['ExclusiveStartKey'] = last_key
+
+    def batch_get(self, table: str, keys: list) -> list:
+        """
+        BatchGetItem em lotes de 100, reenviando as UnprocessedKeys com
+        backoff exponencial quando há throttling.
+        """
+        items = []
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            chunk = [serialize_item(key) for key in keys[start:start + BATCH_GET_LIMIT]]
+            request = {table: {'Keys': chunk}}
+
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                response = self.client.batch_get_item(RequestItems=request)
+                with metrics.span('deserialization'):
+                    items.extend(load_item(item) for item in response.get('Responses', {}).get(table, []))
+
+                request = response.get('UnprocessedKeys') or {}
+                if not request:
+                    break
+                time.sleep(0.05 * (2 ** attempt))
+            else:
+                raise InfrastructureException("DynamoDB não processou todas as chaves do lote.")
+
+        return items
+
+    def batch_write(self, table: str, items: list, max_workers: int = 1) -> list:
+        """
+        BatchWriteItem em lotes de 25 (até `max_workers` em paralelo),
+        reenviando UnprocessedItems com backoff. Devolve os itens não gravados.
+        """
+        chunks = [items[i:i + BATCH_WRITE_LIMIT] for i in range(0, len(items), BATCH_WRITE_LIMIT)]
+        if not chunks:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), max_workers)) as executor:
+            results = list(executor.map(lambda chunk: self._batch_write_chunk(table, chunk), chunks))
+        return [item for unprocessed in results for item in unprocessed]
+
+    def _batch_write_chunk(self, table: str, items: list) -> list:
+        request = {table: [{'PutRequest': {'Item': serialize_item(item)}} for item in items]}
+
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            try:
+                response = self.client.batch_write_item(RequestItems=request)
+                request = response.get('UnprocessedItems') or {}
+                if not request:
+                    return []
+            except self.client.exceptions.ClientError as e:
+                if not is_retryable(e):
+                    raise
+                # O lote inteiro volta: nada dele foi confirmado
+                logger.warning(f"BatchWriteItem em {table} recusado ({e.response['Error']['Code']}), reenviando.")
+            time.sleep(0.05 * (2 ** attempt))
+
+        return [deserialize_item(entry['PutRequest']['Item']) for entry in request.get(table, [])]
+
+    def transact_write(self, actions: list, token: str = None):
+        """
+        TransactWriteItems com as ações já com TableName. Condição violada ->
+        TransactionCanceledException com os CancellationReasons na ordem das ações;
+        throttling (já esgotados os retries do client) -> ThrottlingException.
+        """
+        transact_items = []
+        for action in actions:
+            (operation, params), = action.items()
+            transact_items.append({operation: self._request(params['TableName'], params)})
+
+        kwargs = {'TransactItems': transact_items}
+        if token:
+            kwargs['ClientRequestToken'] = token
+        try:
+            self.client.transact_write_items(**kwargs)
+        except self.client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            raise TransactionCanceledException(str(e), [reason.get('Code', 'None') for reason in reasons]) from e
+        except self.client.exceptions.ClientError as e:
+            if is_retryable(e):
+                raise ThrottlingException(str(e)) from e
+            raise
@@ -0,0 +1,635 @@
+"""
+Expressões do DynamoDB avaliadas em Python, para os motores que não são o
+próprio DynamoDB (ver storage.sqlite).
+
+Cobre o que a API do DynamoDB aceita em:
+- ConditionExpression / FilterExpression: = <> < <= > >=, BETWEEN, IN,
+  AND/OR/NOT, parênteses e as funções attribute_exists, attribute_not_exists,
+  attribute_type, begins_with, contains e size;
+- KeyConditionExpression: igualdade na partition key e, na sort key,
+  = < <= > >=, BETWEEN ou begins_with;
+- UpdateExpression: SET (com + e -, if_not_exists e list_append), REMOVE,
+  ADD (números e sets) e DELETE (sets);
+- ProjectionExpression: caminhos com '.' e '[n]'.
+
+Os nomes (#n) são resolvidos no parse e os valores (:v) na compilação: o
+parse de cada expressão fica em cache, já que os repositórios repetem as
+mesmas expressões com valores diferentes. Expressão inválida -> ValueError,
+como a ValidationException do DynamoDB.
+"""
+import copy
+import re
+from decimal import Context, Decimal
+from functools import lru_cache
+
+# Mesma precisão do DynamoDB (38 dígitos) nas somas do SET e do ADD
+NUMBER_CONTEXT = Context(prec=38)
+
+MISSING = object()
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<name>\#[A-Za-z0-9_]+)
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<number>\d+)
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><>|<=|>=|[=<>(),.\[\]+-])
+    )""", re.VERBOSE)
+
+_KEYWORDS = frozenset(('AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'))
+_COMPARATORS = frozenset(('=', '<>', '<', '<=', '>', '>='))
+_FUNCTIONS = frozenset(('attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains'))
+
+
+def _tokenize(expression: str) -> list:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Expressão inválida perto de '{expression[position:position + 20]}'")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'word' and text.upper() in _KEYWORDS:
+            kind, text = 'keyword', text.upper()
+        tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Descida recursiva sobre os tokens; devolve árvores de tuplas."""
+
+    def __init__(self, expression: str, names: tuple):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = dict(names)
+
+    # Tokens
+
+    def peek(self, offset: int = 0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def accept(self, text: str) -> bool:
+        if self.peek()[1] == text:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, text: str):
+        if not self.accept(text):
+            raise ValueError(f"Esperado '{text}' em: {self.expression}")
+
+    def done(self):
+        if self.position != len(self.tokens):
+            raise ValueError(f"Sobra na expressão '{self.peek()[1]}' em: {self.expression}")
+
+    # Caminhos e operandos
+
+    def path(self) -> tuple:
+        parts = [self._attribute()]
+        while True:
+            if self.accept('.'):
+                parts.append(self._attribute())
+            elif self.accept('['):
+                kind, text = self.take()
+                if kind != 'number':
+                    raise ValueError(f"Índice de lista inválido em: {self.expression}")
+                parts.append(int(text))
+                self.expect(']')
+            else:
+                return tuple(parts)
+
+    def _attribute(self) -> str:
+        kind, text = self.take()
+        if kind == 'name':
+            if text not in self.names:
+                raise ValueError(f"{text} não está em ExpressionAttributeNames")
+            return self.names[text]
+        if kind == 'word':
+            return text
+        raise ValueError(f"Nome de atributo esperado em: {self.expression}")
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.position += 1
+            return ('value', text)
+        if kind == 'word' and text == 'size' and self.peek(1)[1] == '(':
+            self.position += 2
+            path = self.path()
+            self.expect(')')
+            return ('size', path)
+        return ('path', self.path())
+
+    # Condições (precedência: NOT > AND > OR)
+
+    def condition(self):
+        node = self._and()
+        while self.accept('OR'):
+            node = ('or', node, self._and())
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self.accept('AND'):
+            node = ('and', node, self._not())
+        return node
+
+    def _not(self):
+        if self.accept('NOT'):
+            return ('not', self._not())
+        return self._primary()
+
+    def _primary(self):
+        if self.accept('('):
+            node = self.condition()
+            self.expect(')')
+            return node
+
+        kind, text = self.peek()
+        if kind == 'word' and text in _FUNCTIONS and self.peek(1)[1] == '(':
+            self.position += 2
+            args = [self.operand()]
+            while self.accept(','):
+                args.append(self.operand())
+            self.expect(')')
+            return ('function', text, tuple(args))
+
+        left = self.operand()
+        kind, text = self.peek()
+        if text in _COMPARATORS:
+            self.position += 1
+            return ('compare', text, left, self.operand())
+        if self.accept('BETWEEN'):
+            low = self.operand()
+            self.expect('AND')
+            return ('between', left, low, self.operand())
+        if self.accept('IN'):
+            self.expect('(')
+            options = [self.operand()]
+            while self.accept(','):
+                options.append(self.operand())
+            self.expect(')')
+            return ('in', left, tuple(options))
+        raise ValueError(f"Condição inválida em: {self.expression}")
+
+    # UpdateExpression
+
+    def update(self) -> dict:
+        clauses = {}
+        while self.position < len(self.tokens):
+            kind, keyword = self.take()
+            if kind != 'keyword' or keyword not in ('SET', 'REMOVE', 'ADD', 'DELETE'):
+                raise ValueError(f"Cláusula inválida '{keyword}' em: {self.expression}")
+            if keyword in clauses:
+                raise ValueError(f"Cláusula {keyword} repetida em: {self.expression}")
+            actions = [self._update_action(keyword)]
+            while self.accept(','):
+                actions.append(self._update_action(keyword))
+            clauses[keyword] = tuple(actions)
+        if not clauses:
+            raise ValueError("UpdateExpression vazia.")
+        return clauses
+
+    def _update_action(self, keyword: str):
+        path = self.path()
+        if keyword == 'REMOVE':
+            return path
+        if keyword in ('ADD', 'DELETE'):
+            kind, text = self.take()
+            if kind != 'value':
+                raise ValueError(f"{keyword} exige um valor (:v) em: {self.expression}")
+            return path, ('value', text)
+
+        self.expect('=')
+        value = self._set_operand()
+        if self.peek()[1] in ('+', '-'):
+            _, sign = self.take()
+            value = ('arithmetic', sign, value, self._set_operand())
+        return path, value
+
+    def _set_operand(self):
+        kind, text = self.peek()
+        if kind == 'word' and text in ('if_not_exists', 'list_append') and self.peek(1)[1] == '(':
+            self.position += 2
+            first = self._set_operand() if text == 'list_append' else ('path', self.path())
+            self.expect(',')
+            second = self._set_operand()
+            self.expect(')')
+            return (text, first, second)
+        kind, text = self.peek()
+        if kind == 'value':
+            self.position += 1
+            return ('value', text)
+        return ('path', self.path())
+
+
+def _names_key(names: dict) -> tuple:
+    return tuple(sorted((names or {}).items()))
+
+
+@lru_cache(maxsize=512)
+def _parse_condition(expression: str, names: tuple):
+    parser = _Parser(expression, names)
+    node = parser.condition()
+    parser.done()
+    return node
+
+
+@lru_cache(maxsize=512)
+def _parse_update(expression: str, names: tuple) -> dict:
+    parser = _Parser(expression, names)
+    return parser.update()
+
+
+@lru_cache(maxsize=512)
+def _parse_projection(expression: str, names: tuple) -> tuple:
+    parser = _Parser(expression, names)
+    paths = [parser.path()]
+    while parser.accept(','):
+        paths.append(parser.path())
+    parser.done()
+    return tuple(paths)
+
+
+# --- Caminhos --------------------------------------------------------------
+
+def get_path(item, path: tuple):
+    value = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(value, list) or part >= len(value):
+                return MISSING
+            value = value[part]
+        else:
+            if not isinstance(value, dict) or part not in value:
+                return MISSING
+            value = value[part]
+    return value
+
+
+def set_path(item: dict, path: tuple, value):
+    parent = get_path(item, path[:-1])
+    last = path[-1]
+    if isinstance(last, int) and isinstance(parent, list):
+        if last < len(parent):
+            parent[last] = value
+        else:
+            parent.append(value)
+    elif isinstance(last, str) and isinstance(parent, dict):
+        parent[last] = value
+    else:
+        raise ValueError(f"Caminho inválido para o update: {_format_path(path)}")
+
+
+def remove_path(item: dict, path: tuple):
+    parent = get_path(item, path[:-1])
+    last = path[-1]
+    if isinstance(last, int) and isinstance(parent, list):
+        if last < len(parent):
+            del parent[last]
+    elif isinstance(last, str) and isinstance(parent, dict):
+        parent.pop(last, None)
+
+
+def _format_path(path: tuple) -> str:
+    text = ''
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text
+
+
+# --- Condições ---------------------------------------------------------------
+
+def _resolve(operand, values: dict):
+    """Operando -> função item -> valor (ou MISSING)."""
+    kind = operand[0]
+    if kind == 'value':
+        if operand[1] not in values:
+            raise ValueError(f"{operand[1]} não está em ExpressionAttributeValues")
+        constant = values[operand[1]]
+        return lambda item: constant
+    if kind == 'size':
+        path = operand[1]
+        return lambda item: _size(get_path(item, path))
+    path = operand[1]
+    return lambda item: get_path(item, path)
+
+
+def _size(value):
+    if value is MISSING:
+        return MISSING
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray, list, dict, set, frozenset)):
+        return len(value)
+    return MISSING
+
+
+def _kind(value):
+    """Tipo do DynamoDB para comparações: só valores do mesmo tipo se comparam."""
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, (int, Decimal)):
+        return 'N'
+    if isinstance(value, str):
+        return 'S'
+    if isinstance(value, (bytes, bytearray)):
+        return 'B'
+    return None
+
+
+def _equals(left, right) -> bool:
+    if left is MISSING or right is MISSING:
+        return False
+    kind = _kind(left)
+    if kind is not None or _kind(right) is not None:
+        return kind == _kind(right) and left == right
+    return left == right
+
+
+def _ordered(left, right, compare) -> bool:
+    if left is MISSING or right is MISSING:
+        return False
+    kind = _kind(left)
+    if kind not in ('N', 'S', 'B') or kind != _kind(right):
+        return False
+    if kind == 'S':
+        # O DynamoDB ordena strings pelos bytes em UTF-8
+        left, right = left.encode('utf-8'), right.encode('utf-8')
+    return compare(left, right)
+
+
+_ORDERINGS = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+_TYPE_NAMES = {
+    'S': str, 'N': (int, Decimal), 'B': (bytes, bytearray), 'BOOL': bool, 'NULL': type(None),
+    'L': list, 'M': dict,
+}
+
+
+def _is_type(value, type_name: str) -> bool:
+    if value is MISSING:
+        return False
+    if type_name in ('SS', 'NS', 'BS'):
+        if not isinstance(value, (set, frozenset)) or not value:
+            return False
+        return _kind(next(iter(value))) == type_name[0]
+    if type_name == 'N':
+        return _kind(value) == 'N'
+    expected = _TYPE_NAMES.get(type_name)
+    return expected is not None and isinstance(value, expected)
+
+
+def _begins_with(value, prefix) -> bool:
+    if isinstance(value, str) and isinstance(prefix, str):
+        return value.startswith(prefix)
+    if isinstance(value, (bytes, bytearray)) and isinstance(prefix, (bytes, bytearray)):
+        return bytes(value).startswith(bytes(prefix))
+    return False
+
+
+def _contains(value, operand) -> bool:
+    if value is MISSING or operand is MISSING:
+        return False
+    if isinstance(value, str):
+        return isinstance(operand, str) and operand in value
+    if isinstance(value, (bytes, bytearray)):
+        return isinstance(operand, (bytes, bytearray)) and bytes(operand) in bytes(value)
+    if isinstance(value, (set, frozenset, list)):
+        return any(_equals(element, operand) for element in value)
+    return False
+
+
+def _compile(node, values: dict):
+    kind = node[0]
+    if kind == 'and':
+        left, right = _compile(node[1], values), _compile(node[2], values)
+        return lambda item: left(item) and right(item)
+    if kind == 'or':
+        left, right = _compile(node[1], values), _compile(node[2], values)
+        return lambda item: left(item) or right(item)
+    if kind == 'not':
+        inner = _compile(node[1], values)
+        return lambda item: not inner(item)
+
+    if kind == 'compare':
+        _, operator, left, right = node
+        left, right = _resolve(left, values), _resolve(right, values)
+        if operator == '=':
+            return lambda item: _equals(left(item), right(item))
+        if operator == '<>':
+            # Atributo ausente é "diferente" de qualquer valor
+            return lambda item: not _equals(left(item), right(item))
+        ordering = _ORDERINGS[operator]
+        return lambda item: _ordered(left(item), right(item), ordering)
+
+    if kind == 'between':
+        value, low, high = (_resolve(operand, values) for operand in node[1:])
+        return lambda item: (_ordered(value(item), low(item), _ORDERINGS['>='])
+                             and _ordered(value(item), high(item), _ORDERINGS['<=']))
+
+    if kind == 'in':
+        value = _resolve(node[1], values)
+        options = [_resolve(option, values) for option in node[2]]
+        return lambda item: any(_equals(value(item), option(item)) for option in options)
+
+    _, name, args = node
+    if name in ('attribute_exists', 'attribute_not_exists', 'attribute_type'):
+        if args[0][0] != 'path':
+            raise ValueError(f"{name} exige um caminho de atributo.")
+        path = args[0][1]
+        if name == 'attribute_exists':
+            return lambda item: get_path(item, path) is not MISSING
+        if name == 'attribute_not_exists':
+            return lambda item: get_path(item, path) is MISSING
+        type_name = _resolve(args[1], values)
+        return lambda item: _is_type(get_path(item, path), type_name(item))
+
+    first, second = (_resolve(arg, values) for arg in args)
+    if name == 'begins_with':
+        return lambda item: _begins_with(first(item), second(item))
+    return lambda item: _contains(first(item), second(item))
+
+
+def condition(expression: str, names: dict = None, values: dict = None):
+    """ConditionExpression / FilterExpression -> função item -> bool (None se não houver expressão)."""
+    if not expression:
+        return None
+    return _compile(_parse_condition(expression, _names_key(names)), values or {})
+
+
+def key_condition(expression: str, names: dict = None, values: dict = None) -> dict:
+    """
+    KeyConditionExpression -> {atributo: (operador, [valores])}, com um ou
+    dois atributos. O operador é '=', '<', '<=', '>', '>=', 'BETWEEN' ou
+    'begins_with'; quem chama confere os atributos contra a chave da tabela.
+    """
+    node = _parse_condition(expression, _names_key(names))
+    values = values or {}
+    terms = []
+    while node[0] == 'and':
+        terms.append(node[2])
+        node = node[1]
+    terms.append(node)
+
+    def value_of(operand):
+        if operand[0] != 'value' or operand[1] not in values:
+            raise ValueError(f"KeyConditionExpression inválida: {expression}")
+        return values[operand[1]]
+
+    def path_of(operand):
+        if operand[0] != 'path' or len(operand[1]) != 1:
+            raise ValueError(f"KeyConditionExpression inválida: {expression}")
+        return operand[1][0]
+
+    conditions = {}
+    for term in terms:
+        if term[0] == 'compare' and term[1] != '<>':
+            name, comparison = path_of(term[2]), (term[1], [value_of(term[3])])
+        elif term[0] == 'between':
+            name, comparison = path_of(term[1]), ('BETWEEN', [value_of(term[2]), value_of(term[3])])
+        elif term[0] == 'function' and term[1] == 'begins_with':
+            name, comparison = path_of(term[2][0]), ('begins_with', [value_of(term[2][1])])
+        else:
+            raise ValueError(f"KeyConditionExpression inválida: {expression}")
+        if name in conditions:
+            raise ValueError(f"KeyConditionExpression com {name} repetido: {expression}")
+        conditions[name] = comparison
+
+    if len(conditions) > 2:
+        raise ValueError(f"KeyConditionExpression inválida: {expression}")
+    return conditions
+
+
+def projection(expression: str, names: dict = None) -> tuple:
+    """ProjectionExpression -> caminhos (tuplas), ou () sem projeção."""
+    if not expression:
+        return ()
+    return _parse_projection(expression, _names_key(names))
+
+
+def project(item: dict, paths: tuple) -> dict:
+    """Só os caminhos pedidos, com a mesma estrutura do item."""
+    if not paths:
+        return item
+    result = {}
+    for path in paths:
+        value = get_path(item, path)
+        if value is MISSING:
+            continue
+        target = result
+        source = item
+        for part, following in zip(path, path[1:]):
+            source = source[part]
+            empty = [] if isinstance(following, int) else {}
+            if isinstance(target, dict):
+                target = target.setdefault(part, empty)
+            else:
+                target.append(empty)
+                target = target[-1]
+        if isinstance(target, dict):
+            target[path[-1]] = value
+        else:
+            target.append(value)
+    return result
+
+
+# --- UpdateExpression ----------------------------------------------------------
+
+def _set_value(operand, item: dict, values: dict):
+    kind = operand[0]
+    if kind == 'value':
+        if operand[1] not in values:
+            raise ValueError(f"{operand[1]} não está em ExpressionAttributeValues")
+        return values[operand[1]]
+    if kind == 'path':
+        value = get_path(item, operand[1])
+        if value is MISSING:
+            raise ValueError(f"Atributo inexistente no update: {_format_path(operand[1])}")
+        return value
+    if kind == 'if_not_exists':
+        value = get_path(item, operand[1][1])
+        return _set_value(operand[2], item, values) if value is MISSING else value
+    if kind == 'list_append':
+        first, second = _set_value(operand[1], item, values), _set_value(operand[2], item, values)
+        if not isinstance(first, list) or not isinstance(second, list):
+            raise ValueError("list_append exige duas listas.")
+        return first + second
+
+    _, sign, left, right = operand
+    left, right = _set_value(left, item, values), _set_value(right, item, values)
+    if _kind(left) != 'N' or _kind(right) != 'N':
+        raise ValueError("SET com + ou - exige números.")
+    left, right = Decimal(left), Decimal(right)
+    return NUMBER_CONTEXT.add(left, right) if sign == '+' else NUMBER_CONTEXT.subtract(left, right)
+
+
+def apply_update(item: dict, expression: str, names: dict = None, values: dict = None) -> tuple:
+    """
+    Aplica a UpdateExpression numa cópia de `item` -> (item novo, atributos de
+    topo alterados). Os valores do SET são calculados sobre o item antigo,
+    como no DynamoDB.
+    """
+    clauses = _parse_update(expression, _names_key(names))
+    values = values or {}
+    old = item
+    item = copy.deepcopy(item)
+    touched = []
+
+    for path, operand in clauses.get('SET', ()):
+        set_path(item, path, _set_value(operand, old, values))
+        touched.append(path[0])
+
+    for path in clauses.get('REMOVE', ()):
+        remove_path(item, path)
+        touched.append(path[0])
+
+    for path, operand in clauses.get('ADD', ()):
+        value = _set_value(operand, old, values)
+        current = get_path(item, path)
+        if _kind(value) == 'N':
+            if current is MISSING:
+                current = Decimal(0)
+            elif _kind(current) != 'N':
+                raise ValueError(f"ADD de número em atributo que não é número: {_format_path(path)}")
+            set_path(item, path, NUMBER_CONTEXT.add(Decimal(current), Decimal(value)))
+        elif isinstance(value, (set, frozenset)):
+            if current is MISSING:
+                current = set()
+            elif not isinstance(current, (set, frozenset)):
+                raise ValueError(f"ADD de set em atributo que não é set: {_format_path(path)}")
+            set_path(item, path, set(current) | set(value))
+        else:
+            raise ValueError("ADD aceita só números e sets.")
+        touched.append(path[0])
+
+    for path, operand in clauses.get('DELETE', ()):
+        value = _set_value(operand, old, values)
+        current = get_path(item, path)
+        if not isinstance(value, (set, frozenset)):
+            raise ValueError("DELETE aceita só sets.")
+        if current is not MISSING:
+            remaining = set(current) - set(value)
+            if remaining:
+                set_path(item, path, remaining)
+            else:
+                # Set vazio não existe no DynamoDB: o atributo sai
+                remove_path(item, path)
+        touched.append(path[0])
+
+    return item, list(dict.fromkeys(touched))
@@ -0,0 +1,470 @@
+"""
+Motor SQLite: as mesmas operações do motor DynamoDB, num arquivo local (ou
+em memória), para rodar e perfilar o código dos serviços sem AWS.
+
+Cada tabela do DynamoDB vira uma tabela SQLite com a chave primária
+(hash, range) e o item inteiro no formato tipado do core.codec (JSON), que
+preserva Decimal, sets e binários. Os atributos das chaves dos GSIs (status,
+criado_em, mes_entrega, data_entrega, tipo_item, sabor) são colunas
+próprias, com um índice SQLite por GSI: parcial, como o GSI, que só tem os
+itens com as duas chaves. Strings comparam pelos bytes em UTF-8 nos dois bancos, então
+as ordenações (e o '\\uffff' que fecha intervalos) batem.
+
+O que é emulado: KeyCondition na chave, Filter e Limit (o filtro vem depois
+do Limit, com LastEvaluatedKey/ExclusiveStartKey), Projection, Condition e
+Update expressions (ver storage.expressions), transações tudo-ou-nada com
+CancellationReasons e ClientRequestToken idempotente. Fora disso: o corte
+de 1 MB por página e o Scan paralelo (Segment).
+
+Uma conexão só, serializada por lock: as threads dos repositórios (lotes
+em paralelo) passam uma de cada vez, e o resultado é determinístico.
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+
+from core import metrics
+from core.codec import deserialize_item, serialize_item
+from core.exceptions import ConditionalCheckFailedException, TransactionCanceledException
+from core.keys import INDEX_KEYS, KEY_ATTRIBUTES
+from . import expressions
+from .dynamodb import TRANSACTION_LIMIT
+
+_TOKENS_TABLE = '_transaction_tokens'
+
+
+class TableSchema:
+    """Chave da tabela e (partition key, sort key) de cada GSI."""
+
+    __slots__ = ('hash_key', 'range_key', 'indexes')
+
+    def __init__(self, hash_key: str, range_key: str = None, indexes: dict = None):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes or {}
+
+    def index_attributes(self) -> list:
+        """Atributos que viram colunas (as chaves dos GSIs), sem repetição."""
+        return list(dict.fromkeys(name for keys in self.indexes.values() for name in keys))
+
+
+def table_schemas() -> dict:
+    """As tabelas do stack, pelos nomes das variáveis de ambiente do Lambda."""
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        raise RuntimeError("Configuração de tabela ausente.")
+
+    schemas = {table_name: TableSchema('pk', 'sk', INDEX_KEYS)}
+    if os.environ.get('HISTORY_TABLE_NAME'):
+        schemas[os.environ['HISTORY_TABLE_NAME']] = TableSchema('pedido_id', 'chave')
+    if os.environ.get('ROLLUP_TABLE_NAME'):
+        schemas[os.environ['ROLLUP_TABLE_NAME']] = TableSchema('metrica', 'chave')
+    return schemas
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column(attribute: str) -> str:
+    return _quote(f"a_{attribute}")
+
+
+def _encode(item: dict) -> str:
+    return json.dumps(serialize_item(item), separators=(',', ':'), default=_binary_text)
+
+
+def _binary_text(value) -> str:
+    # Binários vão em base64, como no JSON cru do DynamoDB (o codec lê os dois)
+    return base64.b64encode(value).decode()
+
+
+def _decode(text: str) -> dict:
+    return deserialize_item(json.loads(text))
+
+
+def _public(item: dict) -> dict:
+    """Sem os atributos de layout (KEY_ATTRIBUTES), como o load_item do motor DynamoDB."""
+    for name in KEY_ATTRIBUTES:
+        item.pop(name, None)
+    return item
+
+
+class SQLiteStorage:
+    def __init__(self, path: str, schemas: dict, table_name: str = None):
+        self.schemas = schemas
+        self.table_name = table_name or next(iter(schemas))
+        self._lock = threading.RLock()
+        # Autocommit: as escritas abrem a própria transação (BEGIN IMMEDIATE)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        for table, schema in schemas.items():
+            self._create_table(table, schema)
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {_TOKENS_TABLE} (token TEXT PRIMARY KEY)")
+
+    def _create_table(self, table: str, schema: TableSchema):
+        columns = ''.join(f", {_column(name)} TEXT" for name in schema.index_attributes())
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {_quote(table)} "
+            f"(_hk TEXT NOT NULL, _rk TEXT NOT NULL, item TEXT NOT NULL{columns}, PRIMARY KEY (_hk, _rk)) "
+            f"WITHOUT ROWID"
+        )
+        for index, (hash_attr, range_attr) in schema.indexes.items():
+            hash_col, range_col = _column(hash_attr), _column(range_attr)
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(f'{table}.{index}')} ON {_quote(table)} "
+                f"({hash_col}, {range_col}, _hk, _rk) "
+                f"WHERE {hash_col} IS NOT NULL AND {range_col} IS NOT NULL"
+            )
+
+    # --- Itens ----------------------------------------------------------------
+
+    def get_item(self, table: str, Key: dict, ProjectionExpression: str = None,
+                 ExpressionAttributeNames: dict = None, ConsistentRead: bool = False,
+                 ReturnConsumedCapacity: str = None):
+        schema = self._schema(table)
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT item FROM {_quote(table)} WHERE _hk = ? AND _rk = ?", self._key(schema, Key)
+            ).fetchone()
+        if row is None:
+            return None
+        with metrics.span('deserialization'):
+            item = _decode(row[0])
+        return _public(expressions.project(item, expressions.projection(ProjectionExpression, ExpressionAttributeNames)))
+
+    def put_item(self, table: str, Item: dict, ConditionExpression: str = None,
+                 ExpressionAttributeNames: dict = None, ExpressionAttributeValues: dict = None,
+                 ReturnValues: str = None, ReturnConsumedCapacity: str = None):
+        schema = self._schema(table)
+        key = self._key(schema, Item)
+        check = expressions.condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        with self._transaction():
+            old = self._load(table, key)
+            if check is not None and not check(old or {}):
+                raise ConditionalCheckFailedException("The conditional request failed")
+            self._write(table, schema, key, Item)
+
+    def update_item(self, table: str, Key: dict, UpdateExpression: str = None, ConditionExpression: str = None,
+                    ExpressionAttributeNames: dict = None, ExpressionAttributeValues: dict = None,
+                    ReturnValues: str = 'NONE', ReturnConsumedCapacity: str = None) -> dict:
+        """UpdateItem (cria o item se não existir) -> Attributes pedidos em ReturnValues (ou {})."""
+        schema = self._schema(table)
+        key = self._key(schema, Key)
+        check = expressions.condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        with self._transaction():
+            old = self._load(table, key)
+            if check is not None and not check(old or {}):
+                raise ConditionalCheckFailedException("The conditional request failed")
+            new, touched = self._updated(schema, old, Key, UpdateExpression,
+                                         ExpressionAttributeNames, ExpressionAttributeValues)
+            text = self._write(table, schema, key, new)
+
+        if ReturnValues in (None, 'NONE'):
+            return {}
+        if ReturnValues in ('ALL_OLD', 'UPDATED_OLD'):
+            source = old or {}
+        else:
+            # O item gravado, relido: números voltam como Decimal, como no DynamoDB
+            source = _decode(text)
+        if ReturnValues.startswith('UPDATED'):
+            source = {name: source[name] for name in touched if name in source}
+        return _public(dict(source))
+
+    def delete_item(self, table: str, Key: dict, ConditionExpression: str = None,
+                    ExpressionAttributeNames: dict = None, ExpressionAttributeValues: dict = None,
+                    ReturnValues: str = None, ReturnConsumedCapacity: str = None):
+        schema = self._schema(table)
+        key = self._key(schema, Key)
+        check = expressions.condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        with self._transaction():
+            if check is not None and not check(self._load(table, key) or {}):
+                raise ConditionalCheckFailedException("The conditional request failed")
+            self._db.execute(f"DELETE FROM {_quote(table)} WHERE _hk = ? AND _rk = ?", key)
+
+    # --- Query / Scan -------------------------------------------------------
+
+    def query(self, table: str, **params):
+        """Todas as páginas do Query (seguindo o LastEvaluatedKey, como o motor DynamoDB)."""
+        while True:
+            items, last_key = self.query_page(table, **params)
+            yield from items
+            if not last_key:
+                break
+            params['ExclusiveStartKey'] = last_key
+
+    def query_page(self, table: str, KeyConditionExpression: str, IndexName: str = None,
+                   FilterExpression: str = None, ProjectionExpression: str = None,
+                   ExpressionAttributeNames: dict = None, ExpressionAttributeValues: dict = None,
+                   Limit: int = None, ExclusiveStartKey: dict = None, ScanIndexForward: bool = True,
+                   ConsistentRead: bool = False, ReturnConsumedCapacity: str = None):
+        """Uma página de Query: (itens, LastEvaluatedKey ou None)."""
+        schema = self._schema(table)
+        hash_attr, range_attr = self._index_keys(schema, IndexName)
+        conditions = expressions.key_condition(KeyConditionExpression, ExpressionAttributeNames,
+                                               ExpressionAttributeValues)
+
+        hash_condition = conditions.pop(hash_attr, None)
+        if not hash_condition or hash_condition[0] != '=' or (conditions and range_attr not in conditions):
+            raise ValueError(f"KeyConditionExpression não casa com a chave ({hash_attr}, {range_attr}).")
+
+        hash_col, range_col = self._key_columns(schema, IndexName)
+        where = [f"{hash_col} = ?"]
+        args = [self._key_value(hash_condition[1][0])]
+        if IndexName:
+            where.append(f"{range_col} IS NOT NULL")
+        if conditions:
+            operator, operands = conditions[range_attr]
+            operands = [self._key_value(value) for value in operands]
+            if operator == 'BETWEEN':
+                where.append(f"{range_col} BETWEEN ? AND ?")
+                args.extend(operands)
+            elif operator == 'begins_with':
+                # >= usa o índice; o substr confirma o prefixo
+                where.append(f"{range_col} >= ? AND substr({range_col}, 1, ?) = ?")
+                args.extend([operands[0], len(operands[0]), operands[0]])
+            else:
+                where.append(f"{range_col} {operator} ?")
+                args.extend(operands)
+
+        order = [range_col, '_hk', '_rk'] if IndexName else ['_rk']
+        return self._page(table, schema, IndexName, where, args, order, ScanIndexForward, Limit,
+                          ExclusiveStartKey, FilterExpression, ProjectionExpression,
+                          ExpressionAttributeNames, ExpressionAttributeValues)
+
+    def scan(self, table: str, **params):
+        while True:
+            items, last_key = self.scan_page(table, **params)
+            yield from items
+            if not last_key:
+                break
+            params['ExclusiveStartKey'] = last_key
+
+    def scan_page(self, table: str, IndexName: str = None, FilterExpression: str = None,
+                  ProjectionExpression: str = None, ExpressionAttributeNames: dict = None,
+                  ExpressionAttributeValues: dict = None, Limit: int = None, ExclusiveStartKey: dict = None,
+                  ConsistentRead: bool = False, ReturnConsumedCapacity: str = None):
+        schema = self._schema(table)
+        where, order = [], ['_hk', '_rk']
+        if IndexName:
+            hash_col, range_col = self._key_columns(schema, IndexName)
+            where = [f"{hash_col} IS NOT NULL", f"{range_col} IS NOT NULL"]
+            order = [hash_col, range_col, '_hk', '_rk']
+        return self._page(table, schema, IndexName, where, [], order, True, Limit, ExclusiveStartKey,
+                          FilterExpression, ProjectionExpression, ExpressionAttributeNames,
+                          ExpressionAttributeValues)
+
+    def _page(self, table, schema, index, where, args, order, forward, limit, start_key,
+              filter_expression, projection_expression, names, values):
+        """
+        Lê até `limit` itens na ordem da chave, continuando depois de
+        `start_key`; o filtro e a projeção vêm depois, como no DynamoDB.
+        """
+        where, args = list(where), list(args)
+        if start_key:
+            start = self._start_values(schema, index, start_key, len(order))
+            columns = ', '.join(order)
+            placeholders = ', '.join('?' * len(order))
+            where.append(f"({columns}) {'>' if forward else '<'} ({placeholders})")
+            args.extend(start)
+
+        index_columns = [self._key_columns(schema, index)] if index else []
+        selected = ', '.join(['_hk', '_rk', 'item', *(col for pair in index_columns for col in pair)])
+        direction = '' if forward else ' DESC'
+        sql = (f"SELECT {selected} FROM {_quote(table)}"
+               + (f" WHERE {' AND '.join(where)}" if where else '')
+               + f" ORDER BY {', '.join(col + direction for col in order)}")
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+
+        check = expressions.condition(filter_expression, names, values)
+        paths = expressions.projection(projection_expression, names)
+        with metrics.span('deserialization'):
+            items = [_decode(row[2]) for row in rows]
+        items = [_public(expressions.project(item, paths)) for item in items if check is None or check(item)]
+
+        last_key = None
+        if limit and len(rows) == int(limit):
+            last_key = self._row_key(schema, index, rows[-1])
+        return items, last_key
+
+    # --- Lotes e transações ---------------------------------------------------
+
+    def batch_get(self, table: str, keys: list) -> list:
+        return [item for item in (self.get_item(table, Key=key) for key in keys) if item is not None]
+
+    def batch_write(self, table: str, items: list, max_workers: int = 1) -> list:
+        """Todos os itens numa transação do SQLite: nada fica sem processar."""
+        schema = self._schema(table)
+        with self._transaction():
+            for item in items:
+                self._write(table, schema, self._key(schema, item), item)
+        return []
+
+    def transact_write(self, actions: list, token: str = None):
+        """
+        Todas as condições são avaliadas antes de qualquer escrita; se alguma
+        falhar, nada é gravado e a exceção traz um código por ação.
+        """
+        if len(actions) > TRANSACTION_LIMIT:
+            raise ValueError(f"Transação com mais de {TRANSACTION_LIMIT} ações.")
+
+        with self._transaction():
+            if token and self._db.execute(f"SELECT 1 FROM {_TOKENS_TABLE} WHERE token = ?", (token,)).fetchone():
+                # Mesmo ClientRequestToken: a transação já foi aplicada
+                return
+
+            planned, codes, seen = [], [], set()
+            for action in actions:
+                (operation, params), = action.items()
+                table = params['TableName']
+                schema = self._schema(table)
+                key = self._key(schema, params['Item'] if operation == 'Put' else params['Key'])
+                if (table, key) in seen:
+                    raise ValueError("Transação com mais de uma ação no mesmo item.")
+                seen.add((table, key))
+
+                old = self._load(table, key)
+                check = expressions.condition(params.get('ConditionExpression'),
+                                              params.get('ExpressionAttributeNames'),
+                                              params.get('ExpressionAttributeValues'))
+                passed = check is None or check(old or {})
+                codes.append('None' if passed else 'ConditionalCheckFailed')
+                planned.append((operation, params, table, schema, key, old))
+
+            if 'ConditionalCheckFailed' in codes:
+                raise TransactionCanceledException(
+                    f"Transaction cancelled, please refer cancellation reasons for specific reasons [{', '.join(codes)}]",
+                    codes
+                )
+
+            for operation, params, table, schema, key, old in planned:
+                if operation == 'Put':
+                    self._write(table, schema, key, params['Item'])
+                elif operation == 'Update':
+                    new, _ = self._updated(schema, old, params['Key'], params.get('UpdateExpression'),
+                                           params.get('ExpressionAttributeNames'),
+                                           params.get('ExpressionAttributeValues'))
+                    self._write(table, schema, key, new)
+                elif operation == 'Delete':
+                    self._db.execute(f"DELETE FROM {_quote(table)} WHERE _hk = ? AND _rk = ?", key)
+            if token:
+                self._db.execute(f"INSERT INTO {_TOKENS_TABLE} (token) VALUES (?)", (token,))
+
+    # --- Internos ---------------------------------------------------------------
+
+    def _transaction(self):
+        return _Transaction(self._db, self._lock)
+
+    def _schema(self, table: str) -> TableSchema:
+        schema = self.schemas.get(table)
+        if schema is None:
+            raise ValueError(f"Tabela desconhecida: {table}")
+        return schema
+
+    @staticmethod
+    def _key_value(value) -> str:
+        # As chaves do stack são todas strings (AttributeType.STRING)
+        if not isinstance(value, str) or not value:
+            raise ValueError(f"Valor de chave inválido: {value!r}")
+        return value
+
+    def _key(self, schema: TableSchema, item: dict) -> tuple:
+        if schema.hash_key not in item or (schema.range_key and schema.range_key not in item):
+            raise ValueError(f"A chave exige {schema.hash_key}" + (f" e {schema.range_key}." if schema.range_key else "."))
+        range_value = self._key_value(item[schema.range_key]) if schema.range_key else ''
+        return self._key_value(item[schema.hash_key]), range_value
+
+    @staticmethod
+    def _index_keys(schema: TableSchema, index: str) -> tuple:
+        if not index:
+            return schema.hash_key, schema.range_key
+        if index not in schema.indexes:
+            raise ValueError(f"Índice desconhecido: {index}")
+        return schema.indexes[index]
+
+    def _key_columns(self, schema: TableSchema, index: str) -> tuple:
+        if not index:
+            return '_hk', '_rk'
+        hash_attr, range_attr = self._index_keys(schema, index)
+        return _column(hash_attr), _column(range_attr)
+
+    def _start_values(self, schema: TableSchema, index: str, start_key: dict, size: int) -> list:
+        """ExclusiveStartKey -> valores das colunas de ordenação (os últimos `size`)."""
+        table_key = list(self._key(schema, start_key))
+        if not index:
+            return table_key[-size:]
+        hash_attr, range_attr = self._index_keys(schema, index)
+        return [start_key.get(hash_attr), start_key.get(range_attr), *table_key][-size:]
+
+    def _row_key(self, schema: TableSchema, index: str, row) -> dict:
+        """LastEvaluatedKey de uma linha: chave da tabela (+ chaves do índice)."""
+        key = {schema.hash_key: row[0]}
+        if schema.range_key:
+            key[schema.range_key] = row[1]
+        if index:
+            hash_attr, range_attr = self._index_keys(schema, index)
+            key[hash_attr], key[range_attr] = row[3], row[4]
+        return key
+
+    def _load(self, table: str, key: tuple):
+        row = self._db.execute(f"SELECT item FROM {_quote(table)} WHERE _hk = ? AND _rk = ?", key).fetchone()
+        return _decode(row[0]) if row else None
+
+    def _write(self, table: str, schema: TableSchema, key: tuple, item: dict) -> str:
+        text = _encode(item)
+        attributes = schema.index_attributes()
+        # Só strings entram nos índices (as chaves dos GSIs são STRING)
+        index_values = [item.get(name) if isinstance(item.get(name), str) else None for name in attributes]
+        columns = ''.join(f", {_column(name)}" for name in attributes)
+        placeholders = ', ?' * len(attributes)
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {_quote(table)} (_hk, _rk, item{columns}) VALUES (?, ?, ?{placeholders})",
+            [*key, text, *index_values]
+        )
+        return text
+
+    @staticmethod
+    def _updated(schema: TableSchema, old: dict, key: dict, expression: str, names: dict, values: dict) -> tuple:
+        """Item depois da UpdateExpression (ou só a chave, se ele não existia) e atributos alterados."""
+        key_names = [name for name in (schema.hash_key, schema.range_key) if name]
+        base = old if old is not None else {name: key[name] for name in key_names}
+        if not expression:
+            return base, []
+        new, touched = expressions.apply_update(base, expression, names, values)
+        for name in key_names:
+            if name in touched:
+                raise ValueError(f"O atributo {name} faz parte da chave e não pode ser alterado.")
+        return new, touched
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (ou ROLLBACK na exceção), com o lock da conexão."""
+
+    def __init__(self, db, lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.db.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.lock.release()
+        return False
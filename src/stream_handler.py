@@ -1,101 +1,144 @@
-import json
 import os
 import boto3
-from datetime import datetime
-from decimal import Decimal
-from boto3.dynamodb.types import TypeDeserializer
+
+from analytics import facts
+from analytics.rollups import RollupWriter, rollup_deltas
+from analytics.writers import get_writer
 
 # Configuração
 s3_client = boto3.client('s3')
 BUCKET_NAME = os.environ.get('ANALYTICS_BUCKET_NAME')
-deserializer = TypeDeserializer()
+
+# Agregados diários (dia x sabor) mantidos incrementalmente no DynamoDB
+ROLLUP_TABLE_NAME = os.environ.get('ROLLUP_TABLE_NAME')
+rollup_writer = RollupWriter(boto3.client('dynamodb'), ROLLUP_TABLE_NAME) if ROLLUP_TABLE_NAME else None
+
+# ndjson (padrão) ou parquet (colunar, comprimido, schema tipado)
+ANALYTICS_FORMAT = os.environ.get('ANALYTICS_FORMAT', 'ndjson')
+# Teto de linhas por arquivo dentro de uma mesma partição
+MAX_ROWS_PER_FILE = int(os.environ.get('MAX_ROWS_PER_FILE', '100000'))
+writer = get_writer(ANALYTICS_FORMAT)
 
 
 def handler(event, context):
     """
     Escuta o DynamoDB Stream e projeta os dados no S3 (Data Lake).
+    Só grava o delta de fatos de cada registro (UPSERT/ESTORNO), e ignora
+    MODIFYs que não mexem em nada que as linhas de fato usam.
+
+    Falhas parciais são reportadas via batchItemFailures: o Lambda
+    retoma o shard a partir do registro que falhou, e os nomes dos arquivos
+    (derivados dos sequence numbers) fazem a reexecução sobrescrever o mesmo
+    objeto em vez de duplicar fatos.
     """
-    records_to_save = []
+    processed = []
+    failed_sequence = None
 
+    # 1. Monta os pedidos do lote inteiro em colunas
+    batch = facts.FactBatch()
+    changes = []
     for record in event['Records']:
-        # Só nos interessa inserções ou atualizações (INSERT/MODIFY)
-        if record['eventName'] == 'REMOVE':
-            continue
-
-        # 1. Deserializar o formato estranho do Dynamo ({'S': 'valor'}) para Python normal
-        dynamo_image = record['dynamodb']['NewImage']
-        item = {k: deserializer.deserialize(v) for k, v in dynamo_image.items()}
-
-        # 2. Filtrar: Só queremos PEDIDOS para o Analytics de Vendas
-        if item.get('tipo_item') != 'PEDIDO':
-            continue
-
-        # 3. TRANSFORMAÇÃO (O Segredo do OLAP)
-        # Vamos "explodir" o pedido. Se tem 3 cookies, viram 3 linhas de venda.
-
-        data_criacao = item.get('criado_em', datetime.now().isoformat())
-        # Extrai ano/mes/dia para particionar no S3 (Melhora performance e custo)
-        dt_obj = datetime.fromisoformat(data_criacao)
-        partition_path = f"year={dt_obj.year}/month={dt_obj.month:02d}/day={dt_obj.day:02d}"
-
-        # Dados comuns a todos os itens do pedido (Dimensões)
-        base_record = {
-            "pedido_id": item['id'],
-            "data_venda": data_criacao,
-            "status": item.get('status'),
-            "cliente_nome": item.get('cliente_nome'),
-            "forma_pagamento": item.get('forma_pagamento'),
-            "motoboy_custo_rateado": float(item.get('custo_entrega_rateado', 0) or 0)
-        }
-
-        # Achata os itens (Fatos)
-        itens = item.get('itens', [])
-        qtd_itens_total = sum(int(i.get('qtd', 0)) for i in itens)
-
-        for line_item in itens:
-            # Clona o registro base
-            fact_row = base_record.copy()
-
-            # Adiciona dados específicos do produto
-            fact_row['produto_id'] = line_item.get('cookie_id')
-            fact_row['sabor'] = line_item.get('sabor')
-            fact_row['qtd'] = int(line_item.get('qtd', 0))
-
-            # Finanças (Importante converter Decimal pra float pro JSON final)
-            preco_venda = float(line_item.get('preco_venda_unitario', 0))
-            custo_prod = float(line_item.get('custo_producao_unitario', 0))
-
-            fact_row['receita_item'] = preco_venda * fact_row['qtd']
-            fact_row['custo_item'] = custo_prod * fact_row['qtd']
-
-            # Custo Logístico por ITEM (Rateio do Rateio)
-            # Se o pedido tem 5 itens e o frete foi 5 reais, é 1 real por item.
-            if qtd_itens_total > 0:
-                fact_row['custo_logistico_item'] = base_record['motoboy_custo_rateado'] / qtd_itens_total
-            else:
-                fact_row['custo_logistico_item'] = 0
-
-            # LUCRO FINAL (A métrica de ouro)
-            fact_row['lucro_liquido'] = fact_row['receita_item'] - fact_row['custo_item'] - fact_row[
-                'custo_logistico_item']
-
-            # Adiciona na lista para salvar
-            # Formato JSON Line (um JSON por linha)
-            records_to_save.append({
-                "path": partition_path,
-                "data": json.dumps(fact_row, default=str)
-            })
+        change = record['dynamodb']
+        try:
+            changes.append((change.get('SequenceNumber'), *_add_change(batch, change)))
+        except Exception as e:
+            # Registros do stream são ordenados: paramos aqui e o Lambda
+            # reenvia a partir deste (os anteriores já estão no lote a salvar).
+            print(f"Erro no registro {change.get('SequenceNumber')}: {e}")
+            failed_sequence = change.get('SequenceNumber')
+            break
+
+    # 2. Finanças de todas as linhas do lote numa passada, e o delta de
+    # fatos de cada registro (chave: pedido_id + produto_id)
+    exploded = batch.explode()
+    for sequence, old_index, new_index in changes:
+        try:
+            processed.append((sequence, _deltas(exploded, old_index, new_index, sequence)))
+        except Exception as e:
+            print(f"Erro no registro {sequence}: {e}")
+            failed_sequence = sequence
+            break
+
+    # Agregados diários: se algum registro falhar, ele e os seguintes voltam
+    # no retry (os que já somaram são pulados pelo marcador de idempotência).
+    if rollup_writer:
+        failed_index = _apply_rollups(processed)
+        if failed_index is not None:
+            failed_sequence = processed[failed_index][0]
+            processed = processed[:failed_index]
+
+    records_to_save = [fact for _, rows in processed for fact in rows]
 
     # 4. Salvar no S3 (Batch Write)
     if records_to_save:
-        save_to_s3(records_to_save)
+        try:
+            save_to_s3(records_to_save)
+        except Exception as e:
+            # Reprocessa o lote inteiro: como ele recomeça no mesmo registro,
+            # as chaves geradas são as mesmas e os arquivos são sobrescritos.
+            print(f"Erro ao gravar no S3: {e}")
+            failed_sequence = event['Records'][0]['dynamodb'].get('SequenceNumber')
+
+    print(f"Processados {len(records_to_save)} itens de venda.")
+    failures = [{"itemIdentifier": failed_sequence}] if failed_sequence else []
+    return {"batchItemFailures": failures}
+
+
+def _add_change(batch, change: dict):
+    """Põe as imagens do registro no lote: (índice da antiga, da nova), None quando não entra."""
+    old_image = change.get('OldImage') or {}
+    new_image = change.get('NewImage') or {}
+
+    # Descarta (sem deserializar) o que não afeta os fatos de PEDIDO
+    if not _is_order(old_image) and not _is_order(new_image):
+        return None, None
+    # Cópia da migração v1 -> v2: venda já contabilizada (o filtro do event
+    # source já descarta; aqui cobre quem invoca o handler direto)
+    if not old_image and 'migrado' in new_image:
+        return None, None
+    if not facts.fact_inputs_changed(old_image, new_image):
+        return None, None
+
+    # Lê direto do formato do Dynamo ({'S': 'valor'}), sem deserializar a imagem inteira
+    old_index = batch.add_image(old_image) if _is_order(old_image) else None
+    new_index = batch.add_image(new_image) if _is_order(new_image) else None
+    return old_index, new_index
+
+
+def _deltas(exploded: list, old_index, new_index, sequence) -> list:
+    old_rows = exploded[old_index] if old_index is not None else {}
+    new_rows = exploded[new_index] if new_index is not None else {}
+    return [
+        {"path": facts.partition_for(fact_row['data_venda']), "row": fact_row}
+        for fact_row in facts.diff_rows(old_rows, new_rows, sequence)
+    ]
+
+
+def _apply_rollups(processed: list):
+    """
+    Soma os deltas do lote na tabela de rollups.
+    Retorna o índice do primeiro registro que falhou, ou None.
+    """
+    pending = []
+    for index, (sequence, rows) in enumerate(processed):
+        deltas = rollup_deltas([fact['row'] for fact in rows])
+        if deltas:
+            pending.append((index, sequence, deltas))
+
+    if not pending:
+        return None
+    return rollup_writer.apply(pending)
+
 
-    return {"message": f"Processados {len(records_to_save)} itens de venda."}
+def _is_order(image: dict) -> bool:
+    return image.get('tipo_item', {}).get('S') == 'PEDIDO'
 
 
 def save_to_s3(records):
     """
     Agrupa por partição e salva arquivos no S3.
+    Cada partição do lote vira um arquivo (ou mais, se passar de
+    MAX_ROWS_PER_FILE linhas), no formato configurado em ANALYTICS_FORMAT.
     """
     # Agrupamento simples para não criar 1000 arquivos pequenos
     grouped = {}
@@ -103,19 +146,24 @@ def save_to_s3(records):
         path = rec['path']
         if path not in grouped:
             grouped[path] = []
-        grouped[path].append(rec['data'])
+        grouped[path].append(rec['row'])
 
     for path, rows in grouped.items():
-        # Nome do arquivo único para não sobrescrever
-        filename = f"sales_data/{path}/vendas_{datetime.now().timestamp()}.json"
-
-        # Junta tudo com quebra de linha (NDJSON)
-        body_content = "\n".join(rows)
-
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=filename,
-            Body=body_content,
-            ContentType='application/json'
-        )
-        print(f"Salvo no S3: {filename}")
\ No newline at end of file
+        # Chave determinística: primeiro sequence number da partição no lote.
+        # Um retry que recomeça no mesmo registro grava exatamente o mesmo
+        # objeto (sobrescrita), nunca um arquivo novo com fatos repetidos.
+        first_seq = rows[0]['evento_seq']
+        last_seq = rows[-1]['evento_seq']
+
+        for part, start in enumerate(range(0, len(rows), MAX_ROWS_PER_FILE)):
+            suffix = f"_{part}" if part else ""
+            filename = f"sales_data/{path}/vendas_{first_seq}{suffix}.{writer.extension}"
+
+            s3_client.put_object(
+                Bucket=BUCKET_NAME,
+                Key=filename,
+                Body=writer.serialize(rows[start:start + MAX_ROWS_PER_FILE]),
+                ContentType=writer.content_type,
+                Metadata={'seq-inicio': str(first_seq), 'seq-fim': str(last_seq)}
+            )
+            print(f"Salvo no S3: {filename}")
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# O código da Lambda (src/) importa seus módulos pelo nome de topo
+# (ex: "from core.database import ..."), como no runtime da AWS.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.fixture
+def sqlite_storage(monkeypatch):
+    """
+    Fábrica de SQLiteStorage em memória no lugar do DynamoDB:
+    sqlite_storage(TABLE) ou sqlite_storage(TABLE, HISTORY).
+
+    A tabela principal tem o layout v2 (pk/sk + GSIs); a de histórico, se
+    informada, vira HISTORY_TABLE_NAME. Os repositórios criados depois
+    recebem esse storage em base_repository.get_storage.
+    """
+    from core.keys import INDEX_KEYS
+    from repositories import base_repository
+    from storage.sqlite import SQLiteStorage, TableSchema
+
+    def create(table: str, history: str = None):
+        schemas = {table: TableSchema('pk', 'sk', INDEX_KEYS)}
+        if history:
+            schemas[history] = TableSchema('pedido_id', 'chave')
+            monkeypatch.setenv('HISTORY_TABLE_NAME', history)
+        storage = SQLiteStorage(':memory:', schemas, table_name=table)
+        monkeypatch.setattr(base_repository, 'get_storage', lambda: storage)
+        return storage
+
+    return create
@@ -0,0 +1,60 @@
+from core import cache as cache_module
+from core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    cache = TTLCache(ttl_seconds=60)
+
+    cache.set('cookie:ck_1', {'id': 'ck_1'})
+    clock.now += 59
+    assert cache.get('cookie:ck_1') == {'id': 'ck_1'}
+
+    clock.now += 2
+    assert cache.get('cookie:ck_1') is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'b' passa a ser a usada há mais tempo
+
+    cache.set('c', 3)
+
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+
+def test_version_is_checked_once_per_request_and_new_version_clears():
+    versions = iter([1, 1, 2])
+    calls = []
+
+    def load_version():
+        calls.append(1)
+        return next(versions)
+
+    cache = TTLCache()
+    cache.begin_request()
+    cache.sync_version(load_version)
+    cache.set('list_active', ['ck_1'])
+    cache.sync_version(load_version)
+    assert (len(calls), cache.version) == (1, 1)
+
+    cache.begin_request()
+    cache.sync_version(load_version)
+    assert cache.get('list_active') == ['ck_1']
+
+    # Outro container publicou uma versão nova
+    cache.begin_request()
+    cache.sync_version(load_version)
+    assert (cache.version, cache.get('list_active'), len(calls)) == (2, None, 3)
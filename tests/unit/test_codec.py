@@ -0,0 +1,53 @@
+import json
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+from core.codec import deserialize_item, dumps, serialize_item, to_item
+from models import PedidoModel, ItemPedidoSnapshot
+
+
+def test_to_item_keeps_decimals_and_enum_values():
+    item = ItemPedidoSnapshot(cookie_id='k1', sabor='Oreo', qtd=3, preco_venda_unitario=Decimal('10.10'),
+                              custo_producao_unitario=Decimal('4'), subtotal_venda=Decimal('30.30'))
+    pedido = PedidoModel(id='ord_1', cliente_nome='Ana', itens=[item], valor_total_venda=Decimal('30.30'),
+                         data_entrega='2025-01-10')
+
+    result = to_item(pedido)
+
+    assert result['valor_total_venda'] == Decimal('30.30')
+    assert result['itens'][0]['subtotal_venda'] == Decimal('30.30')
+    assert type(result['status']) is str and result['status'] == 'RECEBIDO'
+
+
+def test_dumps_keeps_money_as_exact_strings():
+    # Contrato da API: Decimal sai como o antigo json.dumps(default=str)
+    body = {'inteiro': Decimal('12'), 'centavos': Decimal('0.10'), 'soma': Decimal('0.1') + Decimal('0.2'),
+            'longo': Decimal('12345678901234.5678'), 'lista': [Decimal('-3.50')], 'preco': 12.5}
+
+    assert dumps(body) == ('{"inteiro": "12", "centavos": "0.10", "soma": "0.3", '
+                           '"longo": "12345678901234.5678", "lista": ["-3.50"], "preco": 12.5}')
+    assert dumps(body) == json.dumps(body, default=str)
+
+
+def test_item_serialization_matches_boto3():
+    item = {'id': 'ord_1', 'qtd': 3, 'total': Decimal('30.30'), 'ativo': True, 'nada': None,
+            'itens': [{'sabor': 'Oreo', 'preco': Decimal('10.10')}], 'tags': {'a', 'b'}, 'bin': b'x'}
+
+    encoded = serialize_item(item)
+    boto3_encoded = {k: TypeSerializer().serialize(v) for k, v in item.items()}
+
+    assert {k: v for k, v in encoded.items() if k != 'tags'} == {k: v for k, v in boto3_encoded.items() if k != 'tags'}
+    assert sorted(encoded['tags']['SS']) == ['a', 'b']
+    assert deserialize_item(encoded) == {**item, 'qtd': Decimal('3')}
+
+
+def test_float_is_rejected():
+    with pytest.raises(TypeError):
+        serialize_item({'preco': 1.5})
+
+
+def test_pedido_requires_iso_delivery_date():
+    with pytest.raises(ValueError):
+        PedidoModel(cliente_nome='Ana', itens=[], valor_total_venda=Decimal('0'), data_entrega='10/02/2025')
@@ -3,13 +3,89 @@ import aws_cdk.assertions as assertions
 
 from cookie_admin_serverless.cookie_admin_serverless_stack import CookieAdminServerlessStack
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in cookie_admin_serverless/cookie_admin_serverless_stack.py
-def test_sqs_queue_created():
-    app = core.App()
-    stack = CookieAdminServerlessStack(app, "cookie-admin-serverless")
-    template = assertions.Template.from_stack(stack)
-
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+
+def _template(**context):
+    app = core.App(context=context)
+    stack = CookieAdminServerlessStack(app, "cookie-admin-serverless", environment_tag="dev")
+    return assertions.Template.from_stack(stack)
+
+
+def test_status_index_created():
+    template = _template()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "IndexName": "StatusIndex",
+                "KeySchema": [
+                    {"AttributeName": "status", "KeyType": "HASH"},
+                    {"AttributeName": "criado_em", "KeyType": "RANGE"}
+                ]
+            })
+        ])
+    })
+
+
+def test_order_history_table_created():
+    template = _template()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [
+            {"AttributeName": "pedido_id", "KeyType": "HASH"},
+            {"AttributeName": "chave", "KeyType": "RANGE"}
+        ]
+    })
+
+
+def test_key_schema_v2_indexes():
+    template = _template()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [
+            {"AttributeName": "pk", "KeyType": "HASH"},
+            {"AttributeName": "sk", "KeyType": "RANGE"}
+        ],
+        "GlobalSecondaryIndexes": assertions.Match.array_with([
+            assertions.Match.object_like({"IndexName": name})
+            for name in ("StatusIndex", "DeliveryIndex", "FlavorIndex")
+        ])
+    })
+
+
+def test_stream_skips_migration_inserts():
+    template = _template()
+
+    pattern = '{"dynamodb":{"NewImage":{"tipo_item":{"S":["PEDIDO"]},"migrado":{"BOOL":[{"exists":false}]}}}}'
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "FilterCriteria": {"Filters": assertions.Match.array_with([{"Pattern": pattern}])}
+    })
+
+
+def _logical_id(template, resource_type, prefix):
+    return next(name for name in template.find_resources(resource_type) if name.startswith(prefix))
+
+
+def test_stream_handler_reads_rollup_markers():
+    template = _template()
+    rollup_table = _logical_id(template, "AWS::DynamoDB::Table", "SalesRollupTable")
+    stream_role = _logical_id(template, "AWS::IAM::Role", "StreamHandler")
+
+    policies = template.find_resources("AWS::IAM::Policy", {
+        "Properties": {"Roles": [{"Ref": stream_role}]}
+    })
+    statements = [s for p in policies.values() for s in p["Properties"]["PolicyDocument"]["Statement"]]
+    rollup_arn = {"Fn::GetAtt": [rollup_table, "Arn"]}
+    rollup_actions = {
+        action
+        for s in statements if rollup_arn in (s["Resource"] if isinstance(s["Resource"], list) else [s["Resource"]])
+        for action in (s["Action"] if isinstance(s["Action"], list) else [s["Action"]])
+    }
+    assert {"dynamodb:BatchGetItem", "dynamodb:BatchWriteItem"} <= rollup_actions
+
+
+def test_numpy_layer_reaches_the_stream_handler():
+    layer = "arn:aws:lambda:us-east-1:123456789012:layer:numpy:1"
+    template = _template(numpy_layer_arn=layer)
+
+    for name in ("CookieHandler-dev", "StreamHandler-dev"):
+        template.has_resource_properties("AWS::Lambda::Function", {"FunctionName": name, "Layers": [layer]})
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+
+from core.exceptions import InfrastructureException
+from storage import dynamodb
+from storage.dynamodb import DynamoDBStorage
+
+
+def _error(code: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'BatchWriteItem')
+
+
+class FakeClient:
+    """Responde cada chamada com o próximo item de `responses` (exceção é lançada)."""
+
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def _next(self, **kwargs):
+        self.requests.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    batch_write_item = _next
+    batch_get_item = _next
+
+
+def _storage(responses):
+    return DynamoDBStorage(SimpleNamespace(table_name='T', client=FakeClient(responses)))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(dynamodb.time, 'sleep', lambda seconds: None)
+
+
+def test_batch_write_retries_throttling_and_raises_other_errors():
+    storage = _storage([_error('ProvisionedThroughputExceededException'), {}])
+    assert storage.batch_write('T', [{'id': 'a'}]) == []
+    assert len(storage.client.requests) == 2
+
+    # Erro de validação não é "não gravado": é bug, e sobe
+    storage = _storage([_error('ValidationException')])
+    with pytest.raises(ClientError):
+        storage.batch_write('T', [{'id': 'a'}])
+
+    storage = _storage([_error('ThrottlingException')] * dynamodb.BATCH_MAX_ATTEMPTS)
+    assert storage.batch_write('T', [{'id': 'a'}, {'id': 'b'}]) == [{'id': 'a'}, {'id': 'b'}]
+
+
+def test_batch_get_retries_unprocessed_keys():
+    unprocessed = {'T': {'Keys': [{'id': {'S': 'b'}}]}}
+    storage = _storage([
+        {'Responses': {'T': [{'id': {'S': 'a'}}]}, 'UnprocessedKeys': unprocessed},
+        {'Responses': {'T': [{'id': {'S': 'b'}}]}}
+    ])
+
+    assert storage.batch_get('T', [{'id': 'a'}, {'id': 'b'}]) == [{'id': 'a'}, {'id': 'b'}]
+    assert storage.client.requests[1] == {'RequestItems': unprocessed}
+
+    storage = _storage([{'UnprocessedKeys': unprocessed}] * dynamodb.BATCH_MAX_ATTEMPTS)
+    with pytest.raises(InfrastructureException):
+        storage.batch_get('T', [{'id': 'b'}])
@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from analytics import facts
+
+
+def _order(pedido_id='ord_1', frete='10', linhas=(('k1', 2, '12.50', '4.35'), ('k2', 1, '7', '2'))):
+    return {
+        'id': pedido_id,
+        'tipo_item': 'PEDIDO',
+        'status': 'RECEBIDO',
+        'criado_em': '2025-01-10T10:00:00',
+        'cliente_nome': 'Ana',
+        'custo_entrega_rateado': Decimal(frete),
+        'itens': [
+            {'cookie_id': cookie_id, 'sabor': cookie_id.upper(), 'qtd': qtd,
+             'preco_venda_unitario': Decimal(preco), 'custo_producao_unitario': Decimal(custo)}
+            for cookie_id, qtd, preco, custo in linhas
+        ]
+    }
+
+
+def _image(item):
+    def typed(value):
+        if isinstance(value, str):
+            return {'S': value}
+        return {'N': str(value)}
+
+    image = {k: typed(v) for k, v in item.items() if k != 'itens'}
+    image['itens'] = {'L': [{'M': {k: typed(v) for k, v in line.items()}} for line in item['itens']]}
+    return image
+
+
+def test_finance_is_exact_with_half_even_logistics_split():
+    rows = facts.explode_order(_order())
+
+    assert rows['k1']['receita_item'] == Decimal('25.00')
+    assert rows['k1']['custo_item'] == Decimal('8.70')
+    # 10 / 3 itens = 3.33333... -> 3.3333 por item, na escala do lake
+    assert rows['k1']['custo_logistico_item'] == Decimal('3.3333')
+    assert rows['k1']['lucro_liquido'] == Decimal('12.9667')
+    assert rows['k2']['lucro_liquido'] == Decimal('1.6667')
+    assert rows['k1']['motoboy_custo_rateado'] == Decimal('10')
+
+
+def test_image_and_item_paths_agree():
+    item = _order()
+    batch = facts.FactBatch()
+    from_item = batch.add_item(item)
+    from_image = batch.add_image(_image(item))
+
+    exploded = batch.explode()
+    assert exploded[from_item] == exploded[from_image]
+
+
+def test_pure_python_fallback_matches_numpy(monkeypatch):
+    orders = [_order(f'ord_{i}', frete=f'{i}.05', linhas=(('k1', i % 4, '3.3', '1.15'), ('k2', 3, '0.0001', '0')))
+              for i in range(20)]
+
+    def explode():
+        batch = facts.FactBatch()
+        for order in orders:
+            batch.add_item(order)
+        return batch.explode()
+
+    vectorized = explode()
+    monkeypatch.setattr(facts, 'np', None)
+    assert explode() == vectorized
+
+
+def test_diff_facts_reverses_previous_rows():
+    old = _order()
+    new = _order(frete='6')
+    deltas = facts.diff_facts(old, new, '101')
+
+    estornos = [row for row in deltas if row['operacao'] == facts.ESTORNO]
+    assert [row['custo_logistico_item'] for row in estornos] == [Decimal('-3.3333'), Decimal('-3.3333')]
+    # Frete por item: 3.3333 -> 2, nas duas linhas
+    assert sum(row['custo_logistico_item'] for row in deltas) == Decimal('-2.6666')
+
+
+def test_partition_from_iso_text():
+    assert facts.partition_for('2025-01-10T10:00:00') == 'year=2025/month=01/day=10'
+    assert facts.partition_for('20250210') == 'year=2025/month=02/day=10'
@@ -0,0 +1,46 @@
+import pytest
+
+from core.exceptions import BusinessRuleException
+from core.keys import item_key
+from repositories.catalog_repository import CatalogRepository, flavor_key
+
+TABLE = 'CookiesTable-test'
+
+
+@pytest.fixture
+def repo(sqlite_storage):
+    sqlite_storage(TABLE)
+    return CatalogRepository()
+
+
+def _cookie(cookie_id, sabor):
+    return {'id': cookie_id, 'tipo_item': 'COOKIE', 'sabor': sabor, 'status': 'ATIVO'}
+
+
+def _reservation(repo, sabor):
+    return repo._get_item(Key=item_key('SABOR_RESERVA', flavor_key(sabor)))
+
+
+def test_create_reserves_the_normalized_flavor(repo):
+    repo.create(_cookie('ck_1', 'Red Velvet'))
+
+    with pytest.raises(BusinessRuleException):
+        repo.create(_cookie('ck_2', '  red   VELVET '))
+
+    assert _reservation(repo, 'red velvet')['cookie_id'] == 'ck_1'
+    assert repo.get_by_id('ck_2') is None
+
+
+def test_rename_moves_the_reservation_and_rejects_taken_flavors(repo):
+    repo.create(_cookie('ck_1', 'Red Velvet'))
+    repo.create(_cookie('ck_2', 'Chocolate'))
+
+    with pytest.raises(BusinessRuleException):
+        repo.update('ck_2', {'sabor': 'RED VELVET'}, sabor_atual='Chocolate')
+    assert repo.get_by_id('ck_2')['sabor'] == 'Chocolate'
+
+    repo.update('ck_1', {'sabor': 'Pistache'}, sabor_atual='Red Velvet')
+
+    assert _reservation(repo, 'Red Velvet') is None
+    assert _reservation(repo, 'Pistache')['cookie_id'] == 'ck_1'
+    repo.create(_cookie('ck_3', 'Red Velvet'))  # sabor antigo ficou livre
@@ -0,0 +1,28 @@
+import base64
+import gzip
+
+from core.http_cache import accepted_encodings, compress_response, etag_matches, make_etag
+
+
+def test_etag_matches_ignores_encoding_suffix_and_weak_prefix():
+    etag = make_etag('catalogo', 7)
+
+    assert etag_matches({'if-none-match': etag}, etag)
+    assert etag_matches({'if-none-match': f'"x", W/{etag[:-1]}-gzip"'}, etag)
+    assert not etag_matches({'if-none-match': make_etag('catalogo', 6)}, etag)
+    assert not etag_matches({}, etag)
+
+
+def test_gzip_only_when_accepted_and_large_enough():
+    body = '[' + ','.join(['{"sabor": "Red Velvet"}'] * 100) + ']'
+
+    response = compress_response({'accept-encoding': 'gzip, br;q=0'},
+                                 {'statusCode': 200, 'headers': {'ETag': '"v1-x"'}, 'body': body})
+    assert response['isBase64Encoded'] is True
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    assert response['headers']['ETag'] == '"v1-x-gzip"'
+    assert gzip.decompress(base64.b64decode(response['body'])).decode() == body
+
+    small = compress_response({'accept-encoding': 'gzip'}, {'statusCode': 200, 'headers': {}, 'body': '[]'})
+    assert 'Content-Encoding' not in small['headers']
+    assert accepted_encodings({'accept-encoding': 'identity;q=1, gzip;q=0'}) == {'identity'}
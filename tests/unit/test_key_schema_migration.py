@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from core.codec import deserialize_item, serialize_item
+from core.keys import item_key, key_id
+from migrations.key_schema_v2 import KeySchemaMigration, migrate_item
+
+
+def test_order_history_moves_to_records_with_stable_keys():
+    order = {'id': 'ord_1', 'tipo_item': 'PEDIDO', 'status': 'EXTRAVIADO', 'criado_em': '2025-01-01T09:00:00',
+             'historico': [
+                 {'status_anterior': 'RECEBIDO', 'novo_status': 'EM_ROTA', 'data_alteracao': '2025-01-01T10:00:00'},
+                 {'status_anterior': 'EM_ROTA', 'novo_status': 'EXTRAVIADO', 'data': '2025-01-01T11:00:00'},
+             ]}
+
+    item, records, reservation = migrate_item(order)
+
+    assert 'historico' not in item and 'historico' in order
+    assert (item['pk'], item['sk']) == ('PEDIDO#ord_1', 'PEDIDO')
+    assert item['migrado'] is True  # o stream descarta o INSERT da cópia
+    assert [r['data_alteracao'] for r in records] == ['2025-01-01T10:00:00', '2025-01-01T11:00:00']
+    assert records == migrate_item(order)[1]  # reexecução grava as mesmas chaves
+    assert reservation is None
+
+
+def test_cookie_gets_flavor_reservation_and_junk_is_skipped():
+    item, _, reservation = migrate_item({'id': 'ck_1', 'tipo_item': 'COOKIE', 'sabor': 'Red  Velvet'})
+
+    assert key_id(item_key('COOKIE', 'ck_1')) == 'ck_1'
+    assert (reservation['pk'], reservation['cookie_id']) == ('SABOR#red velvet', 'ck_1')
+    assert migrate_item({'id': 'sem_tipo'}) == (None, [], None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import boto3
+    from moto import mock_aws
+
+    for name, value in (('AWS_ACCESS_KEY_ID', 'test'), ('AWS_SECRET_ACCESS_KEY', 'test'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        client = boto3.client('dynamodb')
+        client.create_table(TableName='v1', BillingMode='PAY_PER_REQUEST',
+                            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}])
+        client.create_table(TableName='v2', BillingMode='PAY_PER_REQUEST',
+                            KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'},
+                                       {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+                            AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'},
+                                                  {'AttributeName': 'sk', 'AttributeType': 'S'}])
+        for i in range(5):
+            client.put_item(TableName='v1', Item=serialize_item(
+                {'id': f'ord_{i}', 'tipo_item': 'PEDIDO', 'status': 'RECEBIDO'}))
+        yield client
+
+
+def _v2_orders(client) -> dict:
+    return {item['id']: item for item in map(deserialize_item, client.scan(TableName='v2')['Items'])}
+
+
+def test_interrupted_run_resumes_from_state_file(client, tmp_path):
+    state_path = str(tmp_path / 'estado.json')
+    scan = client.scan
+    calls = []
+
+    def interrupted_scan(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return scan(**kwargs)
+
+    client.scan = interrupted_scan
+    with pytest.raises(KeyboardInterrupt):
+        KeySchemaMigration(client, 'v1', 'v2', state_path=state_path, segments=1, page_size=2).run()
+
+    with open(state_path) as f:
+        progress = json.load(f)['segmentos']['0']
+    assert progress['itens'] == 2 and progress['chave'] and not progress['concluido']
+
+    totals = KeySchemaMigration(client, 'v1', 'v2', state_path=state_path, segments=1, page_size=2).run()
+    # A retomada parte da chave salva: só a primeira página veio antes da interrupção
+    assert calls[2]['ExclusiveStartKey'] == progress['chave']
+    assert (totals['concluido'], totals['itens'], totals['existentes']) == (True, 5, 0)
+    assert sorted(_v2_orders(client)) == [f'ord_{i}' for i in range(5)]
+
+
+def test_copy_never_overwrites_what_the_api_already_wrote(client, tmp_path):
+    # Alterado pela API depois do deploy, antes da cópia chegar nele
+    client.put_item(TableName='v2', Item=serialize_item(
+        {**item_key('PEDIDO', 'ord_3'), 'id': 'ord_3', 'tipo_item': 'PEDIDO', 'status': 'EM_ROTA'}))
+
+    totals = KeySchemaMigration(client, 'v1', 'v2', state_path=str(tmp_path / 'estado.json'), segments=2).run()
+
+    orders = _v2_orders(client)
+    assert orders['ord_3']['status'] == 'EM_ROTA' and 'migrado' not in orders['ord_3']
+    assert (totals['itens'], totals['existentes']) == (4, 1)
@@ -0,0 +1,106 @@
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from analytics import compaction, query
+from analytics.lake import LocalSource, day_prefix
+from analytics.writers import NdjsonWriter
+
+DAY = date(2025, 1, 10)
+NOW = datetime(2025, 1, 20, tzinfo=timezone.utc)
+
+
+def _row(i):
+    return {'pedido_id': f'ord_{i}', 'produto_id': 'k1', 'sabor': 'Red Velvet', 'status': 'CONCLUIDO',
+            'data_venda': '2025-01-10T10:00:00', 'qtd': 1, 'receita_item': 10.0, 'custo_item': 4.0,
+            'custo_logistico_item': 1.0, 'lucro_liquido': 5.0, 'sinal': 1}
+
+
+def _lake(tmp_path, files=20, age=timedelta(days=5)):
+    source = LocalSource(str(tmp_path))
+    for i in range(files):
+        key = f"{day_prefix(DAY)}vendas_{100 + i}.json"
+        source.put_bytes(key, NdjsonWriter().serialize([_row(i)]))
+        mtime = (NOW - age).timestamp()
+        os.utime(os.path.join(str(tmp_path), key), (mtime, mtime))
+    return source
+
+
+def _totals(source):
+    return query.run(source, DAY, DAY)
+
+
+def test_compaction_merges_files_and_keeps_results(tmp_path):
+    source = _lake(tmp_path)
+    before = _totals(source)
+
+    result = compaction.compact_day(source, DAY, target_bytes=1024, now=NOW)
+
+    assert result['status'] == 'COMPACTADO'
+    assert result['entradas'] == 20
+    names = [k[len(day_prefix(DAY)):] for k in source.list_keys(day_prefix(DAY))]
+    assert not [n for n in names if n.startswith('vendas_')]
+    assert _totals(source) == before
+
+
+def test_rerun_is_a_no_op(tmp_path):
+    source = _lake(tmp_path)
+    compaction.compact_day(source, DAY, now=NOW)
+    before = _totals(source)
+
+    assert compaction.compact_day(source, DAY, now=NOW)['status'] == 'NADA_A_FAZER'
+    assert _totals(source) == before
+
+
+def test_recent_stream_files_are_left_alone(tmp_path):
+    source = _lake(tmp_path, age=timedelta(hours=1))
+
+    assert compaction.compact_day(source, DAY, now=NOW)['status'] == 'NADA_A_FAZER'
+
+
+def test_interrupted_swap_is_finished_without_double_counting(tmp_path):
+    source = _lake(tmp_path)
+    before = _totals(source)
+    prefix = day_prefix(DAY)
+    entradas = [k for k in source.list_keys(prefix)]
+    # Execução que gravou saída + manifesto e morreu antes de apagar as entradas
+    source.put_bytes(f"{prefix}compactado_x_0.json",
+                     b"\n".join(source.read_bytes(k) for k in entradas))
+    source.put_bytes(f"{prefix}_compactado_x.manifest",
+                     json.dumps({'entradas': entradas, 'saidas': [f"{prefix}compactado_x_0.json"]}).encode())
+
+    assert _totals(source) == before
+    compaction.compact_day(source, DAY, now=NOW)
+    assert _totals(source) == before
+    assert not [k for k in source.list_keys(prefix) if k in entradas]
+
+
+def test_lock_held_skips_the_day(tmp_path):
+    source = _lake(tmp_path)
+    source.create_exclusive(day_prefix(DAY) + '_compactacao.lock', b'outro', timedelta(minutes=15))
+
+    assert compaction.compact_day(source, DAY, now=NOW)['status'] == 'EM_ANDAMENTO'
+
+
+def test_parquet_outputs_are_streamed_in_row_groups(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+    from analytics.writers import ParquetWriter
+
+    source = LocalSource(str(tmp_path))
+    for i in range(6):
+        key = f"{day_prefix(DAY)}vendas_{100 + i}.parquet"
+        source.put_bytes(key, ParquetWriter().serialize([_row(i)]))
+        mtime = (NOW - timedelta(days=5)).timestamp()
+        os.utime(os.path.join(str(tmp_path), key), (mtime, mtime))
+    before = _totals(source)
+    # Duas entradas decodificadas por row group, no máximo
+    table_bytes = pq.read_table(os.path.join(str(tmp_path), key)).nbytes
+    monkeypatch.setattr(compaction, 'ROW_GROUP_BYTES', 2 * table_bytes)
+
+    result = compaction.compact_day(source, DAY, now=NOW)
+
+    assert (result['entradas'], result['saidas']) == (6, 1)
+    output, = [k for k in source.list_keys(day_prefix(DAY)) if k.endswith('.parquet')]
+    metadata = pq.ParquetFile(os.path.join(str(tmp_path), output)).metadata
+    assert (metadata.num_row_groups, metadata.num_rows) == (3, 6)
+    assert _totals(source) == before
@@ -0,0 +1,88 @@
+import os
+from datetime import date
+
+from analytics import query
+from analytics.facts import diff_facts
+from analytics.lake import LocalSource
+from analytics.writers import NdjsonWriter
+
+
+def _order(status, custo_entrega='0'):
+    return {
+        'id': 'ord_1',
+        'tipo_item': 'PEDIDO',
+        'status': status,
+        'criado_em': '2025-01-10T10:00:00',
+        'cliente_nome': 'Ana',
+        'custo_entrega_rateado': custo_entrega,
+        'itens': [
+            {'cookie_id': 'k1', 'sabor': 'Red Velvet', 'qtd': 2,
+             'preco_venda_unitario': '10', 'custo_producao_unitario': '4'},
+            {'cookie_id': 'k2', 'sabor': 'Limão', 'qtd': 1,
+             'preco_venda_unitario': '7', 'custo_producao_unitario': '2'},
+        ],
+    }
+
+
+def _write(root, day_path, name, rows):
+    directory = os.path.join(root, 'sales_data', day_path)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(NdjsonWriter().serialize(rows))
+
+
+class CountingSource(LocalSource):
+    def __init__(self, root):
+        super().__init__(root)
+        self.prefixes = []
+
+    def list_objects(self, prefix):
+        self.prefixes.append(prefix)
+        return super().list_objects(prefix)
+
+
+def _lake(tmp_path):
+    root = str(tmp_path)
+    recebido = _order('RECEBIDO')
+    em_rota = _order('EM_ROTA', '6')
+    _write(root, 'year=2025/month=01/day=10', 'vendas_100.json', diff_facts(None, recebido, '100'))
+    _write(root, 'year=2025/month=01/day=10', 'vendas_101.json', diff_facts(recebido, em_rota, '101'))
+    # Fora do intervalo consultado: não pode ser lido
+    _write(root, 'year=2025/month=02/day=01', 'vendas_200.json', diff_facts(None, _order('RECEBIDO'), '200'))
+    return CountingSource(root)
+
+
+def test_estornos_net_out_to_current_state(tmp_path):
+    source = _lake(tmp_path)
+
+    result = query.run(source, date(2025, 1, 1), date(2025, 1, 31), group_by=('status',))
+
+    # RECEBIDO foi totalmente estornado quando o pedido entrou em rota
+    assert [line['status'] for line in result] == ['EM_ROTA']
+    assert result[0]['receita_item'] == 27.0
+    assert result[0]['qtd'] == 3
+    assert result[0]['linhas'] == 2
+
+
+def test_partitions_outside_range_are_pruned(tmp_path):
+    source = _lake(tmp_path)
+
+    query.run(source, date(2025, 1, 9), date(2025, 1, 11))
+
+    assert source.prefixes == [
+        'sales_data/year=2025/month=01/day=09/',
+        'sales_data/year=2025/month=01/day=10/',
+        'sales_data/year=2025/month=01/day=11/',
+    ]
+
+
+def test_flavor_and_status_filters(tmp_path):
+    source = _lake(tmp_path)
+
+    result = query.run(source, date(2025, 1, 1), date(2025, 2, 28),
+                       sabor='Limão', status='EM_ROTA', group_by=('sabor',))
+
+    assert result == [{
+        'sabor': 'Limão', 'linhas': 1, 'qtd': 1, 'receita_item': 7.0,
+        'custo_item': 2.0, 'custo_logistico_item': 2.0, 'lucro_liquido': 3.0,
+    }]
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics import facts
+from analytics.writers import MONEY_COLUMNS, MONEY_PRECISION, MONEY_SCALE, ParquetWriter
+
+
+def _order(qtd):
+    return {'id': 'ord_1', 'tipo_item': 'PEDIDO', 'status': 'RECEBIDO', 'criado_em': '2025-01-10T10:00:00',
+            'cliente_nome': 'Ana', 'custo_entrega_rateado': Decimal('10'),
+            'itens': [{'cookie_id': 'k1', 'sabor': 'Oreo', 'qtd': qtd,
+                       'preco_venda_unitario': Decimal('12.50'), 'custo_producao_unitario': Decimal('4.35')}]}
+
+
+def test_parquet_schema_and_fact_round_trip():
+    rows = facts.diff_facts(_order(2), _order(3), '4900000000000000000001')
+
+    table = pq.read_table(pa.BufferReader(ParquetWriter().serialize(rows)))
+
+    for name in MONEY_COLUMNS:
+        assert table.schema.field(name).type == pa.decimal128(MONEY_PRECISION, MONEY_SCALE)
+    assert table.schema.field('qtd').type == pa.int64() and table.schema.field('sinal').type == pa.int64()
+    assert table.schema.field('evento_seq').type == pa.string()
+
+    read = table.to_pylist()
+    assert [(r['fato_id'], r['operacao'], r['sinal'], r['evento_seq']) for r in read] == [
+        ('ord_1#k1', 'ESTORNO', -1, '4900000000000000000001'),
+        ('ord_1#k1', 'UPSERT', 1, '4900000000000000000001'),
+    ]
+    # Dinheiro exato, na escala do lake: o estorno cancela a venda antiga centavo a centavo
+    assert [r['receita_item'] for r in read] == [Decimal('-25.0000'), Decimal('37.5000')]
+    assert [r['custo_logistico_item'] for r in read] == [Decimal('-5.0000'), Decimal('3.3333')]
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(__file__), '..', '..', 'src')
+
+# Cada cenário roda num interpretador novo: no processo do pytest o boto3 e o
+# pydantic já foram importados por outros testes.
+SCRIPT = """
+import json, sys
+import index
+
+def event(method, path):
+    return {'requestContext': {'http': {'method': method}}, 'rawPath': path}
+
+result = index.handler(event(sys.argv[1], sys.argv[2]), None)
+print(json.dumps({'status': result['statusCode'],
+                  'modules': [m for m in ('boto3', 'botocore', 'pydantic', 'models') if m in sys.modules]}))
+"""
+
+
+def _loaded_after(method, path):
+    env = dict(os.environ,
+               PYTHONPATH=os.path.abspath(SRC),
+               AWS_DEFAULT_REGION='us-east-1',
+               STORAGE_ENGINE='sqlite',
+               SQLITE_PATH=':memory:',
+               TABLE_NAME='Cookies')
+    out = subprocess.run([sys.executable, '-c', SCRIPT, method, path],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_preflight_loads_neither_boto3_nor_pydantic():
+    result = _loaded_after('OPTIONS', '/cookies')
+
+    assert result == {'status': 200, 'modules': []}
+
+
+def test_cookie_listing_does_not_load_pydantic():
+    result = _loaded_after('GET', '/cookies')
+
+    assert result['status'] == 200
+    assert 'pydantic' not in result['modules']
+    assert 'models' not in result['modules']
@@ -0,0 +1,45 @@
+import json
+
+import boto3
+from moto import mock_aws
+
+from core import metrics
+
+
+def test_span_and_flush_do_nothing_outside_an_invocation(capsys):
+    with metrics.span('service'):
+        pass
+    metrics.flush()
+
+    assert metrics.span('service') is metrics.span('handler')
+    assert capsys.readouterr().out == ''
+
+
+@mock_aws
+def test_emf_line_with_dynamodb_calls_and_consumed_capacity(capsys):
+    client = boto3.client('dynamodb', region_name='us-east-1')
+    client.create_table(TableName='T', BillingMode='PAY_PER_REQUEST',
+                        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}],
+                        AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}])
+    metrics.instrument_client(client)
+
+    metrics.start('GET /orders/{pedido_id}', 'req-1')
+    with metrics.span('handler'):
+        with metrics.span('service'):
+            client.put_item(TableName='T', Item={'pk': {'S': 'a'}})
+            client.get_item(TableName='T', Key={'pk': {'S': 'a'}})
+    metrics.flush()
+
+    line = json.loads(capsys.readouterr().out)
+    directive = line['_aws']['CloudWatchMetrics'][0]
+    assert directive['Dimensions'] == [['Route']]
+    assert {'Name': 'ConsumedRCU', 'Unit': 'Count'} in directive['Metrics']
+    assert line['Route'] == 'GET /orders/{pedido_id}'
+    assert line['RequestId'] == 'req-1'
+    assert line['DynamoDBCalls'] == 2
+    assert line['ConsumedWCU'] > 0 and line['ConsumedRCU'] > 0
+    assert line['HandlerTime'] >= line['ServiceTime'] >= line['DynamoDBTime'] > 0
+    assert [call['operacao'] for call in line['DynamoDBCallDetails']] == ['PutItem', 'GetItem']
+    # Uma linha por invocação: o flush encerra
+    metrics.flush()
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,64 @@
+from services.order_service import OrderService
+
+
+class FakeOrderRepository:
+    def __init__(self, orders, conflicts=()):
+        self.orders = {o['id']: o for o in orders}
+        self.conflicts = set(conflicts)
+        self.saved = []
+
+    def get_many(self, ids):
+        return {i: self.orders[i] for i in ids if i in self.orders}
+
+    def save_many(self, orders):
+        self.saved += orders
+        return set()
+
+    def update_status_many(self, changes):
+        return {pedido_id: 'CONFLITO' for pedido_id, *_ in changes if pedido_id in self.conflicts}
+
+
+class FakeCatalogRepository:
+    def get_many(self, ids):
+        return {'ck_1': {'id': 'ck_1', 'sabor': 'Nutella', 'preco_venda': '12.50', 'custo_producao': '4.00'}}
+
+
+def _service(orders=(), conflicts=()):
+    service = OrderService.__new__(OrderService)
+    service.order_repo = FakeOrderRepository(orders, conflicts)
+    service.catalog_repo = FakeCatalogRepository()
+    return service
+
+
+def test_create_orders_reports_each_item():
+    service = _service()
+    valido = {'data_entrega': '2025-01-01', 'itens': [{'cookie_id': 'ck_1', 'qtd': 2}]}
+
+    result = service.create_orders([valido, {'itens': []}, {'data_entrega': '2025-01-01',
+                                                            'itens': [{'cookie_id': 'ck_x', 'qtd': 1}]}])
+
+    assert [r['status'] for r in result['resultados']] == [201, 400, 404]
+    assert (result['sucesso'], result['falhas']) == (1, 2)
+    assert len(service.order_repo.saved) == 1
+
+
+def test_non_iso_delivery_date_is_rejected_per_order():
+    service = _service()
+    itens = [{'cookie_id': 'ck_1', 'qtd': 1}]
+
+    result = service.create_orders([{'data_entrega': data, 'itens': itens}
+                                    for data in ('10/02/2025', '2025-02-30', '2025-02-10', '2025-02-10T14:30:00')])
+
+    assert [r['status'] for r in result['resultados']] == [400, 400, 201, 201]
+    assert [o['data_entrega'] for o in service.order_repo.saved] == ['2025-02-10', '2025-02-10T14:30:00']
+
+
+def test_update_statuses_only_moves_forward():
+    orders = [{'id': 'a', 'status': 'RECEBIDO'}, {'id': 'b', 'status': 'CONCLUIDO'},
+              {'id': 'c', 'status': 'EM_ROTA'}, {'id': 'd', 'status': 'EM_PREPARO'}]
+    service = _service(orders, conflicts={'d'})
+
+    result = service.update_statuses(['a', 'b', 'c', 'd', 'x', 'a'], 'EM_ROTA')
+
+    assert [(r['id'], r['status']) for r in result['resultados']] == [
+        ('a', 200), ('b', 400), ('c', 200), ('d', 409), ('x', 404)]
@@ -0,0 +1,65 @@
+import pytest
+
+from core.keys import with_key
+from repositories.order_repository import OrderRepository
+from services.order_service import OrderService
+
+TABLE = 'CookiesTable-test'
+HISTORY = 'OrderHistoryTable-test'
+
+
+@pytest.fixture
+def service(sqlite_storage):
+    storage = sqlite_storage(TABLE, HISTORY)
+
+    # Pedido de antes da tabela de histórico: o extravio antigo usava 'data'
+    storage.batch_write(TABLE, [with_key({
+        'id': 'ord_1', 'tipo_item': 'PEDIDO', 'status': 'RECEBIDO', 'criado_em': '2025-01-01T09:00:00',
+        'historico': [
+            {'status_anterior': 'RECEBIDO', 'novo_status': 'EM_ROTA', 'data_alteracao': '2025-01-01T10:00:00'},
+            {'status_anterior': 'EM_ROTA', 'novo_status': 'EXTRAVIADO', 'data': '2025-01-01T11:00:00'},
+            {'status_anterior': 'EXTRAVIADO', 'novo_status': 'RECEBIDO', 'data_alteracao': '2025-01-01T12:00:00'},
+        ]
+    })])
+
+    service = OrderService.__new__(OrderService)
+    service.order_repo = OrderRepository()
+    return service
+
+
+def test_status_update_writes_order_and_history_together(service):
+    service.update_order_status('ord_1', 'EM_PREPARO')
+
+    order = service.order_repo.get_by_id('ord_1')
+    records, _ = service.order_repo.history.list_page('ord_1', 10)
+    assert (order['status'], order['versao']) == ('EM_PREPARO', 1)
+    assert [(r['status_anterior'], r['novo_status']) for r in records] == [('RECEBIDO', 'EM_PREPARO')]
+    assert records[0]['chave'].startswith(records[0]['data_alteracao'] + '#')
+
+
+def test_history_pages_count_legacy_entries_toward_limit(service):
+    for status in ('EM_PREPARO', 'EM_ROTA', 'CONCLUIDO'):
+        service.update_order_status('ord_1', status)
+
+    pages, cursor = [], None
+    while True:
+        page = service.list_history('ord_1', limit=2, cursor=cursor)
+        pages.append(page['items'])
+        cursor = page['next']
+        if not cursor:
+            break
+
+    assert all(len(items) <= 2 for items in pages)
+    history = [entry for items in pages for entry in items]
+    assert [entry['novo_status'] for entry in history] == [
+        'EM_ROTA', 'EXTRAVIADO', 'RECEBIDO', 'EM_PREPARO', 'EM_ROTA', 'CONCLUIDO']
+    assert all('data' not in entry and entry['data_alteracao'] for entry in history)
+    assert history[1]['data_alteracao'] == '2025-01-01T11:00:00'
+
+
+def test_history_cursor_is_checked(service):
+    cursor = service.list_history('ord_1', limit=1)['next']
+
+    with pytest.raises(ValueError):
+        service.list_history('ord_1', cursor='e30')  # {}
+    assert service.list_history('ord_1', limit=1, cursor=cursor)['items'][0]['novo_status'] == 'EXTRAVIADO'
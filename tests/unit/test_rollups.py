@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+
+from analytics import rollups
+from analytics.rollups import PROCESSED, TRANSACTION_LIMIT, RollupWriter, rollup_deltas
+
+
+class TransactionCanceledException(Exception):
+    def __init__(self, *codes):
+        super().__init__("cancelada")
+        self.response = {'CancellationReasons': [{'Code': code} for code in codes]}
+
+
+class FakeClient:
+    """Tabela de rollups em memória: marcadores já gravados e transações recebidas."""
+
+    exceptions = SimpleNamespace(TransactionCanceledException=TransactionCanceledException)
+
+    def __init__(self, marked=(), errors=()):
+        self.marked = set(marked)
+        self.errors = list(errors)
+        self.transactions = []
+
+    def batch_get_item(self, RequestItems):
+        (table, request), = RequestItems.items()
+        found = [{'chave': key['chave']} for key in request['Keys'] if key['chave']['S'] in self.marked]
+        return {'Responses': {table: found}}
+
+    def transact_write_items(self, TransactItems):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.transactions.append(TransactItems)
+        self.marked.update(a['Put']['Item']['chave']['S'] for a in TransactItems if 'Put' in a)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rollups.time, 'sleep', lambda seconds: None)
+
+
+def _deltas(dia, sabor='Chocolate', qtd=1):
+    return rollup_deltas([{'data_venda': dia, 'sabor': sabor, 'qtd': qtd, 'receita_item': '10',
+                           'custo_item': '4', 'custo_logistico_item': '1', 'lucro_liquido': '5'}])
+
+
+def _updates(transaction):
+    return {a['Update']['Key']['chave']['S']: a['Update']['ExpressionAttributeValues'][':qtd']['N']
+            for a in transaction if 'Update' in a}
+
+
+def test_retry_skips_records_already_marked():
+    client = FakeClient(marked={'seq_1'})
+    pending = [(0, 'seq_1', _deltas('2025-01-01')), (1, 'seq_2', _deltas('2025-01-01', qtd=2))]
+
+    assert RollupWriter(client, 'Rollups').apply(pending) is None
+
+    (transaction,) = client.transactions
+    assert [a['Put']['Item']['chave']['S'] for a in transaction if 'Put' in a] == ['seq_2']
+    assert _updates(transaction) == {'2025-01-01#Chocolate': '2'}
+    assert all(a['Put']['Item']['metrica']['S'] == PROCESSED for a in transaction if 'Put' in a)
+
+
+def test_groups_split_at_transaction_limit():
+    client = FakeClient()
+    # Cada registro = 1 marcador + 1 dia x sabor próprio: 50 por transação
+    pending = [(i, f'seq_{i:03d}', _deltas('2025-01-01', sabor=f'sabor_{i}')) for i in range(120)]
+
+    assert RollupWriter(client, 'Rollups').apply(pending) is None
+
+    assert [len(t) for t in client.transactions] == [100, 100, 40]
+    assert all(len(t) <= TRANSACTION_LIMIT for t in client.transactions)
+    assert len(client.marked) == 120
+
+
+def test_transaction_conflict_is_retried_and_other_cancellations_stop():
+    entry = [(7, 'seq_7', _deltas('2025-01-02'))]
+
+    client = FakeClient(errors=[TransactionCanceledException('None', 'TransactionConflict')])
+    assert RollupWriter(client, 'Rollups').apply(entry) is None
+    assert len(client.transactions) == 1
+
+    # Marcador já existente (outro shard somou): devolve o índice para o stream reenviar
+    client = FakeClient(errors=[TransactionCanceledException('ConditionalCheckFailed', 'None')])
+    assert RollupWriter(client, 'Rollups').apply(entry) == 7
+    assert client.transactions == []
+
+
+def test_marker_lookup_failure_is_reported_on_the_first_record():
+    class DeniedClient(FakeClient):
+        def batch_get_item(self, RequestItems):
+            raise RuntimeError("AccessDeniedException")
+
+    client = DeniedClient()
+    pending = [(3, 'seq_3', _deltas('2025-01-01')), (4, 'seq_4', _deltas('2025-01-02'))]
+
+    assert RollupWriter(client, 'Rollups').apply(pending) == 3
+    assert client.transactions == []
@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+import pytest
+
+from core.exceptions import BusinessRuleException, InfrastructureException, ThrottlingException
+from core.keys import item_key, with_key
+from repositories import order_repository
+from repositories.order_repository import REVERT_MAX_ATTEMPTS, OrderRepository
+
+TABLE = 'CookiesTable-test'
+HISTORY = 'OrderHistoryTable-test'
+
+
+@pytest.fixture
+def repo(sqlite_storage, monkeypatch):
+    storage = sqlite_storage(TABLE, HISTORY)
+    monkeypatch.setattr(order_repository.time, 'sleep', lambda seconds: None)
+
+    repo = OrderRepository()
+    # 150 pedidos = 4 lotes de até 50 (a ENTREGA + 49 no primeiro); o 120º cai no terceiro
+    orders = [{'id': f'ord_{i:03d}', 'tipo_item': 'PEDIDO', 'status': 'RECEBIDO'} for i in range(150)]
+    orders[120]['status'] = 'CONCLUIDO'
+    storage.batch_write(TABLE, [with_key(order) for order in orders])
+    return repo
+
+
+IDS = [f'ord_{i:03d}' for i in range(150)]
+
+
+def _route(repo, status_anteriores=None):
+    # Status lidos antes de o ord_120 ser concluído: a escrita do lote dele é recusada
+    status_anteriores = status_anteriores or dict.fromkeys(IDS, 'RECEBIDO')
+    repo.assign_route({'id': 'ent_1', 'tipo_item': 'ENTREGA'}, IDS, Decimal('1'), status_anteriores)
+
+
+def test_rejected_chunk_rolls_back_the_applied_one(repo):
+    with pytest.raises(BusinessRuleException, match='ord_120'):
+        _route(repo)
+
+    orders = repo.get_many([f'ord_{i:03d}' for i in range(150)])
+    assert {order['status'] for id_, order in orders.items() if id_ != 'ord_120'} == {'RECEBIDO'}
+    assert not any('entrega_id' in order for order in orders.values())
+    assert repo._get_item(Key=item_key('ENTREGA', 'ent_1')) is None
+
+
+def test_failed_revert_is_retried_and_reported(repo, monkeypatch):
+    transact_write = repo.storage.transact_write
+    reverts = []
+
+    def failing_revert(actions, token=None):
+        if any('Delete' in action for action in actions):
+            reverts.append(actions)
+            raise ThrottlingException('throttled')
+        return transact_write(actions, token)
+
+    monkeypatch.setattr(repo.storage, 'transact_write', failing_revert)
+
+    with pytest.raises(InfrastructureException, match='não revertidos: ord_000, .*ord_048\\.'):
+        _route(repo)
+    assert len(reverts) == REVERT_MAX_ATTEMPTS
+
+
+def _history(repo, pedido_id):
+    records, _ = repo.history.list_page(pedido_id, 10)
+    return [(r['status_anterior'], r['novo_status']) for r in records]
+
+
+def test_route_writes_each_transition_with_its_history(repo, monkeypatch):
+    transact_write = repo.storage.transact_write
+    sizes = []
+
+    def recording(actions, token=None):
+        sizes.append(len(actions))
+        return transact_write(actions, token)
+
+    monkeypatch.setattr(repo.storage, 'transact_write', recording)
+    ids = [i for i in IDS if i != 'ord_120']
+    repo.assign_route({'id': 'ent_1', 'tipo_item': 'ENTREGA'}, ids, Decimal('1'))
+
+    # ENTREGA + 49 pedidos, depois 50 + 50: update e histórico de cada pedido juntos
+    assert sorted(sizes) == [99, 100, 100]
+    assert _history(repo, 'ord_000') == [('RECEBIDO', 'EM_ROTA')]
+    assert repo.get_by_id('ord_149')['status'] == 'EM_ROTA'
+
+
+def test_rollback_records_the_way_back(repo):
+    with pytest.raises(BusinessRuleException):
+        _route(repo)
+
+    assert _history(repo, 'ord_000') == [('RECEBIDO', 'EM_ROTA'), ('EM_ROTA', 'RECEBIDO')]
+    assert _history(repo, 'ord_120') == []
+
+
+def test_unread_statuses_are_checked_before_writing(repo):
+    with pytest.raises(BusinessRuleException, match='ord_120, ord_x'):
+        repo.assign_route({'id': 'ent_1', 'tipo_item': 'ENTREGA'}, IDS + ['ord_x'], Decimal('1'))
+
+    assert repo._get_item(Key=item_key('ENTREGA', 'ent_1')) is None
+    assert _history(repo, 'ord_000') == []
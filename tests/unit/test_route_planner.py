@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+import numpy as np
+
+from logistics import planner
+
+ORIGEM = (-23.55, -46.63)
+
+
+def _motoboys(n, capacidade=30):
+    return [{'capacidade': capacidade, 'custo_base': Decimal('8.00'), 'custo_km': Decimal('1.10')} for _ in range(n)]
+
+
+def test_plan_respects_capacity_and_splits_freight_to_the_cent():
+    rng = np.random.default_rng(7)
+    lat = ORIGEM[0] + rng.normal(0, 0.03, 200)
+    lng = ORIGEM[1] + rng.normal(0, 0.03, 200)
+    pesos = rng.integers(1, 8, 200).tolist()
+
+    result = planner.plan(ORIGEM, lat, lng, pesos, _motoboys(20))
+
+    served = [i for rota in result['rotas'] for i in rota['paradas']]
+    assert sorted(served + result['sobras']) == list(range(200))
+    for rota in result['rotas']:
+        assert sum(pesos[i] for i in rota['paradas']) <= 30
+        assert sum(rota['rateio']) == rota['custo_total']
+
+
+def test_heavier_and_farther_orders_pay_more():
+    rateio = planner.split_freight(Decimal('10.00'), [1.0, 2.0, 2.0], [1, 1, 2])
+
+    assert rateio == [Decimal('1.43'), Decimal('2.86'), Decimal('5.71')]
+
+
+def test_two_opt_never_worsens_nearest_neighbor():
+    rng = np.random.default_rng(3)
+    x, y = rng.normal(0, 5, 40), rng.normal(0, 5, 40)
+
+    passes = planner.TWO_OPT_MAX_PASSES
+    try:
+        planner.TWO_OPT_MAX_PASSES = 0
+        _, nearest = planner.order_stops(x, y, list(range(40)))
+    finally:
+        planner.TWO_OPT_MAX_PASSES = passes
+    stops, improved = planner.order_stops(x, y, list(range(40)))
+
+    assert sorted(stops) == list(range(40))
+    assert improved <= nearest
+
+
+def test_order_too_heavy_for_any_motoboy_is_left_over():
+    result = planner.plan(ORIGEM, [-23.56, -23.54], [-46.62, -46.64], [50, 5], _motoboys(1, capacidade=10))
+
+    assert result['sobras'] == [0]
+    assert result['rotas'][0]['paradas'] == [1]
+
+
+class _Repo:
+    """Dois pedidos no mesmo ponto; a rota de 'b' falha ao gravar."""
+
+    def list_assignable_for_delivery(self, data_entrega):
+        return [{'id': 'ord_a', 'status': 'RECEBIDO', 'itens': [{'qtd': 5}]},
+                {'id': 'ord_b', 'status': 'EM_PREPARO', 'itens': [{'qtd': 5}]}]
+
+    def assign_route(self, entrega, pedidos_ids, rateio, status_anteriores):
+        assert status_anteriores == {pid: 'RECEBIDO' if pid == 'ord_a' else 'EM_PREPARO' for pid in pedidos_ids}
+        if entrega['motoboy'] == 'b':
+            raise RuntimeError("timeout")
+
+
+def test_confirmed_totals_only_count_saved_routes(caplog):
+    from services.logistics_service import LogisticsService
+
+    service = LogisticsService.__new__(LogisticsService)
+    service.repo = _Repo()
+    ponto = {'lat': -23.56, 'lng': -46.62}
+    result = service.plan_routes({
+        'data_entrega': '2025-02-10', 'origem': {'lat': ORIGEM[0], 'lng': ORIGEM[1]}, 'confirmar': True,
+        'motoboys': [{'nome': nome, 'capacidade': 5, 'custo_base': '8.00'} for nome in ('a', 'b')],
+        'locais': {'ord_a': ponto, 'ord_b': ponto}
+    })
+
+    assert sorted(rota['status'] for rota in result['rotas']) == [201, 503]
+    saved = next(rota for rota in result['rotas'] if rota['status'] == 201)
+    assert (result['totais']['rotas'], result['totais']['pedidos']) == (1, 1)
+    assert result['totais']['custo_total'] == saved['custo_total']
+    assert "timeout" in caplog.text
+
+
+def test_plan_without_numpy_answers_503(monkeypatch):
+    import json
+    import sys
+
+    import index
+    import logistics
+    from services.logistics_service import LogisticsService
+
+    # Pacote da Lambda sem a layer do numpy
+    monkeypatch.setitem(sys.modules, 'logistics.planner', None)
+    monkeypatch.delattr(logistics, 'planner')
+    monkeypatch.setattr(index, 'get_logistics_service', lambda: LogisticsService.__new__(LogisticsService))
+
+    result = index.handler({'requestContext': {'http': {'method': 'POST'}}, 'rawPath': '/logistics/plan',
+                            'body': json.dumps({'data_entrega': '2025-02-10'})}, None)
+
+    assert result['statusCode'] == 503
+    assert 'numpy' in json.loads(result['body'])['error']
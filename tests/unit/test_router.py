@@ -0,0 +1,64 @@
+import pytest
+
+from core.router import Router
+
+
+def _router():
+    router = Router()
+
+    @router.get('/orders')
+    def list_orders(event):
+        return 'list'
+
+    @router.post('/orders/batch')
+    def batch(event):
+        return 'batch'
+
+    @router.patch('/orders/{pedido_id}/status')
+    def status(event, pedido_id):
+        return 'status'
+
+    @router.post('/orders/{pedido_id}/loss')
+    def loss(event, pedido_id):
+        return 'loss'
+
+    @router.get('/pages/{n:int}')
+    def page(event, n):
+        return 'page'
+
+    return router
+
+
+def test_resolves_static_and_params():
+    router = _router()
+
+    match = router.resolve('PATCH', '/orders/ord_1/status')
+    assert match.handler(None, **match.params) == 'status'
+    assert match.params == {'pedido_id': 'ord_1'}
+
+    assert router.resolve('POST', '/orders/ord_1/loss').handler.__name__ == 'loss'
+    assert router.resolve('POST', '/orders/batch').handler.__name__ == 'batch'
+    assert router.resolve('GET', '/orders/').handler.__name__ == 'list_orders'
+
+
+def test_typed_params_and_unknown_paths():
+    router = _router()
+
+    assert router.resolve('GET', '/pages/3').params == {'n': 3}
+    assert router.resolve('GET', '/pages/abc') is None
+    assert router.resolve('PATCH', '/orders/ord_1/status/extra') is None
+    assert router.resolve('GET', '/nada') is None
+
+
+def test_method_not_allowed_lists_allowed_methods():
+    match = _router().resolve('DELETE', '/orders/ord_1/status')
+
+    assert match.handler is None
+    assert match.allowed == ['PATCH']
+
+
+def test_duplicate_route_is_rejected():
+    router = _router()
+
+    with pytest.raises(ValueError):
+        router.get('/orders')(lambda event: None)
@@ -0,0 +1,196 @@
+"""
+Contrato do storage: os mesmos testes contra o motor DynamoDB (moto) e o SQLite.
+"""
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from core.exceptions import BusinessRuleException, ConditionalCheckFailedException, TransactionCanceledException
+from core.keys import DELIVERY_INDEX, INDEX_KEYS, STATUS_INDEX, item_key, with_key
+
+TABLE = 'CookiesTable-test'
+HISTORY = 'OrderHistoryTable-test'
+
+
+def _dynamodb_storage():
+    import boto3
+    from core.database import skip_item_parsing
+    from storage.dynamodb import DynamoDBStorage
+
+    client = boto3.client('dynamodb', region_name='us-east-1')
+    client.create_table(
+        TableName=TABLE, BillingMode='PAY_PER_REQUEST',
+        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                              for name in {name for key in INDEX_KEYS.values() for name in key} | {'pk', 'sk'}],
+        GlobalSecondaryIndexes=[{
+            'IndexName': index,
+            'KeySchema': [{'AttributeName': hash_key, 'KeyType': 'HASH'},
+                          {'AttributeName': range_key, 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        } for index, (hash_key, range_key) in INDEX_KEYS.items()]
+    )
+    client.create_table(
+        TableName=HISTORY, BillingMode='PAY_PER_REQUEST',
+        KeySchema=[{'AttributeName': 'pedido_id', 'KeyType': 'HASH'}, {'AttributeName': 'chave', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[{'AttributeName': 'pedido_id', 'AttributeType': 'S'},
+                              {'AttributeName': 'chave', 'AttributeType': 'S'}]
+    )
+    client.meta.events.register('before-parse.dynamodb', skip_item_parsing)
+    return DynamoDBStorage(SimpleNamespace(table_name=TABLE, client=client))
+
+
+@pytest.fixture(params=['dynamodb', 'sqlite'])
+def storage(request, monkeypatch):
+    if request.param == 'sqlite':
+        yield request.getfixturevalue('sqlite_storage')(TABLE, HISTORY)
+        return
+
+    from moto import mock_aws
+    for name, value in (('AWS_ACCESS_KEY_ID', 'test'), ('AWS_SECRET_ACCESS_KEY', 'test'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        yield _dynamodb_storage()
+
+
+def _order(order_id: str, status: str, criado_em: str, data_entrega: str = None, **extra) -> dict:
+    order = {'id': order_id, 'tipo_item': 'PEDIDO', 'status': status, 'criado_em': criado_em, **extra}
+    if data_entrega:
+        order['data_entrega'] = data_entrega
+    return with_key(order)
+
+
+def test_put_get_round_trip_and_projection(storage):
+    storage.put_item(TABLE, Item=_order('o1', 'RECEBIDO', '2025-01-01', valor=Decimal('10.50'),
+                                        itens=[{'produto_id': 'c1', 'qtd': 2}], tags={'a', 'b'}))
+
+    item = storage.get_item(TABLE, Key=item_key('PEDIDO', 'o1'))
+    assert item == {'id': 'o1', 'tipo_item': 'PEDIDO', 'status': 'RECEBIDO', 'criado_em': '2025-01-01',
+                    'valor': Decimal('10.50'), 'itens': [{'produto_id': 'c1', 'qtd': Decimal(2)}], 'tags': {'a', 'b'}}
+    assert storage.get_item(TABLE, Key=item_key('PEDIDO', 'o1'), ProjectionExpression='id, #st, itens[0].qtd',
+                            ExpressionAttributeNames={'#st': 'status'}) == \
+        {'id': 'o1', 'status': 'RECEBIDO', 'itens': [{'qtd': Decimal(2)}]}
+    assert storage.get_item(TABLE, Key=item_key('PEDIDO', 'nope')) is None
+
+
+def test_conditional_put_and_update(storage):
+    order = _order('o1', 'RECEBIDO', '2025-01-01')
+    storage.put_item(TABLE, Item=order, ConditionExpression='attribute_not_exists(pk)')
+    with pytest.raises(ConditionalCheckFailedException):
+        storage.put_item(TABLE, Item=order, ConditionExpression='attribute_not_exists(pk)')
+
+    attributes = storage.update_item(
+        TABLE, Key=item_key('PEDIDO', 'o1'),
+        UpdateExpression='SET entrega_id = :e, status_pre_rota = #st, #st = :s REMOVE criado_em ADD versao :one',
+        ConditionExpression='attribute_exists(pk) AND #st IN (:rec, :prep)',
+        ExpressionAttributeNames={'#st': 'status'},
+        ExpressionAttributeValues={':e': 'ent_1', ':s': 'EM_ROTA', ':one': 1, ':rec': 'RECEBIDO', ':prep': 'EM_PREPARO'},
+        ReturnValues='ALL_NEW'
+    )
+    assert attributes == {'id': 'o1', 'tipo_item': 'PEDIDO', 'status': 'EM_ROTA', 'status_pre_rota': 'RECEBIDO',
+                          'entrega_id': 'ent_1', 'versao': Decimal(1)}
+
+    with pytest.raises(ConditionalCheckFailedException):
+        storage.update_item(TABLE, Key=item_key('PEDIDO', 'o1'), UpdateExpression='SET #st = :s',
+                            ConditionExpression='#st = :atual', ExpressionAttributeNames={'#st': 'status'},
+                            ExpressionAttributeValues={':s': 'CONCLUIDO', ':atual': 'RECEBIDO'})
+
+    # Update de item inexistente cria o item (o contador de versão do catálogo depende disso)
+    created = storage.update_item(TABLE, Key=item_key('CATALOGO_VERSAO', 'CATALOGO#VERSAO'),
+                                  UpdateExpression='SET id = :id ADD versao :one',
+                                  ExpressionAttributeValues={':id': 'CATALOGO#VERSAO', ':one': 1},
+                                  ReturnValues='UPDATED_NEW')
+    assert created == {'id': 'CATALOGO#VERSAO', 'versao': Decimal(1)}
+
+
+def test_index_query_pagination_filter_after_limit(storage):
+    storage.batch_write(TABLE, [_order(f'o{i}', 'RECEBIDO', f'2025-01-0{i}', urgente=(i % 2 == 0))
+                                for i in range(1, 6)])
+    storage.put_item(TABLE, Item=_order('x', 'CONCLUIDO', '2025-01-01'))
+    params = {'IndexName': STATUS_INDEX, 'KeyConditionExpression': '#st = :st',
+              'ExpressionAttributeNames': {'#st': 'status'}, 'ExpressionAttributeValues': {':st': 'RECEBIDO'}}
+
+    pages, start_key = [], None
+    while True:
+        page_params = {**params, 'Limit': 2}
+        if start_key:
+            page_params['ExclusiveStartKey'] = start_key
+        items, start_key = storage.query_page(TABLE, **page_params)
+        pages.append([item['id'] for item in items])
+        if not start_key:
+            break
+    assert [order_id for page in pages for order_id in page] == ['o1', 'o2', 'o3', 'o4', 'o5']
+
+    # O filtro vem depois do Limit: a página pode voltar menor, com chave para continuar
+    items, start_key = storage.query_page(TABLE, Limit=2, FilterExpression='urgente = :t',
+                                          **{**params, 'ExpressionAttributeValues': {':st': 'RECEBIDO', ':t': True}})
+    assert [item['id'] for item in items] == ['o2'] and start_key
+
+    newest = list(storage.query(TABLE, ScanIndexForward=False, **params))
+    assert [item['id'] for item in newest] == ['o5', 'o4', 'o3', 'o2', 'o1']
+
+
+def test_delivery_index_range_and_sparse_items(storage):
+    storage.batch_write(TABLE, [
+        _order('a', 'RECEBIDO', '2025-01-01', '2025-02-01T09:00'),
+        _order('b', 'EM_PREPARO', '2025-01-01', '2025-02-01T18:00'),
+        _order('c', 'CONCLUIDO', '2025-01-01', '2025-02-01T12:00'),
+        _order('d', 'RECEBIDO', '2025-01-01', '2025-02-02T08:00'),
+        _order('e', 'RECEBIDO', '2025-01-01'),      # sem data: fora do índice
+    ])
+
+    items = list(storage.query(
+        TABLE, IndexName=DELIVERY_INDEX,
+        KeyConditionExpression='mes_entrega = :mes AND data_entrega BETWEEN :dia AND :fim',
+        FilterExpression='#st IN (:rec, :prep)', ProjectionExpression='id, #st',
+        ExpressionAttributeNames={'#st': 'status'},
+        ExpressionAttributeValues={':mes': '2025-02', ':dia': '2025-02-01', ':fim': '2025-02-01\uffff',
+                                   ':rec': 'RECEBIDO', ':prep': 'EM_PREPARO'}
+    ))
+    assert items == [{'id': 'a', 'status': 'RECEBIDO'}, {'id': 'b', 'status': 'EM_PREPARO'}]
+
+    after = list(storage.query(TABLE, IndexName=DELIVERY_INDEX,
+                               KeyConditionExpression='mes_entrega = :mes AND begins_with(data_entrega, :dia)',
+                               ExpressionAttributeValues={':mes': '2025-02', ':dia': '2025-02-02'}))
+    assert [item['id'] for item in after] == ['d']
+    assert sorted(item['id'] for item in storage.scan(TABLE)) == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_transaction_is_all_or_nothing_with_cancellation_codes(storage):
+    storage.put_item(TABLE, Item=_order('o1', 'RECEBIDO', '2025-01-01'))
+    history = {'pedido_id': 'o1', 'chave': '2025-01-02#1', 'novo_status': 'EM_PREPARO'}
+    actions = [
+        {'Put': {'TableName': HISTORY, 'Item': history}},
+        {'Update': {'TableName': TABLE, 'Key': item_key('PEDIDO', 'o1'), 'UpdateExpression': 'SET #st = :s',
+                    'ConditionExpression': '#st = :atual', 'ExpressionAttributeNames': {'#st': 'status'},
+                    'ExpressionAttributeValues': {':s': 'EM_PREPARO', ':atual': 'EM_ROTA'}}},
+    ]
+    with pytest.raises(TransactionCanceledException) as error:
+        storage.transact_write(actions)
+    assert error.value.codes == ['None', 'ConditionalCheckFailed']
+    assert list(storage.query(HISTORY, KeyConditionExpression='pedido_id = :p',
+                              ExpressionAttributeValues={':p': 'o1'})) == []
+
+    actions[1]['Update']['ExpressionAttributeValues'][':atual'] = 'RECEBIDO'
+    storage.transact_write(actions, token='tok-1')
+    assert storage.get_item(TABLE, Key=item_key('PEDIDO', 'o1'))['status'] == 'EM_PREPARO'
+    assert storage.batch_get(HISTORY, [{'pedido_id': 'o1', 'chave': '2025-01-02#1'}]) == [history]
+
+
+def test_catalog_repository_runs_on_the_engine(storage, monkeypatch):
+    from repositories import base_repository
+    from repositories.catalog_repository import CatalogRepository
+
+    storage.table_name = TABLE
+    monkeypatch.setattr(base_repository, 'get_storage', lambda: storage)
+    repo = CatalogRepository()
+
+    repo.create({'id': 'c1', 'tipo_item': 'COOKIE', 'sabor': 'Red Velvet', 'status': 'ATIVO'})
+    with pytest.raises(BusinessRuleException):
+        repo.create({'id': 'c2', 'tipo_item': 'COOKIE', 'sabor': 'Red Velvet', 'status': 'ATIVO'})
+    repo.create({'id': 'c3', 'tipo_item': 'COOKIE', 'sabor': 'Brigadeiro', 'status': 'ATIVO'})
+
+    assert [cookie['sabor'] for cookie in repo.list_active()] == ['Brigadeiro', 'Red Velvet']
+    assert repo.bump_version() == 1 and repo.bump_version() == 2 and repo.get_version() == 2
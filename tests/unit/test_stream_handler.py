@@ -0,0 +1,144 @@
+import importlib
+import json
+
+import pytest
+
+
+def _typed(value):
+    return {'N': str(value)} if isinstance(value, int) else {'S': value}
+
+
+def _line(cookie_id, qtd, preco='12.50'):
+    return {'M': {'cookie_id': _typed(cookie_id), 'sabor': _typed(cookie_id.upper()), 'qtd': _typed(qtd),
+                  'preco_venda_unitario': {'N': preco}, 'custo_producao_unitario': {'N': '4.35'}}}
+
+
+def _image(pedido_id, linhas=(('k1', 2),), frete='10', **extra):
+    image = {'id': _typed(pedido_id), 'tipo_item': _typed('PEDIDO'), 'status': _typed('RECEBIDO'),
+             'criado_em': _typed('2025-01-10T10:00:00'), 'custo_entrega_rateado': {'N': frete},
+             'itens': {'L': [_line(*linha) for linha in linhas]}}
+    image.update({k: _typed(v) for k, v in extra.items()})
+    return image
+
+
+def _record(sequence, new_image=None, old_image=None):
+    change = {'SequenceNumber': sequence}
+    if new_image:
+        change['NewImage'] = new_image
+    if old_image:
+        change['OldImage'] = old_image
+    return {'dynamodb': change}
+
+
+class FakeS3:
+    def __init__(self, error=None):
+        self.error = error
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType, Metadata):
+        if self.error:
+            raise self.error
+        self.objects[Key] = Body
+
+
+class FakeRollupWriter:
+    def __init__(self, failed_index=None):
+        self.failed_index = failed_index
+        self.pending = None
+
+    def apply(self, pending):
+        self.pending = pending
+        return self.failed_index
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    module = importlib.import_module('stream_handler')
+    monkeypatch.setattr(module, 's3_client', FakeS3())
+    monkeypatch.setattr(module, 'rollup_writer', None)
+    return module
+
+
+def _failures(result):
+    return [failure['itemIdentifier'] for failure in result['batchItemFailures']]
+
+
+def _saved_sequences(stream):
+    return {json.loads(line)['evento_seq']
+            for body in stream.s3_client.objects.values() for line in body.decode().splitlines()}
+
+
+def test_bad_record_is_reported_and_earlier_ones_are_saved(stream):
+    bad = _image('ord_2', linhas=(('k1', 'muitos'),))
+    event = {'Records': [_record('100', _image('ord_1')), _record('200', bad), _record('300', _image('ord_3'))]}
+
+    assert _failures(stream.handler(event, None)) == ['200']
+    assert _saved_sequences(stream) == {'100'}
+
+
+def test_s3_failure_retries_the_batch_from_its_first_record(stream, monkeypatch):
+    monkeypatch.setattr(stream, 's3_client', FakeS3(error=RuntimeError("SlowDown")))
+    event = {'Records': [_record('100', _image('ord_1')), _record('200', _image('ord_2'))]}
+
+    assert _failures(stream.handler(event, None)) == ['100']
+
+
+def test_rollup_failure_reports_that_record_and_saves_only_the_ones_before(stream, monkeypatch):
+    monkeypatch.setattr(stream, 'rollup_writer', FakeRollupWriter(failed_index=1))
+    event = {'Records': [_record(seq, _image(f'ord_{seq}')) for seq in ('100', '200', '300')]}
+
+    assert _failures(stream.handler(event, None)) == ['200']
+    assert [sequence for _, sequence, _ in stream.rollup_writer.pending] == ['100', '200', '300']
+    assert _saved_sequences(stream) == {'100'}
+
+
+def test_retry_overwrites_the_same_objects(stream):
+    event = {'Records': [_record('100', _image('ord_1')), _record('200', _image('ord_2'))]}
+
+    stream.handler(event, None)
+    first = dict(stream.s3_client.objects)
+    stream.handler(event, None)
+
+    assert list(first) == ['sales_data/year=2025/month=01/day=10/vendas_100.json']
+    assert stream.s3_client.objects == first
+
+
+def _saved_rows(stream):
+    return [json.loads(line) for body in stream.s3_client.objects.values() for line in body.decode().splitlines()]
+
+
+def test_history_only_modify_is_dropped_before_deserialization(stream, monkeypatch):
+    def fail(*args):
+        raise AssertionError("imagem deserializada")
+
+    monkeypatch.setattr(stream.facts.FactBatch, 'add_image', fail)
+    old = _image('ord_1', versao=1)
+    new = _image('ord_1', versao=2, historico='EM_PREPARO')
+
+    assert _failures(stream.handler({'Records': [_record('100', new, old)]}, None)) == []
+    assert stream.s3_client.objects == {}
+
+
+def test_line_change_emits_one_reversal_and_one_upsert(stream):
+    old = _image('ord_1', linhas=(('k1', 2), ('k2', 1)))
+    # Só o preço do k1 muda: quantidades (e o frete por item) iguais, o k2 não muda
+    new = _image('ord_1', linhas=(('k1', 2, '14.00'), ('k2', 1)))
+
+    stream.handler({'Records': [_record('100', new, old)]}, None)
+
+    rows = {(row['produto_id'], row['operacao']): row for row in _saved_rows(stream)}
+    assert sorted(rows) == [('k1', 'ESTORNO'), ('k1', 'UPSERT')]
+    assert (rows['k1', 'ESTORNO']['receita_item'], rows['k1', 'ESTORNO']['sinal']) == (-25, -1)
+    assert (rows['k1', 'UPSERT']['receita_item'], rows['k1', 'UPSERT']['sinal']) == (28, 1)
+
+
+def test_remove_retracts_every_line(stream):
+    old = _image('ord_1', linhas=(('k1', 2), ('k2', 1)))
+
+    stream.handler({'Records': [_record('100', old_image=old)]}, None)
+
+    rows = _saved_rows(stream)
+    assert {(row['produto_id'], row['operacao'], row['sinal']) for row in rows} == {
+        ('k1', 'ESTORNO', -1), ('k2', 'ESTORNO', -1)}
+    assert sorted(row['qtd'] for row in rows) == [-2, -1]